@@ -0,0 +1,275 @@
+"""Representação compacta das atividades brutas da API do Strava.
+
+Cada atividade de /athlete/activities chega como um dict com dezenas de chaves,
+das quais o ETL usa só FIELDS. ActivityBatch guarda apenas essas, uma coluna
+NumPy tipada por campo (data como datetime64, tipo como códigos int8, inteiros
+em int32 quando cabem), e monta o DataFrame do ETL só quando pedido
+(to_frame). Os dicts de uma página podem ser descartados logo após from_raw.
+
+Activity é o registro de uma atividade (com __slots__), para quem precisa
+iterar item a item.
+
+    python activity_batch.py --activities 20000   # memória e tempo contra dicts + DataFrame
+"""
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+import pandas as pd
+
+# campo do Strava -> nome no ActivityBatch (usados por etl.transform_activities)
+FIELDS = {
+    "id": "id",
+    "name": "name",
+    "type": "type",
+    "start_date_local": "start",
+    "distance": "distance",
+    "moving_time": "moving_time",
+    "total_elevation_gain": "elevation",
+    "average_speed": "average_speed",
+    "max_speed": "max_speed",
+    "calories": "calories",
+    "kudos_count": "kudos",
+}
+NUMERIC = ("distance", "moving_time", "elevation", "average_speed", "max_speed", "calories", "kudos")
+INT32 = np.iinfo(np.int32)
+
+
+def _numeric_column(values: list) -> np.ndarray:
+    """int32/int64/float64 conforme os valores (None vira NaN), como o pandas inferiria"""
+    try:
+        column = np.asarray(values)
+    except (TypeError, ValueError):
+        column = np.asarray(values, dtype=object)
+    if column.dtype == object:
+        return np.asarray([np.nan if v is None else v for v in values], dtype=float)
+    if column.dtype.kind == "i" and (not len(column) or INT32.min <= column.min() and column.max() <= INT32.max):
+        return column.astype(np.int32)
+    return column
+
+
+class Activity:
+    """Uma atividade só com os campos usados pelo ETL"""
+
+    __slots__ = tuple(FIELDS.values()) + ("polyline",)
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            setattr(self, name, values.get(name))
+
+    def __repr__(self):
+        return f"Activity(id={self.id}, type={self.type!r}, start={self.start}, distance={self.distance})"
+
+
+class ActivityBatch:
+    """Colunas tipadas de um lote de atividades (uma página ou o histórico)"""
+
+    __slots__ = ("id", "name", "type_codes", "types", "start", "tz", "polyline") + NUMERIC
+
+    @classmethod
+    def from_raw(cls, activities: list) -> "ActivityBatch":
+        """Extrai FIELDS (e o summary_polyline) da lista de dicts da API"""
+        batch = cls.__new__(cls)
+        columns = {name: [] for name in FIELDS.values()}
+        polyline = []
+        for act in activities:
+            get = act.get
+            for key, name in FIELDS.items():
+                columns[name].append(get(key, 0) if name in NUMERIC else get(key))
+            polyline.append((get("map") or {}).get("summary_polyline"))
+
+        ids = columns["id"]
+        batch.id = np.asarray(ids, dtype=np.int64) if None not in ids else np.asarray(ids, dtype=object)
+        batch.name = np.asarray(columns["name"], dtype=object)
+        codes, types = pd.factorize(np.asarray(columns["type"], dtype=object))
+        batch.type_codes = codes.astype(np.int8 if len(types) < 127 else np.int32)
+        batch.types = np.asarray(types, dtype=object)
+        start = pd.DatetimeIndex(pd.to_datetime(columns["start"], format="ISO8601"))
+        batch.tz = start.tz
+        batch.start = (start.tz_localize(None) if start.tz is not None else start).to_numpy()
+        batch.polyline = np.asarray(polyline, dtype=object)
+        for name in NUMERIC:
+            setattr(batch, name, _numeric_column(columns[name]))
+        return batch
+
+    @classmethod
+    def concat(cls, batches) -> "ActivityBatch":
+        """Junta lotes (ex.: uma página por lote) num só"""
+        # lote vazio não tem os dtypes dos campos (np.asarray([]) é float64) e promoveria os inteiros
+        batches = [b for b in batches if len(b)]
+        if not batches:
+            return cls.from_raw([])
+        if len(batches) == 1:
+            return batches[0]
+        batch = cls.__new__(cls)
+        for name in ("id", "name", "polyline") + NUMERIC:
+            setattr(batch, name, np.concatenate([getattr(b, name) for b in batches]))
+        types = pd.Index(np.concatenate([b.types for b in batches])).unique()
+        # código de cada lote -> código no lote unido (o -1 de "sem tipo" continua -1)
+        codes = [np.append(types.get_indexer(b.types), -1)[b.type_codes] for b in batches]
+        batch.type_codes = np.concatenate(codes).astype(np.int8 if len(types) < 127 else np.int32)
+        batch.types = np.asarray(types, dtype=object)
+        batch.tz = batches[0].tz
+        batch.start = np.concatenate([b.start for b in batches])
+        return batch
+
+    def __len__(self):
+        return len(self.id)
+
+    def __getitem__(self, i) -> Activity:
+        code = self.type_codes[i]
+        return Activity(
+            id=self.id[i], name=self.name[i], type=self.types[code] if code >= 0 else None,
+            start=self.start[i], polyline=self.polyline[i], **{name: getattr(self, name)[i] for name in NUMERIC},
+        )
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes das colunas, incluindo os textos das colunas de objetos"""
+        total = 0
+        for name in self.__slots__:
+            column = getattr(self, name)
+            if isinstance(column, np.ndarray):
+                total += column.nbytes
+                if column.dtype == object:
+                    total += sum(v.__sizeof__() for v in column if v is not None)
+        return total
+
+    def to_frame(self) -> pd.DataFrame:
+        """O DataFrame do etl.transform_activities (mesmas colunas e tipos)"""
+        if not len(self):
+            return pd.DataFrame()
+        dates = pd.Series(self.start)
+        if self.tz is not None:
+            dates = dates.dt.tz_localize(self.tz)
+        types = np.empty(len(self), dtype=object)  # None onde a API não mandou o tipo
+        known = self.type_codes >= 0
+        types[known] = self.types[self.type_codes[known]]
+        widen = lambda column: column.astype(np.int64) if column.dtype == np.int32 else column
+        df = pd.DataFrame({
+            "id": self.id,
+            "name": self.name,
+            "type": types,
+            "date": dates,
+            "distance_km": self.distance / 1000,
+            "duration_min": self.moving_time / 60,
+            "elevation_m": widen(self.elevation),
+            "avg_speed_kmh": self.average_speed * 3.6,
+            "max_speed_kmh": self.max_speed * 3.6,
+            "calories": widen(self.calories),
+            "kudos": widen(self.kudos),
+            "polyline": self.polyline,
+        })
+
+        # Evita divisão por zero
+        df["pace_min_km"] = df["duration_min"] / df["distance_km"].replace({0: pd.NA})
+
+        # Formata com 1 casa decimal
+        df["distance_km"] = df["distance_km"].round(1)
+        df["pace_min_km"] = df["pace_min_km"].round(1)
+        df["date_only"] = df["date"].dt.date
+        df["month_year"] = df["date"].dt.to_period("M")
+        return df
+
+
+# --- comparação com o caminho antigo ---------------------------------------------
+
+def legacy_transform(activities: list) -> pd.DataFrame:
+    """Caminho antigo do etl.transform_activities: um dict por atividade e DataFrame de registros"""
+    if not activities:
+        return pd.DataFrame()
+    records = []
+    for act in activities:
+        records.append({
+            "id": act.get("id"),
+            "name": act.get("name"),
+            "type": act.get("type"),
+            "date": pd.to_datetime(act.get("start_date_local")),
+            "distance_km": act.get("distance", 0) / 1000,
+            "duration_min": act.get("moving_time", 0) / 60,
+            "elevation_m": act.get("total_elevation_gain", 0),
+            "avg_speed_kmh": act.get("average_speed", 0) * 3.6,
+            "max_speed_kmh": act.get("max_speed", 0) * 3.6,
+            "calories": act.get("calories", 0),
+            "kudos": act.get("kudos_count", 0),
+            "polyline": act.get("map", {}).get("summary_polyline"),
+        })
+    df = pd.DataFrame(records)
+    df["pace_min_km"] = df["duration_min"] / df["distance_km"].replace({0: pd.NA})
+    df["distance_km"] = df["distance_km"].round(1)
+    df["pace_min_km"] = df["pace_min_km"].round(1)
+    df["date_only"] = df["date"].dt.date
+    df["month_year"] = df["date"].dt.to_period("M")
+    return df
+
+
+def _retained(build):
+    """(objeto, bytes que continuam alocados depois de build())"""
+    gc.collect()
+    tracemalloc.start()
+    obj = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return obj, size
+
+
+def bench(n, per_page=200, repeat=3) -> dict:
+    from strava_stub import generate_activities
+
+    payload = json.dumps(generate_activities(n)).encode()
+
+    def paged_batch():
+        # como no ETL: cada página decodificada vira um lote e os dicts são descartados
+        activities = json.loads(payload)
+        return ActivityBatch.concat(ActivityBatch.from_raw(activities[i:i + per_page])
+                                    for i in range(0, len(activities), per_page))
+
+    raw, raw_bytes = _retained(lambda: json.loads(payload))
+    batch, batch_bytes = _retained(paged_batch)
+
+    def best(func):
+        times = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - t0)
+        return min(times)
+
+    expected, new = legacy_transform(raw), batch.to_frame()
+    pd.testing.assert_frame_equal(expected, new)
+    return {
+        "memory": {"dicts da API": raw_bytes, "ActivityBatch": batch_bytes},
+        "frame_bytes": int(new.memory_usage(deep=True).sum()),
+        "times": {
+            "legado (dicts -> registros -> DataFrame)": best(lambda: legacy_transform(raw)),
+            "ActivityBatch.from_raw": best(lambda: ActivityBatch.from_raw(raw)),
+            "ActivityBatch.from_raw + to_frame": best(lambda: ActivityBatch.from_raw(raw).to_frame()),
+        },
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ActivityBatch x dicts da API + DataFrame")
+    parser.add_argument("--activities", type=int, default=20000)
+    args = parser.parse_args()
+    warnings.simplefilter("ignore", UserWarning)  # to_period sem fuso, igual nos dois caminhos
+
+    n = args.activities
+    results = bench(n)
+    print(f"=== {n} atividades (formato do strava_stub) ===")
+    print("Memória retida:")
+    for label, size in results["memory"].items():
+        print(f"   {label:<44} {size / 2**20:>8.1f} MB  ({size / n:>6.0f} B/atividade)")
+    print(f"   {'DataFrame do ETL (to_frame, deep)':<44} {results['frame_bytes'] / 2**20:>8.1f} MB")
+    print("Transformação (o resultado é idêntico):")
+    base = next(iter(results["times"].values()))
+    for label, seconds in results["times"].items():
+        print(f"   {label:<44} {seconds * 1000:>8.1f} ms  ({base / seconds:>5.1f}x)")
@@ -0,0 +1,95 @@
+"""Tabela de atividades com paginação e ordenação no servidor (dah.py).
+
+As atividades ficam ordenadas por data (como no KpiIndex), e para cada coluna
+da tabela as ordens crescente e decrescente são calculadas uma vez por carga
+dos dados. Uma página sai então de um fatiamento:
+
+- sem filtro: a ordem pré-calculada já é a resposta; custa O(tamanho da página)
+- ordenado por data: os filtros de ano/mês/dia viram intervalos contíguos
+  (KpiIndex.filter_ranges), e as posições saem direto desses intervalos
+- outras colunas com filtro: uma máscara booleana sobre a ordem pré-calculada,
+  sem ordenar nada por requisição
+"""
+import numpy as np
+import pandas as pd
+
+from kpis import naive_dates
+
+TABLE_COLUMNS = ("date", "name", "type", "distance_km", "duration_min", "pace_min_km", "elevation_m")
+DEFAULT_SORT = ("date", False)  # mais recentes primeiro
+
+
+def _sort_key(values: pd.Series) -> np.ndarray:
+    """Chave numérica para o argsort (faltantes como NaN, que ficam no fim)"""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return naive_dates(values).to_numpy().astype("datetime64[ns]").view("int64")
+    if pd.api.types.is_numeric_dtype(values):
+        return values.to_numpy(dtype=float)
+    codes, _ = pd.factorize(values, sort=True)
+    return np.where(codes < 0, np.nan, codes.astype(float))
+
+
+class ActivityTable:
+    """Atividades em ordem de data com as ordens de cada coluna pré-calculadas"""
+
+    def __init__(self, df: pd.DataFrame, columns=TABLE_COLUMNS):
+        if df.empty or "date" not in df.columns:
+            df = pd.DataFrame({"date": pd.Series([], dtype="datetime64[ns]")})
+        dates = naive_dates(df["date"])
+        by_date = np.argsort(dates.to_numpy(), kind="stable")
+        self.frame = df[[col for col in columns if col in df.columns]].iloc[by_date].reset_index(drop=True)
+        self._ts = dates.to_numpy()[by_date].astype("datetime64[ns]").view("int64")
+
+        n = len(self.frame)
+        self._orders = {("date", True): np.arange(n), ("date", False): np.arange(n)[::-1]}
+        for col in self.frame.columns:
+            if col == "date":
+                continue
+            key = _sort_key(self.frame[col])
+            self._orders[(col, True)] = np.argsort(key, kind="stable")
+            self._orders[(col, False)] = np.argsort(-key, kind="stable")
+
+    def __len__(self):
+        return len(self.frame)
+
+    @property
+    def columns(self):
+        return list(self.frame.columns)
+
+    def _bounds(self, ranges):
+        """[(i, j)] das posições (em ordem de data) dentro de cada intervalo de datas"""
+        bounds = []
+        for start, end in ranges:
+            i = 0 if start is None else int(np.searchsorted(self._ts, pd.Timestamp(start).value, side="left"))
+            j = len(self._ts) if end is None else int(np.searchsorted(self._ts, pd.Timestamp(end).value, side="left"))
+            if j > i:
+                bounds.append((i, j))
+        return bounds
+
+    def page(self, ranges=((None, None),), sort_by=DEFAULT_SORT, page=0, page_size=25):
+        """(DataFrame da página, total de linhas no filtro)
+
+        ranges: intervalos [início, fim) de datas (KpiIndex.filter_ranges);
+        sort_by: (coluna, crescente); colunas desconhecidas usam DEFAULT_SORT.
+        """
+        column, ascending = sort_by if (sort_by[0], sort_by[1]) in self._orders else DEFAULT_SORT
+        bounds = self._bounds(ranges)
+        total = sum(j - i for i, j in bounds)
+        first = page * page_size
+        last = min(first + page_size, total)
+        if first >= total:
+            return self.frame.iloc[:0], total
+
+        if bounds == [(0, len(self))]:
+            positions = self._orders[(column, ascending)][first:last]
+        elif column == "date":
+            # os intervalos já estão em ordem de data: nada de máscara sobre o histórico todo
+            positions = np.concatenate([np.arange(i, j) for i, j in bounds])
+            positions = (positions if ascending else positions[::-1])[first:last]
+        else:
+            mask = np.zeros(len(self), dtype=bool)
+            for i, j in bounds:
+                mask[i:j] = True
+            order = self._orders[(column, ascending)]
+            positions = order[mask[order]][first:last]
+        return self.frame.iloc[positions], total
@@ -0,0 +1,128 @@
+"""Análises por intervalo de datas e janelas móveis sobre as atividades.
+
+Tudo parte de uma série diária indexada por data (um registro por dia do
+calendário, dias sem atividade = 0). Com ela:
+- totais de qualquer intervalo saem de somas acumuladas (duas consultas);
+- semanas ISO saem de um resample semanal;
+- janelas móveis (7/28/365 dias) e a razão de carga aguda:crônica saem de
+  rolling() vetorizado, então pedir todos os dias de 10 anos (~3650 linhas)
+  continua custando milissegundos.
+
+get_analytics() guarda uma instância por versão do dataset.
+"""
+from collections import OrderedDict
+import threading
+
+import numpy as np
+import pandas as pd
+
+from kpis import naive_dates
+
+DAILY_COLUMNS = ["distance_km", "duration_min", "elevation_m"]
+ROLLING_WINDOWS = (7, 28, 365)
+
+_CACHE_SIZE = 4
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def get_analytics(df: pd.DataFrame, version) -> "ActivityAnalytics":
+    """ActivityAnalytics memoizado pela versão do dataset"""
+    with _cache_lock:
+        if version in _cache:
+            _cache.move_to_end(version)
+            return _cache[version]
+    analytics = ActivityAnalytics(df)
+    with _cache_lock:
+        _cache[version] = analytics
+        while len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+    return analytics
+
+
+class ActivityAnalytics:
+    """Série diária e agregações derivadas de um conjunto de atividades"""
+
+    def __init__(self, df: pd.DataFrame):
+        if df.empty or "date" not in df.columns:
+            self.daily = pd.DataFrame(columns=DAILY_COLUMNS + ["runs"], index=pd.DatetimeIndex([], name="date"))
+        else:
+            data = pd.DataFrame({"date": naive_dates(df["date"]).dt.normalize()})
+            for column in DAILY_COLUMNS:
+                values = df[column] if column in df.columns else 0.0
+                data[column] = pd.to_numeric(values, errors="coerce").fillna(0.0)
+            data["runs"] = 1
+            data = data.dropna(subset=["date"])
+            daily = data.groupby("date").sum()
+            calendar = pd.date_range(daily.index.min(), daily.index.max(), freq="D", name="date")
+            self.daily = daily.reindex(calendar, fill_value=0)
+
+        # somas acumuladas com um zero à frente: total das posições [i, j) = cum[j] - cum[i]
+        self._cum = {
+            column: np.concatenate(([0.0], self.daily[column].to_numpy(dtype=float).cumsum()))
+            for column in self.daily.columns
+        }
+        self._load = None
+
+    @property
+    def empty(self) -> bool:
+        return self.daily.empty
+
+    # --- intervalos -----------------------------------------------------------
+
+    def range_totals(self, start=None, end=None) -> dict:
+        """Totais entre start e end (datas inclusivas; None = sem limite)"""
+        index = self.daily.index
+        i = 0 if start is None else int(index.searchsorted(pd.Timestamp(start).normalize(), side="left"))
+        j = len(index) if end is None else int(index.searchsorted(pd.Timestamp(end).normalize(), side="right"))
+        j = max(i, j)
+        return {column: float(cum[j] - cum[i]) for column, cum in self._cum.items()}
+
+    def iso_weeks(self) -> pd.DataFrame:
+        """Totais por semana ISO (segunda a domingo)"""
+        if self.empty:
+            return pd.DataFrame(columns=["iso_year", "iso_week", "week_start"] + list(self.daily.columns))
+        weekly = self.daily.resample("W-SUN").sum()
+        week_start = weekly.index - pd.Timedelta(days=6)
+        iso = week_start.isocalendar()
+        weekly.insert(0, "week_start", week_start)
+        weekly.insert(0, "iso_week", iso["week"].to_numpy())
+        weekly.insert(0, "iso_year", iso["year"].to_numpy())
+        return weekly.reset_index(drop=True)
+
+    # --- janelas móveis -------------------------------------------------------
+
+    def rolling(self, column="distance_km", windows=ROLLING_WINDOWS) -> pd.DataFrame:
+        """Soma móvel de `column` para cada janela (em dias), um valor por dia"""
+        series = self.daily[column].astype(float)
+        return pd.DataFrame(
+            {f"{column}_{w}d": series.rolling(w, min_periods=1).sum() for w in windows},
+            index=self.daily.index,
+        )
+
+    def acute_chronic_ratio(self, column="duration_min", acute=7, chronic=28) -> pd.Series:
+        """Razão entre a carga média diária aguda (7d) e crônica (28d)
+
+        A carga é o tempo em movimento por padrão. Enquanto a janela crônica
+        não tem carga, a razão fica indefinida (NaN).
+        """
+        series = self.daily[column].astype(float)
+        acute_load = series.rolling(acute, min_periods=1).mean()
+        chronic_load = series.rolling(chronic, min_periods=1).mean()
+        return (acute_load / chronic_load.replace(0, np.nan)).rename("acwr")
+
+    def training_load(self, start=None, end=None) -> pd.DataFrame:
+        """Distância móvel 7/28/365 dias e ACWR, recortados para [start, end]
+
+        As janelas são calculadas sobre todo o histórico antes do recorte, então
+        o primeiro dia do período já considera os dias anteriores a ele.
+        """
+        if self._load is None:
+            self._load = self.rolling("distance_km").join(self.acute_chronic_ratio())
+        load = self._load
+        if start is not None or end is not None:
+            load = load.loc[
+                None if start is None else pd.Timestamp(start).normalize():
+                None if end is None else pd.Timestamp(end).normalize()
+            ]
+        return load
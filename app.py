@@ -1,17 +1,25 @@
 import streamlit as st
 from pathlib import Path
+from collections import OrderedDict
+import threading
+import time
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 
 # importe as funções do seu etl.py (mesmo diretório)
 from etl import (
-    load_activities,
+    renew_access_token,
+    iter_activity_pages,
+    transform_activities,
     create_distance_over_time, 
     create_activity_type_pie,
     create_pace_trend,
     create_monthly_stats,
 )
+from activity_batch import ActivityBatch
+from kpis import KpiIndex
+import exports
 
 # === CONFIGURAÇÃO DE CORES E DIRETÓRIOS ===
 STRAVA_ORANGE = '#FC4C02'
@@ -150,80 +158,269 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
-@st.cache_data(ttl=3600)
-def load_cached_activities(per_page: int, max_pages: int) -> pd.DataFrame:
-    """Função para buscar dados do Strava, usa cache do Streamlit."""
-    return load_activities(per_page=per_page, max_pages=max_pages)
+# === CACHE DO CAMINHO DE RENDERIZAÇÃO ===
+# O Streamlit reexecuta o script inteiro a cada interação. Tudo o que deriva dos
+# dados fica em caches com chave (versão do dataset, filtros), de modo que mudar
+# um filtro só recalcula o que depende dele.
+RENDER_CACHE_VERSIONS = 2      # versões do dataset mantidas em memória
+RENDER_CACHE_ENTRIES = 256     # entradas por versão (LRU)
+
+def coerce_activity_types(df: pd.DataFrame) -> pd.DataFrame:
+    """Normaliza os tipos das colunas usadas pelo dashboard"""
+    if "duration_min" in df.columns:
+        df["duration_min"] = pd.to_numeric(df["duration_min"], errors="coerce").round(1)
+    if "distance_km" in df.columns:
+        df["distance_km"] = pd.to_numeric(df["distance_km"], errors="coerce").round(1)
+    if "date" in df.columns:
+        df["date"] = pd.to_datetime(df["date"], errors='coerce')
+    return df
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def read_activities_csv(path: str, mtime_ns: int, size: int) -> pd.DataFrame:
+    """Lê e tipa o CSV local; mtime/tamanho entram na chave e invalidam o cache"""
+    return coerce_activity_types(pd.read_csv(path, parse_dates=["date"]))
+
+@st.cache_resource
+def _render_store() -> dict:
+    """Cache compartilhado entre sessões, particionado pela versão do dataset"""
+    return {"lock": threading.Lock(), "versions": OrderedDict()}
+
+def render_cached(version: str, key: tuple, builder):
+    """Retorna builder() memoizado por (versão, chave)"""
+    store = _render_store()
+    with store["lock"]:
+        bucket = store["versions"].get(version)
+        if bucket is not None and key in bucket:
+            store["versions"].move_to_end(version)
+            bucket.move_to_end(key)
+            return bucket[key]
+
+    value = builder()
+
+    with store["lock"]:
+        bucket = store["versions"].setdefault(version, OrderedDict())
+        store["versions"].move_to_end(version)
+        bucket[key] = value
+        while len(bucket) > RENDER_CACHE_ENTRIES:
+            bucket.popitem(last=False)
+        while len(store["versions"]) > RENDER_CACHE_VERSIONS:
+            store["versions"].popitem(last=False)
+    return value
+
+@st.cache_resource
+def _export_cache() -> exports.ExportCache:
+    """Arquivos de download prontos, compartilhados entre sessões"""
+    return exports.ExportCache()
+
+def drop_render_version(version: str) -> None:
+    """Descarta as entradas de render e de export de uma versão antiga do dataset"""
+    store = _render_store()
+    with store["lock"]:
+        store["versions"].pop(version, None)
+    # chaves de export: (versão, filtro, formato, colunas)
+    _export_cache().discard(lambda key: key[0] == version)
+
+# === ATUALIZAÇÃO EM SEGUNDO PLANO ===
+# A busca na API roda numa thread; enquanto isso o dashboard continua sendo
+# renderizado a partir do CSV anterior. Ao terminar, o CSV é substituído de forma
+# atômica e a nova versão (mtime/tamanho) passa a ser lida no próximo rerun.
+
+class RefreshJob:
+    """Estado de uma atualização em andamento (compartilhado entre sessões)"""
+
+    def __init__(self, old_version, max_pages):
+        self.id = time.time_ns()
+        self.old_version = old_version
+        self.max_pages = max_pages
+        self.pages = 0
+        self.total = 0
+        self.messages = []
+        self.status = "running"   # running | done | empty | error
+        self.error = None
+
+@st.cache_resource
+def _refresh_state() -> dict:
+    return {"lock": threading.Lock(), "job": None}
+
+def run_refresh(job: RefreshJob, access_token: str, per_page: int, csv_path: Path) -> None:
+    """Corpo da thread: busca as páginas, transforma e troca o CSV"""
+    try:
+        batches = []
+        for page, page_items in iter_activity_pages(access_token, per_page, job.max_pages):
+            batches.append(ActivityBatch.from_raw(page_items))
+            job.pages, job.total = page, job.total + len(page_items)
+            job.messages.append(f"📄 Página {page}: {len(page_items)} atividades")
+
+        df_new = transform_activities(ActivityBatch.concat(batches))
+        if df_new.empty:
+            job.status = "empty"
+            return
+
+        tmp_path = csv_path.with_suffix(".tmp")
+        df_new.to_csv(tmp_path, index=False)
+        tmp_path.replace(csv_path)
+        drop_render_version(job.old_version)
+        job.status = "done"
+    except Exception as e:
+        # Em caso de erro o CSV anterior é mantido intacto
+        job.error = str(e)
+        job.status = "error"
+
+def start_refresh(old_version, per_page: int, max_pages: int, csv_path: Path):
+    """Renova o token e dispara a thread (no máximo uma atualização por vez)"""
+    state = _refresh_state()
+    with state["lock"]:
+        job = state["job"]
+        if job is not None and job.status == "running":
+            return job
+        access_token = renew_access_token()
+        if not access_token:
+            return None
+        job = RefreshJob(old_version, max_pages)
+        state["job"] = job
+    threading.Thread(target=run_refresh, args=(job, access_token, per_page, csv_path), daemon=True).start()
+    return job
+
+@st.fragment(run_every=1.0)
+def refresh_progress():
+    """Mostra o progresso da atualização e recarrega a página quando ela termina"""
+    job = _refresh_state()["job"]
+    if job is None:
+        return
+    if job.status == "running":
+        st.progress(min(job.pages / job.max_pages, 1.0),
+                    text=f"Buscando dados do Strava... {job.total} atividades")
+        for msg in job.messages[-3:]:
+            st.caption(msg)
+        return
+
+    st.session_state["refresh_seen"] = job.id
+    if job.status == "done":
+        st.rerun(scope="app")
+    elif job.status == "error":
+        st.error(f"❌ Erro na atualização: {job.error}")
+    else:
+        st.warning("⚠️ Nenhuma atividade encontrada")
+
+def filter_activities(df: pd.DataFrame, ano, mes, dia) -> pd.DataFrame:
+    """Aplica os filtros de ano/mês/dia com uma única máscara vetorizada"""
+    mask = pd.Series(True, index=df.index)
+    if ano != "Todos":
+        mask &= df["date"].dt.year == ano
+    if mes != "Todos":
+        mask &= df["date"].dt.month == mes
+    if dia != "Todos":
+        mask &= df["date"].dt.day == dia
+    return df[mask]
+
+def build_distance_figure(df_in: pd.DataFrame):
+    fig = create_distance_over_time(df_in)
+    if fig is None:
+        return None
+    fig.update_traces(
+        line=dict(color=LINE_COLOR, width=2),
+        mode='lines+markers', 
+        marker=dict(color=STRAVA_ORANGE, size=8, line=dict(width=1, color=LINE_COLOR)) 
+    )
+    fig.update_layout(xaxis_title=None, yaxis_title=None) 
+    return fig
+
+def build_pace_figure(df_in: pd.DataFrame):
+    fig = create_pace_trend(df_in)
+    if fig is None:
+        return None
+    fig.update_traces(
+        line=dict(color=LINE_COLOR, width=2),
+        mode='lines+markers',
+        marker=dict(color=STRAVA_ORANGE, size=8, line=dict(width=1, color=LINE_COLOR))
+    )
+    fig.update_layout(xaxis_title=None, yaxis_title=None)
+    return fig
+
+def build_pie_figure(df_in: pd.DataFrame):
+    fig = create_activity_type_pie(df_in)
+    if fig is None:
+        return None
+    fig.update_traces(
+        marker=dict(colors=[STRAVA_ORANGE, '#FF7F50', '#FFD700', '#A0522D']),
+        marker_line_color='white'
+    )
+    return fig
+
+def build_monthly_figure(df_in: pd.DataFrame):
+    fig = create_monthly_stats(df_in)
+    if fig is None:
+        return None
+    fig.update_traces(
+        marker_line_width=0, 
+        marker_line_color='rgba(0,0,0,0)', 
+        marker_cornerradius=5,
+        marker_color=STRAVA_ORANGE 
+    )
+    fig.update_layout(
+        xaxis_title=None, 
+        yaxis_title=None,
+        yaxis=dict(showgrid=False, zeroline=False, showticklabels=False)
+    ) 
+    return fig
 
 with st.sidebar:
     st.header("Configuração")
     per_page = st.number_input("Atividades por página", min_value=10, max_value=200, value=50, step=10)
     max_pages = st.number_input("Máx páginas", min_value=1, max_value=50, value=4)
-    btn_fetch = st.button("Buscar/Atualizar dados")
+    refresh_running = _refresh_state()["job"] is not None and _refresh_state()["job"].status == "running"
+    btn_fetch = st.button("Buscar/Atualizar dados", disabled=refresh_running)
+
+csv_path = OUT_DIR / "activities.csv"
+data_version = None
+try:
+    if csv_path.exists():
+        stat = csv_path.stat()
+        df = read_activities_csv(str(csv_path), stat.st_mtime_ns, stat.st_size)
+        data_version = f"csv-{stat.st_mtime_ns}-{stat.st_size}"
+        st.info(f"Carregado CSV local: {csv_path.name}")
+    else:
+        df = pd.DataFrame()
+except:
+    df = pd.DataFrame()
 
 if btn_fetch:
-    st.info("Buscando dados... aguarde")
-    st.cache_data.clear()
-    df = load_cached_activities(per_page, max_pages)
-else:
-    try:
-        csv_path = OUT_DIR / "activities.csv"
-        if csv_path.exists():
-            df = pd.read_csv(csv_path, parse_dates=["date"]) 
-            st.info(f"Carregado CSV local: {csv_path.name}")
-        else:
-            df = pd.DataFrame()
-            st.warning("Sem dados locais. Pressione 'Buscar/Atualizar dados'.")
-    except:
-        df = pd.DataFrame()
-        st.warning("Sem dados disponíveis. Pressione 'Buscar/Atualizar dados'.")
+    start_refresh(data_version, per_page, max_pages, csv_path)
+
+job = _refresh_state()["job"]
+if job is not None and st.session_state.get("refresh_seen") != job.id:
+    refresh_progress()
+elif job is not None and job.status == "error":
+    st.error(f"❌ Erro na última atualização: {job.error}")
+elif job is not None and job.status == "empty":
+    st.warning("⚠️ Nenhuma atividade encontrada")
 
 if df.empty:
-    st.error("❌ Não foi possível carregar os dados. Verifique suas credenciais no Streamlit Secrets.")
+    if job is not None and job.status == "running":
+        st.info("Buscando dados... o dashboard aparece assim que a primeira carga terminar.")
+    else:
+        st.warning("Sem dados locais. Pressione 'Buscar/Atualizar dados'.")
     st.stop()
 
-# === TRATAMENTO DE TIPOS E FILTROS ===
-if "duration_min" in df.columns:
-    df["duration_min"] = pd.to_numeric(df["duration_min"], errors="coerce").round(1)
-if "distance_km" in df.columns:
-    df["distance_km"] = pd.to_numeric(df["distance_km"], errors="coerce").round(1)
-if "date" in df.columns:
-    df["date"] = pd.to_datetime(df["date"], errors='coerce')
-
+# === FILTROS ===
 with st.sidebar:
     st.subheader("Filtros de Data")
     
-    anos = sorted(df["date"].dt.year.dropna().unique().tolist(), reverse=True)
+    anos = render_cached(data_version, ("anos",),
+                         lambda: sorted(df["date"].dt.year.dropna().unique().tolist(), reverse=True))
     ano_selecionado = st.selectbox("Ano", options=["Todos"] + anos, format_func=lambda x: "Todos" if x == "Todos" else str(x), key="ano")
     
-    if ano_selecionado == "Todos":
-        df_ano = df
-    else:
-        df_ano = df[df["date"].dt.year == ano_selecionado]
-
-    meses = sorted(df_ano["date"].dt.month.dropna().unique().tolist())
+    meses = render_cached(data_version, ("meses", ano_selecionado),
+                          lambda: sorted(filter_activities(df, ano_selecionado, "Todos", "Todos")["date"].dt.month.dropna().unique().tolist()))
     mes_selecionado = st.selectbox("Mês", options=["Todos"] + meses, format_func=lambda m: "Todos" if m == "Todos" else f"{m:02d}", key="mes")
     
-    if mes_selecionado == "Todos":
-        df_mes = df_ano
-    else:
-        df_mes = df_ano[df["date"].dt.month == mes_selecionado]
-
-    dias = sorted(df_mes["date"].dt.day.dropna().unique().tolist())
+    dias = render_cached(data_version, ("dias", ano_selecionado, mes_selecionado),
+                         lambda: sorted(filter_activities(df, ano_selecionado, mes_selecionado, "Todos")["date"].dt.day.dropna().unique().tolist()))
     dia_selecionado = st.selectbox("Dia", options=["Todos"] + dias, format_func=lambda d: "Todos" if d == "Todos" else f"{d:02d}", key="dia")
 
-mask = pd.Series([True] * len(df), index=df.index)
-
-if ano_selecionado != "Todos":
-    mask &= (df["date"].dt.year == ano_selecionado)
-
-if mes_selecionado != "Todos":
-    mask &= (df["date"].dt.month == mes_selecionado)
-
-if dia_selecionado != "Todos":
-    mask &= (df["date"].dt.day == dia_selecionado)
-
-df_filtered = df[mask].copy()
+filtro = (ano_selecionado, mes_selecionado, dia_selecionado)
+df_filtered = render_cached(data_version, ("filtro",) + filtro,
+                            lambda: filter_activities(df, *filtro))
 
 if ano_selecionado == "Todos" and mes_selecionado == "Todos" and dia_selecionado == "Todos":
     periodo_txt = "Todos os períodos"
@@ -239,22 +436,17 @@ else:
 st.markdown(f"**Período selecionado:** {periodo_txt} — **Atividades:** {len(df_filtered)}")
 
 # === KPIs (Cálculo e Exibição com CSS) ===
-total_runs = len(df_filtered)
-total_km = float(df_filtered["distance_km"].sum())
-pace_mean = df_filtered["duration_min"].sum() / total_km if total_km > 0 else None
-total_time_min = float(df_filtered["duration_min"].sum())
+# Índice de somas de prefixo: cada KPI sai de duas buscas binárias por intervalo
+kpi_index = render_cached(data_version, ("kpi_index",), lambda: KpiIndex(df))
+kpis = kpi_index.totals_for_filter(*filtro)
+total_runs = kpis["runs"]
+total_km = kpis["distance_km"]
+pace_mean = kpis["pace_mean"]
+total_time_min = kpis["duration_min"]
 
 if mes_selecionado != "Todos" and ano_selecionado != "Todos":
-    if mes_selecionado == 1:
-        prev_mes, prev_ano = 12, ano_selecionado - 1
-    else:
-        prev_mes, prev_ano = mes_selecionado - 1, ano_selecionado
-    
-    pm_mask = (df["date"].dt.month == prev_mes) & (df["date"].dt.year == prev_ano)
-    pm_df = df.loc[pm_mask]
-    pm_dist = pm_df["distance_km"].sum()
-    pace_prev = pm_df["duration_min"].sum() / pm_dist if pm_dist > 0 else None
-    prev_month_display = f"{prev_ano}-{prev_mes:02d}"
+    prev_month_display, prev_kpis = kpi_index.previous_month(ano_selecionado, mes_selecionado)
+    pace_prev = prev_kpis["pace_mean"]
 else:
     pace_prev = None
     prev_month_display = "N/A"
@@ -272,71 +464,60 @@ with k5:
     st.metric("Tempo total", format_minutes_hms(total_time_min))
 
 # === GRÁFICOS ===
+def cached_figure(name, builder):
+    """Figura memoizada por (versão, filtro)"""
+    return render_cached(data_version, ("fig", name) + filtro, lambda: builder(df_filtered))
+
 col1, col2 = st.columns(2)
 with col1:
     st.subheader("Distância acumulada")
-    fig1 = create_distance_over_time(df_filtered)
-    
-    fig1.update_traces(
-        line=dict(color=LINE_COLOR, width=2),
-        mode='lines+markers', 
-        marker=dict(color=STRAVA_ORANGE, size=8, line=dict(width=1, color=LINE_COLOR)) 
-    )
-    fig1.update_layout(xaxis_title=None, yaxis_title=None) 
-    
-    st.plotly_chart(fig1, width='stretch') 
+    fig1 = cached_figure("distancia", build_distance_figure)
+    if fig1:
+        st.plotly_chart(fig1, width='stretch') 
 
     st.subheader("Tendência de pace")
-    fig3 = create_pace_trend(df_filtered)
-    
-    fig3.update_traces(
-        line=dict(color=LINE_COLOR, width=2),
-        mode='lines+markers',
-        marker=dict(color=STRAVA_ORANGE, size=8, line=dict(width=1, color=LINE_COLOR))
-    )
-    fig3.update_layout(xaxis_title=None, yaxis_title=None)
-    
-    st.plotly_chart(fig3, width='stretch')
+    fig3 = cached_figure("pace", build_pace_figure)
+    if fig3:
+        st.plotly_chart(fig3, width='stretch')
 
 with col2:
     st.subheader("Tipos de atividade")
-    fig2 = create_activity_type_pie(df_filtered)
-    
-    fig2.update_traces(
-        marker=dict(colors=[STRAVA_ORANGE, '#FF7F50', '#FFD700', '#A0522D']),
-        marker_line_color='white'
-    )
-    
-    st.plotly_chart(fig2, width='stretch')
+    fig2 = cached_figure("tipos", build_pie_figure)
+    if fig2:
+        st.plotly_chart(fig2, width='stretch')
 
     st.subheader("Total corridas por km")
-    fig_km = total_runs_by_km(df_filtered)
+    fig_km = cached_figure("corridas_km", total_runs_by_km)
     if fig_km:
         st.plotly_chart(fig_km, width='stretch')
 
 st.subheader("Estatísticas mensais")
-fig_monthly = create_monthly_stats(df_filtered)
-
-fig_monthly.update_traces(
-    marker_line_width=0, 
-    marker_line_color='rgba(0,0,0,0)', 
-    marker_cornerradius=5,
-    marker_color=STRAVA_ORANGE 
-)
-fig_monthly.update_layout(
-    xaxis_title=None, 
-    yaxis_title=None,
-    yaxis=dict(showgrid=False, zeroline=False, showticklabels=False)
-) 
-
-st.plotly_chart(fig_monthly, width='stretch')
+fig_monthly = cached_figure("mensal", build_monthly_figure)
+if fig_monthly:
+    st.plotly_chart(fig_monthly, width='stretch')
 
 st.subheader("Pace médio por categoria")
-fig_cat = pace_by_category(df_filtered)
+fig_cat = cached_figure("categoria", pace_by_category)
 if fig_cat:
     st.plotly_chart(fig_cat, width='stretch')
 
-csv_bytes = df_filtered.to_csv(index=False).encode("utf-8")
-st.download_button("Baixar CSV", data=csv_bytes, file_name="activities.csv", mime="text/csv")
+# === EXPORTAÇÃO ===
+# O arquivo só é gerado quando alguém clica em baixar (o callable roda fora do
+# rerun) e fica em cache por (versão, filtro, formato, colunas)
+with st.expander("Exportar dados"):
+    export_fmt = st.radio("Formato", options=exports.available_formats(), horizontal=True, key="export_fmt")
+    export_cols = st.multiselect("Colunas", options=list(df.columns), default=exports.default_columns(df),
+                                 key="export_cols", help="Nenhuma selecionada exporta todas")
+    export_key = (data_version, filtro, export_fmt, tuple(export_cols))
+    export_cache = _export_cache()
+    st.download_button(
+        f"Baixar {export_fmt.upper()}",
+        data=lambda: export_cache.get_or_build(
+            export_key, lambda: exports.iter_export(df_filtered, export_fmt, export_cols)),
+        file_name=exports.file_name("activities", export_fmt),
+        mime=exports.FORMATS[export_fmt][1],
+    )
 
-st.write("Período total:", df["date"].min().strftime('%Y-%m-%d'), "→", df["date"].max().strftime('%Y-%m-%d'))
\ No newline at end of file
+periodo_total = render_cached(data_version, ("periodo_total",),
+                              lambda: (df["date"].min().strftime('%Y-%m-%d'), df["date"].max().strftime('%Y-%m-%d')))
+st.write("Período total:", periodo_total[0], "→", periodo_total[1])
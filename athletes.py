@@ -0,0 +1,137 @@
+"""Ingestão de vários atletas: registro de credenciais e sincronização paralela.
+
+O registro fica no mesmo secrets.toml usado pelo Streamlit (ou no arquivo
+apontado por STRAVA_ATHLETES_FILE), uma tabela por atleta:
+
+    STRAVA_CLIENT_ID = "..."          # app do Strava compartilhado
+    STRAVA_CLIENT_SECRET = "..."
+
+    [athletes.12345]
+    name = "Ana"
+    refresh_token = "..."
+    # client_id / client_secret opcionais, se o atleta usar outro app
+
+Sem a seção [athletes], o STRAVA_REFRESH_TOKEN de sempre vira o atleta
+"default". Cada sincronização une as atividades recentes à partição do
+atleta (store.py), sem apagar o histórico mais antigo, e atualiza os
+agregados dele no ranking do clube (leaderboard.py).
+
+Uso:
+    python athletes.py                  # sincroniza todos em paralelo
+    python athletes.py --only 12345     # só os atletas informados
+"""
+import argparse
+import os
+import time
+import tomllib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+import leaderboard
+import store
+from raw_cache import CACHE_DIR, RawPageCache
+from records import RecordsIndex
+
+DEFAULT_REGISTRY = Path(__file__).resolve().parent / ".streamlit" / "secrets.toml"
+
+
+def load_registry(path=None) -> dict:
+    """{athlete_id: {name, client_id, client_secret, refresh_token}}"""
+    path = Path(path or os.environ.get("STRAVA_ATHLETES_FILE", DEFAULT_REGISTRY))
+    # utf-8-sig: o secrets.toml gerado no Windows pode ter BOM
+    data = tomllib.loads(path.read_text(encoding="utf-8-sig"))
+
+    client_id = data.get("STRAVA_CLIENT_ID")
+    client_secret = data.get("STRAVA_CLIENT_SECRET")
+    registry = {}
+    for athlete_id, entry in data.get("athletes", {}).items():
+        registry[str(athlete_id)] = {
+            "name": entry.get("name", str(athlete_id)),
+            "client_id": entry.get("client_id", client_id),
+            "client_secret": entry.get("client_secret", client_secret),
+            "refresh_token": entry["refresh_token"],
+        }
+    if not registry and data.get("STRAVA_REFRESH_TOKEN"):
+        registry[store.DEFAULT_ATHLETE] = {
+            "name": "Atleta",
+            "client_id": client_id,
+            "client_secret": client_secret,
+            "refresh_token": data["STRAVA_REFRESH_TOKEN"],
+        }
+    return registry
+
+
+def sync_athlete(athlete_id, credentials, per_page=50, max_pages=20, use_cache=False) -> dict:
+    """Sincroniza um atleta na sua partição; retorna um resumo da execução"""
+    # import tardio: etl importa streamlit, que só é necessário para sincronizar
+    from etl import request_access_token, stream_activities_to_csv
+
+    t0 = time.perf_counter()
+    access_token = request_access_token(credentials["client_id"], credentials["client_secret"],
+                                        credentials["refresh_token"])
+    partition = store.partition_csv(athlete_id)
+    partition.parent.mkdir(parents=True, exist_ok=True)
+    cache = RawPageCache(CACHE_DIR / str(athlete_id)) if use_cache else None
+    stats = {}
+    # só as per_page * max_pages mais recentes vêm da API: elas são unidas por id à
+    # partição, que mantém o histórico mais antigo (ex.: gravado pelo backfill.py)
+    fetched_path = partition.with_name("sync.csv")
+    total = stream_activities_to_csv(access_token, fetched_path, per_page, max_pages,
+                                     stats=stats, cache=cache)
+    if total:
+        records = RecordsIndex()
+        try:
+            store.merge_activities([fetched_path, partition], partition, records.update)
+        finally:
+            fetched_path.unlink(missing_ok=True)
+        records.save(store.partition_records(athlete_id))
+    store.register_athlete(athlete_id, credentials.get("name"))
+    leaderboard.refresh_athlete(athlete_id)
+    return {"athlete_id": athlete_id, "activities": total, "seconds": time.perf_counter() - t0, "stats": stats}
+
+
+def sync_all(registry, max_workers=4, per_page=50, max_pages=20, use_cache=False, on_done=None):
+    """Sincroniza vários atletas em paralelo (threads: o trabalho é quase todo rede)
+
+    Uma falha num atleta não interrompe os demais; o erro vai no resumo.
+    `on_done(resumo)` é chamado a cada atleta concluído.
+    """
+    results = []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(sync_athlete, athlete_id, creds, per_page, max_pages, use_cache): athlete_id
+            for athlete_id, creds in registry.items()
+        }
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"athlete_id": futures[future], "error": str(e)}
+            results.append(result)
+            if on_done is not None:
+                on_done(result)
+    return results
+
+
+def _print_result(result):
+    if "error" in result:
+        print(f"❌ {result['athlete_id']}: {result['error']}")
+    else:
+        print(f"✅ {result['athlete_id']}: {result['activities']} atividades em {result['seconds']:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sincroniza as atividades de vários atletas")
+    parser.add_argument("--registry", help="arquivo TOML com as credenciais (padrão: .streamlit/secrets.toml)")
+    parser.add_argument("--only", nargs="*", help="ids dos atletas a sincronizar")
+    parser.add_argument("--workers", type=int, default=4, help="sincronizações simultâneas")
+    parser.add_argument("--max-pages", type=int, default=20)
+    parser.add_argument("--cache", action="store_true", help="guarda as respostas brutas da API em disco")
+    args = parser.parse_args()
+
+    registry = load_registry(args.registry)
+    if args.only:
+        registry = {k: v for k, v in registry.items() if k in set(args.only)}
+    print(f"=== Sincronizando {len(registry)} atleta(s) com {args.workers} worker(s) ===")
+    sync_all(registry, max_workers=args.workers, max_pages=args.max_pages, use_cache=args.cache,
+             on_done=_print_result)
@@ -0,0 +1,259 @@
+"""Backfill do histórico completo em paralelo, com checkpoint por fatia.
+
+O intervalo [--since, agora) é dividido em fatias de datas (parâmetros
+after/before da API). Cada fatia é baixada, transformada e gravada por um
+processo do pool em data/backfill/<atleta>/shards/<inicio>_<fim>.csv.
+
+O plano de fatias fica em plan.json e as fatias concluídas em checkpoint.json
+(gravado a cada fatia). Se o backfill cair no meio, rodar o mesmo comando de
+novo retoma só as fatias que faltam (com outros --since/--until/--shard-days
+o comando falha; --restart descarta o plano). Com todas concluídas, as fatias
+são unidas (sem ids repetidos) na partição do atleta, mantendo o que ela já
+tinha fora das fatias, recordes e ranking do clube são atualizados como numa
+sincronização normal (athletes.py), e plano, checkpoint e fatias são apagados.
+
+Uso:
+    python backfill.py --since 2015-01-01 --shard-days 90 --workers 4
+    python backfill.py --athlete 12345 --restart
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import leaderboard
+import store
+from athletes import load_registry
+from records import RecordsIndex
+
+BACKFILL_DIR = store.DATA_DIR.parent / "backfill"
+
+DEFAULT_SINCE = "2009-01-01"  # o Strava não tem atividades antes disso
+DEFAULT_SHARD_DAYS = 90
+
+
+def plan_shards(since, until, shard_days=DEFAULT_SHARD_DAYS) -> list:
+    """[(after, before)] em epoch (s), do mais antigo para o mais recente
+
+    after/before são exclusivos na API, então cada fatia começa 1s antes do
+    seu início; a sobreposição de 1s é resolvida pelo id na junção.
+    """
+    shards = []
+    start = since
+    while start < until:
+        end = min(start + timedelta(days=shard_days), until)
+        shards.append((int(start.timestamp()) - 1, int(end.timestamp())))
+        start = end
+    return shards
+
+
+def shard_name(shard) -> str:
+    after, before = shard
+    fmt = "%Y%m%d"
+    return (f"{datetime.fromtimestamp(after + 1, timezone.utc):{fmt}}_"
+            f"{datetime.fromtimestamp(before, timezone.utc):{fmt}}")
+
+
+def _write_json(path: Path, data):
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(data, indent=1), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def fetch_shard(access_token, shard, path, per_page=200, max_pages=1000) -> dict:
+    """Baixa uma fatia para `path` (roda num processo do pool)"""
+    # import tardio: etl importa streamlit, carregado só nos processos do pool
+    from etl import stream_activities_to_csv
+
+    t0 = time.perf_counter()
+    after, before = shard
+    total = stream_activities_to_csv(access_token, path, per_page, max_pages, after=after, before=before)
+    return {"activities": total, "seconds": time.perf_counter() - t0}
+
+
+class Backfill:
+    """Estado em disco de um backfill: plano, checkpoint e fatias"""
+
+    def __init__(self, athlete_id, root=BACKFILL_DIR):
+        self.athlete_id = str(athlete_id)
+        self.root = Path(root) / self.athlete_id
+        self.shards_dir = self.root / "shards"
+        self.plan_path = self.root / "plan.json"
+        self.checkpoint_path = self.root / "checkpoint.json"
+
+    def reset(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def plan(self, since, until, shard_days) -> list:
+        """Plano salvo (ao retomar) ou um novo plano para [since, until)
+
+        `until=None` é "agora" (fixado no plano novo). Um plano salvo para
+        outro intervalo ou outro shard_days gera ValueError: retomar com ele
+        ignoraria os novos parâmetros.
+        """
+        requested = {
+            "since": since.isoformat(),
+            "until": until.isoformat() if until else None,
+            "shard_days": shard_days,
+        }
+        try:
+            plan = json.loads(self.plan_path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            until = until or datetime.now(timezone.utc)
+            plan = {
+                "requested": requested,
+                "since": since.isoformat(),
+                "until": until.isoformat(),
+                "shard_days": shard_days,
+                "shards": plan_shards(since, until, shard_days),
+            }
+            self.shards_dir.mkdir(parents=True, exist_ok=True)
+            _write_json(self.plan_path, plan)
+            return [tuple(shard) for shard in plan["shards"]]
+
+        saved = plan.get("requested") or {k: plan[k] for k in ("since", "until", "shard_days")}
+        if saved != requested:
+            raise ValueError(
+                f"Há um backfill inacabado de {self.athlete_id} com outros parâmetros "
+                f"(salvo: {saved}; pedido: {requested}). Rode com os mesmos parâmetros para "
+                f"retomar ou use --restart para descartá-lo."
+            )
+        return [tuple(shard) for shard in plan["shards"]]
+
+    def completed(self) -> dict:
+        try:
+            return json.loads(self.checkpoint_path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return {}
+
+    def mark_done(self, done: dict, shard, result: dict):
+        done[shard_name(shard)] = result
+        _write_json(self.checkpoint_path, done)
+
+    def shard_path(self, shard) -> Path:
+        return self.shards_dir / f"{shard_name(shard)}.csv"
+
+    def pending(self, shards) -> list:
+        done = self.completed()
+        # fatia vazia não gera CSV; a com atividades precisa do arquivo no disco
+        return [
+            shard for shard in shards
+            if shard_name(shard) not in done
+            or (done[shard_name(shard)]["activities"] and not self.shard_path(shard).exists())
+        ]
+
+    def merge(self, shards, out_path) -> tuple:
+        """Une as fatias em `out_path`, sem ids repetidos; retorna (total, recordes)
+
+        Atividades que já estavam em `out_path` e não vieram em nenhuma fatia
+        (ex.: fora do intervalo do backfill) são mantidas.
+        """
+        records = RecordsIndex()
+        # fatias primeiro: numa atividade repetida vale a versão recém-baixada
+        sources = [self.shard_path(shard) for shard in shards] + [Path(out_path)]
+        total = store.merge_activities(sources, out_path, records.update)
+        return total, records
+
+
+def run_backfill(athlete_id, credentials, since, until=None, shard_days=DEFAULT_SHARD_DAYS,
+                 workers=4, per_page=200, restart=False, out_path=None) -> dict:
+    """Executa (ou retoma) o backfill de um atleta; retorna o resumo"""
+    # import tardio: etl importa streamlit, que só é necessário para sincronizar
+    from etl import request_access_token
+
+    job = Backfill(athlete_id)
+    if restart:
+        job.reset()
+    shards = job.plan(since, until, shard_days)
+    pending = job.pending(shards)
+    print(f"=== Backfill {athlete_id}: {len(shards)} fatias, {len(pending)} pendente(s), "
+          f"{workers} processo(s) ===")
+
+    t0 = time.perf_counter()
+    failed = 0
+    fetched = 0
+    if pending:
+        access_token = request_access_token(credentials["client_id"], credentials["client_secret"],
+                                            credentials["refresh_token"])
+        done = job.completed()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(fetch_shard, access_token, shard, job.shard_path(shard), per_page): shard
+                for shard in pending
+            }
+            for future in as_completed(futures):
+                shard = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    failed += 1
+                    print(f"❌ Fatia {shard_name(shard)}: {e}")
+                    continue
+                job.mark_done(done, shard, result)
+                fetched += result["activities"]
+                print(f"✅ Fatia {shard_name(shard)}: {result['activities']} atividades "
+                      f"em {result['seconds']:.2f}s")
+    fetch_wall = time.perf_counter() - t0
+
+    summary = {
+        "athlete_id": athlete_id, "shards": len(shards), "fetched_shards": len(pending) - failed,
+        "failed_shards": failed, "fetched_activities": fetched, "fetch_seconds": fetch_wall,
+    }
+    if failed:
+        print(f"⚠️ {failed} fatia(s) falharam; rode o mesmo comando de novo para retomar")
+        return summary
+
+    out_path = out_path or store.partition_csv(athlete_id)
+    t1 = time.perf_counter()
+    total, records = job.merge(shards, out_path)
+    if total and Path(out_path) == store.partition_csv(athlete_id):
+        records.save(store.partition_records(athlete_id))
+        store.register_athlete(athlete_id, credentials.get("name"))
+        leaderboard.refresh_athlete(athlete_id)
+    # concluído: o próximo backfill planeja de novo em vez de reaproveitar este plano
+    job.reset()
+    summary.update(activities=total, merge_seconds=time.perf_counter() - t1,
+                   wall_seconds=time.perf_counter() - t0)
+    return summary
+
+
+def print_summary(summary: dict):
+    fetch = summary["fetch_seconds"]
+    if summary["fetched_shards"] and fetch > 0:
+        print(f"\n📊 Download: {summary['fetched_shards']} fatias em {fetch:.2f}s "
+              f"({summary['fetched_shards'] / fetch:.1f} fatias/s, "
+              f"{summary['fetched_activities'] / fetch:.0f} ativ./s)")
+    if "activities" in summary:
+        print(f"   Junção: {summary['activities']} atividades em {summary['merge_seconds']:.2f}s")
+        print(f"   Tempo total: {summary['wall_seconds']:.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill paralelo do histórico do Strava")
+    parser.add_argument("--athlete", help="id do atleta no registro (padrão: o primeiro)")
+    parser.add_argument("--registry", help="arquivo TOML com as credenciais (padrão: .streamlit/secrets.toml)")
+    parser.add_argument("--since", default=DEFAULT_SINCE, help="data inicial (AAAA-MM-DD)")
+    parser.add_argument("--until", help="data final (AAAA-MM-DD; padrão: agora)")
+    parser.add_argument("--shard-days", type=int, default=DEFAULT_SHARD_DAYS, help="dias por fatia")
+    parser.add_argument("--workers", type=int, default=4, help="processos simultâneos")
+    parser.add_argument("--per-page", type=int, default=200, help="atividades por página (máx. 200 no Strava)")
+    parser.add_argument("--restart", action="store_true", help="descarta o checkpoint e começa do zero")
+    parser.add_argument("--out", help="CSV de saída (padrão: partição do atleta)")
+    args = parser.parse_args()
+
+    registry = load_registry(args.registry)
+    athlete_id = args.athlete or next(iter(registry))
+    since = datetime.fromisoformat(args.since).replace(tzinfo=timezone.utc)
+    until = datetime.fromisoformat(args.until).replace(tzinfo=timezone.utc) if args.until else None
+    try:
+        summary = run_backfill(athlete_id, registry[athlete_id], since, until, args.shard_days, args.workers,
+                               args.per_page, args.restart, args.out)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print_summary(summary)
@@ -0,0 +1,292 @@
+"""Benchmarks do ETL, da carga dos dados e dos callbacks do dashboard.
+
+Gera datasets sintéticos (1k/10k/100k/1M atividades por padrão) e mede:
+- etl.transform_activities sobre as respostas brutas da API;
+- dah.load_data (CSV) contra formatos binários (Parquet se houver pyarrow, pickle);
+- dah.filter_data, dah.update_month_day_options, dah.update_kpis e dah.dashboard_figures
+  (sem o cache de resultados);
+- cada create_* do dah e do etl.
+
+Os resultados vão para benchmarks/<commit>.json (um arquivo por commit), para
+comparar execuções:
+
+    python benchmarks.py                               # todos os tamanhos
+    python benchmarks.py --sizes 1000,10000 --only dah.
+    python benchmarks.py --compare benchmarks/abc1234.json
+
+Cada caso roda pelo menos --rounds vezes ou até --budget segundos (o que vier
+primeiro depois da primeira execução). Casos que falham ficam registrados com
+o erro, sem interromper os demais.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+import traceback
+import warnings
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+RESULTS_DIR = Path(__file__).resolve().parent / "benchmarks"
+DEFAULT_SIZES = (1_000, 10_000, 100_000, 1_000_000)
+# acima disso as respostas brutas (lista de dicts) ocupam GBs; transform fica de fora
+MAX_RAW_SIZE = 100_000
+# trendline="lowess" é ~quadrático: 10k pontos já levam segundos
+LOWESS_MAX_SIZE = 10_000
+LOWESS_BUILDERS = {"create_pace_trend", "create_calories_vs_distance"}
+REGRESSION_RATIO = 1.25
+
+TYPES = np.array(["Run", "Ride", "Walk", "Hike"])
+TYPE_WEIGHTS = [0.55, 0.25, 0.15, 0.05]
+# percurso fixo: o conteúdo do polyline não influencia nenhum dos casos medidos
+POLYLINE = "nnmoCvffzGcBoAsAkBy@eCMiCZ}BbAmB"
+
+
+# === DATASETS ===
+
+def synthetic_raw(n, seed=0, years=10) -> list:
+    """Respostas brutas de /athlete/activities (formato do Strava), vetorizado"""
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp("2025-06-01")
+    starts = end - pd.to_timedelta(np.sort(rng.integers(0, years * 365 * 86400, n))[::-1], unit="s")
+    types = rng.choice(TYPES, n, p=TYPE_WEIGHTS)
+    distance = np.where(types == "Ride", rng.uniform(15, 120, n), rng.uniform(2, 25, n)) * 1000
+    speed = np.where(types == "Ride", rng.uniform(5, 10, n), rng.uniform(1, 4, n))
+    moving = (distance / speed).astype(int)
+    elevation = np.round(distance / 1000 * rng.uniform(2, 15, n), 1)
+    kudos = rng.integers(0, 30, n)
+    dates = starts.strftime("%Y-%m-%dT%H:%M:%SZ")
+    return [
+        {
+            "id": 10_000_000_000 + i, "name": f"{t} {i}", "type": t, "start_date_local": d,
+            "distance": float(dist), "moving_time": int(mt), "total_elevation_gain": float(el),
+            "average_speed": float(sp), "max_speed": float(sp) * 1.4, "kudos_count": int(k),
+            "map": {"summary_polyline": POLYLINE},
+        }
+        for i, (t, d, dist, mt, el, sp, k) in enumerate(zip(types, dates, distance, moving, elevation, speed, kudos))
+    ]
+
+
+def synthetic_frame(n, seed=0, years=10) -> pd.DataFrame:
+    """Mesmas colunas do CSV gravado pelo ETL, gerado direto em NumPy"""
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp("2025-06-01", tz="UTC")
+    dates = end - pd.to_timedelta(np.sort(rng.integers(0, years * 365 * 86400, n))[::-1], unit="s")
+    types = rng.choice(TYPES, n, p=TYPE_WEIGHTS)
+    distance_km = np.where(types == "Ride", rng.uniform(15, 120, n), rng.uniform(2, 25, n))
+    speed_kmh = np.where(types == "Ride", rng.uniform(18, 35, n), rng.uniform(4, 15, n))
+    duration_min = distance_km / speed_kmh * 60
+    df = pd.DataFrame({
+        "id": 10_000_000_000 + np.arange(n),
+        "name": pd.Series(types).str.cat(pd.Series(np.arange(n)).astype(str), sep=" "),
+        "type": types,
+        "date": dates,
+        "distance_km": distance_km.round(1),
+        "duration_min": duration_min,
+        "elevation_m": (distance_km * rng.uniform(2, 15, n)).round(1),
+        "avg_speed_kmh": speed_kmh,
+        "max_speed_kmh": speed_kmh * 1.4,
+        "calories": 0,
+        "kudos": rng.integers(0, 30, n),
+        "polyline": POLYLINE,
+    })
+    df["pace_min_km"] = (df["duration_min"] / df["distance_km"].replace({0: np.nan})).round(1)
+    df["date_only"] = df["date"].dt.date
+    df["month_year"] = df["date"].dt.strftime("%Y-%m")
+    return df
+
+
+def prepare_datasets(sizes, data_dir: Path) -> dict:
+    """Grava CSV/pickle/Parquet de cada tamanho na partição bench-<n>"""
+    paths = {}
+    for n in sizes:
+        part = data_dir / f"bench-{n}"
+        part.mkdir(parents=True, exist_ok=True)
+        csv_path = part / "activities.csv"
+        if not csv_path.exists():
+            t0 = time.perf_counter()
+            df = synthetic_frame(n)
+            df.to_csv(csv_path, index=False)
+            df.to_pickle(part / "activities.pkl")
+            try:
+                df.to_parquet(part / "activities.parquet", index=False)
+            except ImportError:
+                pass
+            print(f"📁 Dataset {n:>9,}: {time.perf_counter() - t0:.1f}s ({csv_path})")
+        paths[n] = part
+    return paths
+
+
+# === MEDIÇÃO ===
+
+def measure(fn, rounds=3, budget=2.0) -> dict:
+    """Tempos de fn(): ao menos `rounds` execuções ou `budget` segundos"""
+    times = []
+    try:
+        # load_data e os callbacks imprimem a cada chamada
+        with contextlib.redirect_stdout(io.StringIO()):
+            while True:
+                t0 = time.perf_counter()
+                fn()
+                times.append(time.perf_counter() - t0)
+                if len(times) >= rounds or sum(times) >= budget:
+                    break
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}", "traceback": traceback.format_exc(limit=3)}
+    return {"min": min(times), "median": statistics.median(times), "rounds": len(times)}
+
+
+def cases_for_size(n, part: Path, dah, etl):
+    """[(nome, função)] para um tamanho; os dados são carregados fora do tempo medido"""
+    athlete = part.name
+    with contextlib.redirect_stdout(io.StringIO()):
+        df = dah.load_data(part / "activities.csv")
+    year = int(df["date"].dt.year.max())
+    month = int(df.loc[df["date"].dt.year == year, "date"].dt.month.max())
+    with contextlib.redirect_stdout(io.StringIO()):
+        data = dah.get_athlete_data(athlete)
+    analytics = dah.get_analytics(data.df, data.version)
+    load = analytics.training_load()
+    weeks = analytics.iso_weeks()
+    etl_df = df.copy()
+    etl_df["month_year"] = etl_df["date"].dt.to_period("M")
+    raw = synthetic_raw(n) if n <= MAX_RAW_SIZE else None
+    parquet_path = part / "activities.parquet"
+
+    cases = [
+        ("etl.transform_activities", (lambda: etl.transform_activities(raw)) if raw else None),
+        ("load.csv (dah.load_data)", lambda: dah.load_data(part / "activities.csv")),
+        ("load.pickle", lambda: pd.read_pickle(part / "activities.pkl")),
+        ("load.parquet", (lambda: pd.read_parquet(parquet_path)) if parquet_path.exists() else None),
+        ("dah.filter_data (ano)", lambda: dah.filter_data(df, year, "Todos", "Todos")),
+        ("dah.filter_data (ano/mês)", lambda: dah.filter_data(df, year, month, "Todos")),
+        ("dah.update_month_day_options", lambda: dah.update_month_day_options(athlete, year, month)),
+        ("dah.update_kpis (ano)", lambda: dah.update_kpis(athlete, year, "Todos", "Todos")),
+        ("dah.dashboard_figures (Todos)", lambda: dah.dashboard_figures(athlete, "Todos", "Todos", "Todos")),
+        ("dah.dashboard_figures (ano)", lambda: dah.dashboard_figures(athlete, year, "Todos", "Todos")),
+        ("dah.create_distance_over_time", lambda: dah.create_distance_over_time(df)),
+        ("dah.create_activity_type_pie", lambda: dah.create_activity_type_pie(df)),
+        ("dah.create_pace_trend", lambda: dah.create_pace_trend(df)),
+        ("dah.create_monthly_stats", lambda: dah.create_monthly_stats(df)),
+        ("dah.total_runs_by_km", lambda: dah.total_runs_by_km(df)),
+        ("dah.pace_by_category", lambda: dah.pace_by_category(df)),
+        ("dah.create_rolling_distance", lambda: dah.create_rolling_distance(load)),
+        ("dah.create_acwr_chart", lambda: dah.create_acwr_chart(load)),
+        ("dah.create_iso_week_chart", lambda: dah.create_iso_week_chart(weeks)),
+    ]
+    for name in ("create_distance_over_time", "create_activity_type_pie", "create_pace_trend",
+                 "create_speed_vs_distance", "create_monthly_stats", "create_elevation_histogram",
+                 "create_calories_vs_distance"):
+        builder = getattr(etl, name)
+        skip = name in LOWESS_BUILDERS and n > LOWESS_MAX_SIZE
+        cases.append((f"etl.{name}", None if skip else (lambda builder=builder: builder(etl_df))))
+    return cases
+
+
+def git_commit() -> str:
+    try:
+        sha = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             check=True, cwd=RESULTS_DIR.parent).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True,
+                               text=True, cwd=RESULTS_DIR.parent).stdout.strip()
+        return f"{sha}-dirty" if dirty else sha
+    except (OSError, subprocess.CalledProcessError):
+        return "sem-git"
+
+
+def run(sizes, only=None, rounds=3, budget=2.0, data_dir=None) -> dict:
+    data_dir = Path(data_dir or Path(tempfile.gettempdir()) / "strava-bench")
+    # o dah lê as partições de STRAVA_DATA_DIR no import
+    os.environ["STRAVA_DATA_DIR"] = str(data_dir)
+    parts = prepare_datasets(sizes, data_dir)
+
+    import plotly
+    import dah
+    import etl
+
+    dah.RESULT_CACHE.enabled = False  # mede o cálculo, não o cache
+
+    report = {
+        "commit": git_commit(),
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "plotly": plotly.__version__,
+        "machine": f"{platform.system()} {platform.machine()} ({os.cpu_count()} CPUs)",
+        "results": {},
+    }
+    for n in sizes:
+        print(f"\n=== {n:,} atividades ===")
+        for name, fn in cases_for_size(n, parts[n], dah, etl):
+            if only and not any(name.startswith(prefix) for prefix in only):
+                continue
+            if fn is None:
+                result = {"skipped": True}
+                print(f"   {name:<34} ⏭️  pulado")
+            else:
+                result = measure(fn, rounds, budget)
+                if "error" in result:
+                    print(f"   {name:<34} ❌ {result['error'][:80]}")
+                else:
+                    print(f"   {name:<34} {result['median'] * 1000:>10.2f} ms  "
+                          f"(mín {result['min'] * 1000:.2f}, {result['rounds']}x)")
+            report["results"].setdefault(name, {})[str(n)] = result
+    return report
+
+
+def save(report) -> Path:
+    """Grava (ou completa, se o commit já tiver resultados) benchmarks/<commit>.json"""
+    RESULTS_DIR.mkdir(exist_ok=True)
+    path = RESULTS_DIR / f"{report['commit']}.json"
+    if path.exists():
+        previous = json.loads(path.read_text(encoding="utf-8"))["results"]
+        for name, by_size in report["results"].items():
+            previous.setdefault(name, {}).update(by_size)
+        report = {**report, "results": previous}
+    path.write_text(json.dumps(report, indent=1, ensure_ascii=False), encoding="utf-8")
+    return path
+
+
+def compare(report, baseline_path):
+    """Imprime a razão atual/base das medianas e marca regressões"""
+    baseline = json.loads(Path(baseline_path).read_text(encoding="utf-8"))
+    print(f"\n=== {report['commit']} vs {baseline['commit']} (mediana atual / base) ===")
+    regressions = 0
+    for name, by_size in report["results"].items():
+        for size, result in by_size.items():
+            base = baseline["results"].get(name, {}).get(size, {})
+            if "median" not in result or "median" not in base:
+                continue
+            ratio = result["median"] / base["median"]
+            flag = "⚠️" if ratio > REGRESSION_RATIO else "  "
+            regressions += ratio > REGRESSION_RATIO
+            print(f" {flag} {name:<34} {int(size):>9,} {ratio:>6.2f}x")
+    print(f"\n{regressions} regressão(ões) acima de {REGRESSION_RATIO:.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks do ETL e do dashboard")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="tamanhos dos datasets, separados por vírgula")
+    parser.add_argument("--only", nargs="*", help="prefixos dos casos a rodar (ex.: dah. load.)")
+    parser.add_argument("--rounds", type=int, default=3, help="execuções mínimas por caso")
+    parser.add_argument("--budget", type=float, default=2.0, help="segundos por caso")
+    parser.add_argument("--data-dir", help="onde gerar os datasets (padrão: temp/strava-bench)")
+    parser.add_argument("--compare", help="JSON de uma execução anterior para comparar")
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore")
+    sizes = [int(s) for s in args.sizes.split(",")]
+    report = run(sizes, args.only, args.rounds, args.budget, args.data_dir)
+    if args.compare:
+        compare(report, args.compare)
+    print(f"\n✅ Resultados em {save(report)}")
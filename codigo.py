@@ -1,43 +1,224 @@
 # ...existing code...
+import argparse
+import gzip
+import re
+import time
 from pathlib import Path
 import pandas as pd
 
+from profiling import peak_rss_mb
+
 CSV_PATH = Path(r"C:\Users\dell\Desktop\codigos\sales_cleaned.csv")
 OUTPUT_XLSX = CSV_PATH.with_suffix(".xlsx")
 AUTO_DROP_ORIGINAL = True  # True para remover a coluna original após dividir
+CHUNKSIZE = 100_000  # linhas por bloco no modo em blocos
+CHUNKED_MIN_BYTES = 100 * 1024 * 1024  # CSVs maiores que isso vão direto para o modo em blocos
+EXCEL_MAX_ROWS = 1_048_576  # limite de linhas de uma aba do Excel (com o cabeçalho)
 
 def load_csv(path: Path) -> pd.DataFrame:
     return pd.read_csv(path, dtype=str, keep_default_na=False)
 
-def auto_split_columns(df: pd.DataFrame, sep: str = ",", drop_original: bool = True) -> pd.DataFrame:
-    df = df.copy()
-    for col in list(df.columns):
-        # ignora colunas vazias
-        if df[col].eq("").all():
-            continue
-        # calcula número máximo de partes quando dividido pela vírgula
-        max_parts = df[col].astype(str).apply(lambda v: len(v.split(sep)) if v != "" else 1).max()
-        # se só 1 parte, ignora (não contém separador na maioria)
-        if max_parts <= 1:
+def split_widths(df: pd.DataFrame, sep: str = ",") -> dict:
+    """Número máximo de partes de cada coluna (contagem vetorizada do separador)"""
+    pattern = re.escape(sep)
+    return {col: int(df[col].str.count(pattern).max()) + 1 if len(df) else 1 for col in df.columns}
+
+def split_frame(df: pd.DataFrame, widths: dict, sep: str = ",", drop_original: bool = True) -> pd.DataFrame:
+    """Divide as colunas com largura > 1 e monta o resultado de uma vez (sem concat por coluna)"""
+    kept, parts_out = {}, {}
+    for col in df.columns:
+        width = widths.get(col, 1)
+        # só 1 parte: a coluna não contém o separador
+        if width <= 1:
+            kept[col] = df[col]
             continue
-        # expande para múltiplas colunas
-        parts = df[col].astype(str).str.split(sep, expand=True, n=max_parts-1)
-        parts = parts.apply(lambda s: s.str.strip())  # limpa espaços
-        # nomeia novas colunas
-        new_names = [f"{col}__part{i+1}" for i in range(parts.shape[1])]
-        parts.columns = new_names
-        # concatena e remove original se desejado
-        df = pd.concat([df.drop(columns=[col]) if drop_original else df, parts], axis=1)
-    return df
+        if not drop_original:
+            kept[col] = df[col]
+        parts = df[col].str.split(sep, n=width - 1, expand=True)
+        for i in range(width):
+            # blocos sem nenhuma linha com todas as partes: completa com vazio
+            part = parts[i].str.strip() if i in parts.columns else pd.Series(None, index=df.index, dtype=object)
+            parts_out[f"{col}__part{i+1}"] = part
+    return pd.DataFrame({**kept, **parts_out}, index=df.index)
+
+def auto_split_columns(df: pd.DataFrame, sep: str = ",", drop_original: bool = True) -> pd.DataFrame:
+    return split_frame(df, split_widths(df, sep), sep, drop_original)
+
+# --- Gravação em blocos -------------------------------------------------------
+# Os writers recebem o resultado bloco a bloco (write) e fecham o arquivo em
+# close(); nenhum deles guarda mais que o bloco atual em memória.
+
+class XlsxStreamWriter:
+    """XLSX em modo write-only do openpyxl, com nova aba ao atingir o limite de linhas"""
+
+    def __init__(self, path: Path, max_rows: int = EXCEL_MAX_ROWS):
+        try:
+            from openpyxl import Workbook
+        except ImportError:
+            raise RuntimeError("Saída .xlsx requer o openpyxl (pip install openpyxl)") from None
+        self.path = path
+        self.max_rows = max_rows
+        self.workbook = Workbook(write_only=True)
+        self.header = None
+        self.sheets = 0
+        self._sheet = None
+        self._sheet_rows = 0
+
+    def _new_sheet(self):
+        self.sheets += 1
+        self._sheet = self.workbook.create_sheet(f"Sheet{self.sheets}")
+        self._sheet.append(self.header)
+        self._sheet_rows = 1
+
+    def write(self, df: pd.DataFrame) -> None:
+        if self.header is None:
+            self.header = [str(col) for col in df.columns]
+            self._new_sheet()
+        for row in df.itertuples(index=False, name=None):
+            if self._sheet_rows >= self.max_rows:
+                self._new_sheet()
+            self._sheet.append(row)
+            self._sheet_rows += 1
+
+    def close(self) -> None:
+        if self.header is None:
+            self.workbook.create_sheet("Sheet1")
+        self.workbook.save(self.path)
+
+
+class ParquetStreamWriter:
+    """Parquet com um row group por bloco (todas as colunas como texto)"""
+
+    def __init__(self, path: Path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Saída .parquet requer o pyarrow (pip install pyarrow)") from None
+        self.path = path
+        self._pa, self._pq = pa, pq
+        self._schema = None
+        self._writer = None
+
+    def write(self, df: pd.DataFrame) -> None:
+        if self._writer is None:
+            self._schema = self._pa.schema([(str(col), self._pa.string()) for col in df.columns])
+            self._writer = self._pq.ParquetWriter(self.path, self._schema)
+        self._writer.write_table(self._pa.Table.from_pandas(df, schema=self._schema, preserve_index=False))
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+
+
+class CsvStreamWriter:
+    """CSV, comprimido com gzip se o arquivo terminar em .gz"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        opener = gzip.open if path.suffix.lower() == ".gz" else open
+        self._fh = opener(path, "wt", encoding="utf-8", newline="")
+        self._header = True
+
+    def write(self, df: pd.DataFrame) -> None:
+        df.to_csv(self._fh, index=False, header=self._header)
+        self._header = False
+
+    def close(self) -> None:
+        self._fh.close()
+
+
+def open_writer(path: Path):
+    """Writer em blocos escolhido pela extensão: .xlsx, .parquet, .csv ou .csv.gz"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    suffixes = "".join(path.suffixes[-2:]).lower()
+    if path.suffix.lower() == ".xlsx":
+        return XlsxStreamWriter(path)
+    if path.suffix.lower() == ".parquet":
+        return ParquetStreamWriter(path)
+    if path.suffix.lower() == ".csv" or suffixes == ".csv.gz":
+        return CsvStreamWriter(path)
+    raise ValueError(f"Formato de saída não suportado: {path.name} (use .xlsx, .parquet, .csv ou .csv.gz)")
+
+def auto_split_csv(path: Path, output: Path, sep: str = ",", drop_original: bool = True,
+                   chunksize: int = CHUNKSIZE) -> dict:
+    """Modo em blocos: memória limitada ao bloco, mesmo para exports de vários GB.
+
+    1ª passada: larguras de divisão de cada coluna; 2ª passada: divide e grava
+    cada bloco com o writer da extensão de `output` (ver open_writer).
+    """
+    read = lambda: pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunksize)
+    t0 = time.perf_counter()
+    widths = {}
+    for chunk in read():
+        for col, width in split_widths(chunk, sep).items():
+            widths[col] = max(widths.get(col, 1), width)
+    t_scan = time.perf_counter() - t0
+
+    rows = 0
+    writer = open_writer(output)
+    try:
+        for chunk in read():
+            writer.write(split_frame(chunk, widths, sep, drop_original))
+            rows += len(chunk)
+    finally:
+        writer.close()
+    elapsed = time.perf_counter() - t0
+    return {
+        "rows": rows,
+        "split_columns": {col: w for col, w in widths.items() if w > 1},
+        "sheets": getattr(writer, "sheets", None),
+        "scan_seconds": t_scan,
+        "seconds": elapsed,
+        "rows_per_second": rows / elapsed if elapsed else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
 
 def save_to_excel(df: pd.DataFrame, path: Path) -> None:
-    df.to_excel(path, index=False)
-    print("Arquivo salvo:", path)
+    # write-only: não monta a planilha inteira em memória e abre novas abas
+    # em vez de perder linhas além do limite do Excel
+    writer = XlsxStreamWriter(path)
+    try:
+        for start in range(0, max(len(df), 1), CHUNKSIZE):
+            writer.write(df.iloc[start:start + CHUNKSIZE])
+    finally:
+        writer.close()
+    extra = f" ({writer.sheets} abas)" if writer.sheets > 1 else ""
+    print(f"Arquivo salvo: {path}{extra}")
 
 if __name__ == "__main__":
-    df = load_csv(CSV_PATH)
-    print("Colunas originais:", ", ".join(df.columns))
-    df2 = auto_split_columns(df, sep=",", drop_original=AUTO_DROP_ORIGINAL)
-    print("Colunas finais:", ", ".join(df2.columns))
-    save_to_excel(df2, OUTPUT_XLSX)
-# ...existing code...1
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Divide colunas com valores separados por vírgula")
+    parser.add_argument("csv", nargs="?", type=Path, default=CSV_PATH)
+    parser.add_argument("--sep", default=",")
+    parser.add_argument("--keep-original", action="store_true", help="mantém a coluna original")
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help=f"modo em blocos (automático acima de {CHUNKED_MIN_BYTES // 2**20} MB)")
+    parser.add_argument("--out", type=Path, default=None,
+                        help="arquivo de saída: .xlsx, .parquet, .csv ou .csv.gz (padrão: .xlsx; "
+                             "_split.csv no modo em blocos)")
+    args = parser.parse_args()
+    drop_original = AUTO_DROP_ORIGINAL and not args.keep_original
+
+    if args.chunksize or args.csv.stat().st_size >= CHUNKED_MIN_BYTES:
+        out = args.out or args.csv.with_name(f"{args.csv.stem}_split.csv")
+        stats = auto_split_csv(args.csv, out, sep=args.sep, drop_original=drop_original,
+                               chunksize=args.chunksize or CHUNKSIZE)
+        print("Colunas divididas:", ", ".join(f"{c} ({w})" for c, w in stats["split_columns"].items()) or "nenhuma")
+        sheets = f" ({stats['sheets']} abas)" if (stats["sheets"] or 0) > 1 else ""
+        print(f"Arquivo salvo: {out}{sheets}")
+        print(f"⏱️ {stats['rows']} linhas em {stats['seconds']:.1f}s ({stats['rows_per_second']:,.0f} linhas/s; "
+              f"varredura {stats['scan_seconds']:.1f}s; pico de memória {stats['peak_rss_mb']:.0f} MB)")
+    else:
+        df = load_csv(args.csv)
+        print("Colunas originais:", ", ".join(df.columns))
+        df2 = auto_split_columns(df, sep=args.sep, drop_original=drop_original)
+        print("Colunas finais:", ", ".join(df2.columns))
+        out = args.out or args.csv.with_suffix(".xlsx")
+        if out.suffix.lower() == ".xlsx":
+            save_to_excel(df2, out)
+        else:
+            writer = open_writer(out)
+            writer.write(df2)
+            writer.close()
+            print("Arquivo salvo:", out)
+# ...existing code...
@@ -0,0 +1,203 @@
+"""Compressão (gzip/brotli) e validadores HTTP no servidor Flask do Dash.
+
+- Respostas de texto acima de MIN_SIZE bytes (callbacks, layout, HTML e os
+  bundles JS/CSS dos componentes) são comprimidas conforme o Accept-Encoding:
+  brotli se o pacote `brotli` estiver instalado, senão gzip. Os bundles são
+  comprimidos uma vez por processo (LRU de STATIC_ENTRIES), com nível alto;
+  as respostas dinâmicas usam níveis rápidos.
+- "/", /_dash-layout e /_dash-dependencies recebem ETag e
+  Cache-Control: no-cache: o navegador (ou um proxy reverso) revalida e
+  recebe 304 sem corpo enquanto nada mudou.
+- Respostas em streaming (ex.: /export) passam intactas; a rota define os
+  próprios validadores.
+
+DASH_COMPRESSION=0 desliga tudo.
+
+    python compression.py   # tamanhos do carregamento padrão do dah, sem e com compressão
+"""
+import gzip
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import flask
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ENABLED = os.environ.get("DASH_COMPRESSION", "1") not in ("", "0")
+MIN_SIZE = 500
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+STATIC_GZIP_LEVEL = 9
+STATIC_BROTLI_QUALITY = 9  # 11 comprime ~8% mais, mas leva ~1.7s no bundle de 737KB
+# bundles comprimidos guardados (LRU): o dah carrega ~20, com folga para br e gzip
+STATIC_ENTRIES = 64
+
+COMPRESSIBLE = {
+    "application/json", "text/html", "text/css", "text/plain",
+    "text/javascript", "application/javascript", "image/svg+xml",
+}
+
+_static = OrderedDict()  # (caminho, v, m, codificação) -> corpo comprimido
+_static_lock = threading.Lock()
+
+
+def choose_encoding(accept_encodings):
+    """'br', 'gzip' ou None, conforme o Accept-Encoding e o que está instalado"""
+    if brotli is not None and accept_encodings["br"]:
+        return "br"
+    if accept_encodings["gzip"]:
+        return "gzip"
+    return None
+
+
+def compress(data: bytes, encoding, static=False) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=STATIC_BROTLI_QUALITY if static else BROTLI_QUALITY)
+    # mtime=0: o mesmo conteúdo gera sempre os mesmos bytes
+    return gzip.compress(data, compresslevel=STATIC_GZIP_LEVEL if static else GZIP_LEVEL, mtime=0)
+
+
+def _static_key(request) -> tuple:
+    """Caminho + v/m (versão e mtime que o Dash põe na URL); o resto da query é ignorado"""
+    return request.path, request.args.get("v"), request.args.get("m")
+
+
+def _compress_static(key, data, encoding) -> bytes:
+    key = (*key, encoding)
+    with _static_lock:
+        body = _static.get(key)
+        if body is not None:
+            _static.move_to_end(key)
+            return body
+    body = compress(data, encoding, static=True)
+    with _static_lock:
+        _static[key] = body
+        while len(_static) > STATIC_ENTRIES:
+            _static.popitem(last=False)
+    return body
+
+
+def init_app(server: flask.Flask, prefix="/"):
+    """Registra compressão e ETags; `prefix` é o routes_pathname_prefix do Dash"""
+    if not ENABLED:
+        return
+    revalidated = {prefix, f"{prefix}_dash-layout", f"{prefix}_dash-dependencies"}
+    static_prefix = f"{prefix}_dash-component-suites/"
+
+    @server.after_request
+    def _compress_response(response):
+        request = flask.request
+        if request.method == "GET" and response.status_code == 200 and request.path in revalidated:
+            # fraco: vale para as versões com e sem compressão do mesmo conteúdo
+            response.add_etag(weak=True)
+            response.cache_control.no_cache = True
+            response.make_conditional(request)  # 304 sem corpo se o ETag bateu
+
+        if (response.status_code != 200 or response.is_streamed or response.direct_passthrough
+                or "Content-Encoding" in response.headers or response.mimetype not in COMPRESSIBLE):
+            return response
+        data = response.get_data()
+        if len(data) < MIN_SIZE:
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+        if request.path.startswith(static_prefix):
+            body = _compress_static(_static_key(request), data, encoding)
+        else:
+            body = compress(data, encoding)
+        response.set_data(body)
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+
+# --- relatório de tamanhos -------------------------------------------------------
+
+def _parse_outputs(spec):
+    """'..a.b...c.d..' (várias saídas) ou 'a.b' -> [{'id', 'property'}]"""
+    multi = spec.startswith("..")
+    outputs = [
+        dict(zip(("id", "property"), item.rsplit(".", 1)))
+        for item in (spec[2:-2].split("...") if multi else [spec])
+    ]
+    return outputs if multi else outputs[0]
+
+
+def _layout_props(node, found):
+    """{id: props} dos componentes do layout serializado"""
+    if isinstance(node, dict):
+        props = node.get("props", {})
+        if "id" in props:
+            found[props["id"]] = props
+        for value in props.values():
+            _layout_props(value, found)
+    elif isinstance(node, list):
+        for item in node:
+            _layout_props(item, found)
+    return found
+
+
+def default_load(client, prefix="/"):
+    """(nome, método, caminho, corpo) das requisições ao abrir o dashboard"""
+    index = client.get(prefix).get_data(as_text=True)
+    requests_ = [("index", "GET", prefix, None)]
+    requests_ += [(src.rsplit("/", 1)[-1], "GET", src, None) for src in re.findall(r'src="([^"]+)"', index)]
+    requests_ += [("layout", "GET", f"{prefix}_dash-layout", None),
+                  ("dependencies", "GET", f"{prefix}_dash-dependencies", None)]
+    layout = client.get(f"{prefix}_dash-layout").get_json()
+    props = _layout_props(layout, {})
+    for dep in client.get(f"{prefix}_dash-dependencies").get_json():
+        body = {
+            "output": dep["output"],
+            "outputs": _parse_outputs(dep["output"]),
+            "inputs": [{**i, "value": props.get(i["id"], {}).get(i["property"])} for i in dep["inputs"]],
+            "state": [{**s, "value": props.get(s["id"], {}).get(s["property"])} for s in dep["state"]],
+            "changedPropIds": [],
+        }
+        name = dep["output"].strip(".").split(".")[0]
+        requests_.append((f"callback {name}", "POST", f"{prefix}_dash-update-component", json.dumps(body)))
+    return requests_
+
+
+def payload_report(client, prefix="/"):
+    rows = []
+    for name, method, path, body in default_load(client, prefix):
+        sizes = {}
+        for label, accept in (("raw", ""), ("gzip", "gzip"), ("br", "br, gzip")):
+            resp = client.open(path, method=method, data=body, content_type="application/json",
+                               headers={"Accept-Encoding": accept})
+            sizes[label] = (len(resp.get_data()), resp.status_code, resp.headers.get("Content-Encoding"))
+        rows.append((name, sizes))
+    return rows
+
+
+if __name__ == "__main__":
+    import dah
+
+    dah.server.logger.disabled = True  # callbacks com erro aparecem com "!" na tabela
+    client = dah.server.test_client()
+    prefix = dah.app.config.routes_pathname_prefix
+    rows = payload_report(client, prefix)
+    print(f"{'Resposta':<40} {'Sem compr.':>11} {'gzip':>10} {'br':>10}")
+    totals = {"raw": 0, "gzip": 0, "br": 0}
+    for name, sizes in rows:
+        cells = []
+        for label in totals:
+            size, status, encoding = sizes[label]
+            totals[label] += size
+            cells.append(f"{size:>10,}" + ("!" if status != 200 else " "))
+        print(f"{name[:40]:<40} " + " ".join(cells))
+    print(f"{'TOTAL':<40} " + " ".join(f"{totals[k]:>10,} " for k in totals))
+    if brotli is None:
+        print("(brotli não instalado: a coluna br mostra gzip)")
+    layout = client.get(f"{prefix}_dash-layout")
+    again = client.get(f"{prefix}_dash-layout", headers={"If-None-Match": layout.headers.get("ETag", "")})
+    print(f"Revalidação do layout: {again.status_code} ({len(again.get_data())} bytes)")
+    print("! = resposta diferente de 200")
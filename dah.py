@@ -1,14 +1,35 @@
 import dash
-from dash import dcc, html
+import flask
+import hashlib
+from dash import dash_table, dcc, html
 from dash.dependencies import Input, Output
 import pandas as pd
-import plotly.express as px
 from pathlib import Path
 import plotly.graph_objects as go
 import locale 
 from datetime import date 
 import os
-import requests
+import functools
+import threading
+import time
+from urllib.parse import urlencode
+
+from activity_table import DEFAULT_SORT as DEFAULT_TABLE_SORT, ActivityTable
+from analytics import get_analytics
+import compression
+import exports
+from kpis import KpiIndex
+from leaderboard import LEADERBOARD_PATH, Leaderboard
+from records import RecordsIndex
+import metrics
+import result_cache
+import store
+
+@functools.lru_cache(maxsize=None)
+def _px():
+    """plotly.express sob demanda: o import (~0.1s) fica fora do cold start; warmup() o carrega antes do primeiro callback"""
+    import plotly.express as px
+    return px
 
 # ==============================================================================
 # --- CONFIGURAÇÕES E CONSTANTES DE ESTILO ---
@@ -26,21 +47,14 @@ else:
 
 CSV_PATH = BASE_DIR / "activities.csv"  # Agora na raiz do projeto
 
-# Criar arquivo CSV inicial se não existir (apenas localmente)
-if not CSV_PATH.exists() and not IS_RENDER:
-    CSV_PATH.parent.mkdir(exist_ok=True)
-    empty_df = pd.DataFrame({
-        'date': [], 'distance_km': [], 'duration_min': [], 
-        'type': [], 'name': [], 'pace_min_km': []
-    })
-    empty_df.to_csv(CSV_PATH, index=False)
-    print(f"📁 CSV criado em: {CSV_PATH}")
+# Sem CSV, load_data devolve um DataFrame vazio (nada é gravado no import)
 
 STRAVA_ORANGE = '#FC4C02'
 LINE_COLOR = 'white'
 BG_COLOR = '#1e1e1e'
 TEXT_COLOR = 'white'
 FILTER_BG = '#3a3a3a'
+STATUS_STYLE = {'textAlign': 'center', 'color': '#aaa', 'minHeight': '1.2em', 'visibility': 'hidden'}
 
 # Configurações de localização
 try:
@@ -92,6 +106,7 @@ def categorize_distance(distance_km):
         return "Meia maratona (> 21km)"
         
 def total_runs_by_km(df_in):
+    px = _px()
     if df_in.empty: 
         return go.Figure().update_layout(
             template="plotly_dark",
@@ -118,6 +133,7 @@ def total_runs_by_km(df_in):
     return fig
 
 def pace_by_category(df_in):
+    px = _px()
     if df_in.empty: 
         return go.Figure().update_layout(
             template="plotly_dark",
@@ -172,6 +188,7 @@ def pace_by_category(df_in):
     return fig
 
 def create_distance_over_time(df_in):
+    px = _px()
     if df_in.empty: 
         return go.Figure().update_layout(
             template="plotly_dark",
@@ -197,6 +214,7 @@ def create_distance_over_time(df_in):
     return fig
 
 def create_activity_type_pie(df_in):
+    px = _px()
     if df_in.empty: 
         return go.Figure().update_layout(
             template="plotly_dark",
@@ -216,6 +234,7 @@ def create_activity_type_pie(df_in):
     return fig
 
 def create_pace_trend(df_in):
+    px = _px()
     if df_in.empty: 
         return go.Figure().update_layout(
             template="plotly_dark",
@@ -243,6 +262,7 @@ def create_pace_trend(df_in):
     return fig
 
 def create_monthly_stats(df_in):
+    px = _px()
     if df_in.empty: 
         return go.Figure().update_layout(
             template="plotly_dark",
@@ -282,40 +302,148 @@ def create_monthly_stats(df_in):
     ) 
     return fig
 
+def _empty_figure(title, text="Nenhum dado disponível"):
+    return go.Figure().update_layout(
+        template="plotly_dark",
+        title=title,
+        title_x=0.5,
+        annotations=[dict(
+            text=text,
+            x=0.5, y=0.5, xref="paper", yref="paper",
+            showarrow=False, font=dict(size=16)
+        )]
+    )
+
+def create_rolling_distance(load):
+    """Distância móvel de 7, 28 e 365 dias (uma linha por janela)"""
+    title = 'Distância móvel (7 / 28 / 365 dias)'
+    if load.empty:
+        return _empty_figure(title)
+    fig = go.Figure()
+    styles = {7: dict(color=STRAVA_ORANGE, width=2), 28: dict(color=TEXT_COLOR, width=2),
+              365: dict(color='#888888', width=1, dash='dot')}
+    for window, line in styles.items():
+        fig.add_trace(go.Scatter(x=load.index, y=load[f'distance_km_{window}d'], mode='lines',
+                                 name=f'{window} dias', line=line))
+    fig.update_layout(template="plotly_dark", title=title, title_x=0.5,
+                      xaxis_title=None, yaxis_title='km', legend=dict(orientation='h'))
+    return fig
+
+def create_acwr_chart(load):
+    """Razão de carga aguda:crônica (7d/28d) com a faixa 0.8–1.3 destacada"""
+    title = 'Carga aguda:crônica (7d / 28d)'
+    if load.empty or load['acwr'].dropna().empty:
+        return _empty_figure(title)
+    fig = go.Figure(go.Scatter(x=load.index, y=load['acwr'], mode='lines',
+                               line=dict(color=STRAVA_ORANGE, width=2), name='ACWR'))
+    fig.add_hrect(y0=0.8, y1=1.3, fillcolor='#2e7d32', opacity=0.25, line_width=0)
+    fig.update_layout(template="plotly_dark", title=title, title_x=0.5,
+                      xaxis_title=None, yaxis_title=None, showlegend=False)
+    return fig
+
+def create_iso_week_chart(weeks):
+    """Distância por semana ISO"""
+    title = 'Distância por semana (ISO)'
+    if weeks.empty:
+        return _empty_figure(title)
+    labels = weeks['iso_year'].astype(str) + '-S' + weeks['iso_week'].astype(str).str.zfill(2)
+    fig = go.Figure(go.Bar(x=weeks['week_start'], y=weeks['distance_km'], marker_color=STRAVA_ORANGE,
+                           customdata=labels, hovertemplate='%{customdata}: %{y:.1f} km<extra></extra>'))
+    fig.update_layout(template="plotly_dark", title=title, title_x=0.5,
+                      xaxis_title=None, yaxis_title=None)
+    return fig
+
 # ==============================================================================
 # --- CARREGAMENTO DE DADOS E INICIALIZAÇÃO DO APP ---
 # ==============================================================================
 
-def load_data():
+def load_data(path=CSV_PATH):
     """Carrega dados com fallback para CSV vazio se necessário"""
     try:
-        df = pd.read_csv(CSV_PATH, parse_dates=["date"])
-        print(f"✅ CSV carregado: {len(df)} atividades")
-        return df
+        df = pd.read_csv(path, parse_dates=["date"])
+        print(f"✅ CSV carregado: {len(df)} atividades ({path})")
     except FileNotFoundError:
         print("⚠️ CSV não encontrado. Criando DataFrame vazio.")
-        return pd.DataFrame({
-            'date': [], 'distance_km': [], 'duration_min': [], 
-            'type': [], 'name': [], 'pace_min_km': []
-        })
+        return store.empty_activities()
     except Exception as e:
         print(f"❌ Erro ao carregar CSV: {e}")
-        return pd.DataFrame({
-            'date': [], 'distance_km': [], 'duration_min': [], 
-            'type': [], 'name': [], 'pace_min_km': []
-        })
-
-# Carregar dados
-df = load_data()
-
-# Processamento dos dados
-if not df.empty:
-    df["date"] = pd.to_datetime(df["date"], errors='coerce')
-    df["duration_min"] = pd.to_numeric(df["duration_min"], errors="coerce").round(1)
-    df["distance_km"] = pd.to_numeric(df["distance_km"], errors="coerce").round(1)
-    df = df.dropna(subset=['date'])
-else:
-    print("ℹ️ DataFrame vazio - sem dados para processar")
+        return store.empty_activities()
+
+    # Processamento dos dados
+    if not df.empty:
+        df["date"] = pd.to_datetime(df["date"], errors='coerce')
+        df["duration_min"] = pd.to_numeric(df["duration_min"], errors="coerce").round(1)
+        df["distance_km"] = pd.to_numeric(df["distance_km"], errors="coerce").round(1)
+        df = df.dropna(subset=['date'])
+    else:
+        print("ℹ️ DataFrame vazio - sem dados para processar")
+    return df
+
+# --- ATLETAS ---
+# Cada atleta tem sua partição em data/athletes/<id> (ver store.py e athletes.py).
+# O CSV da raiz continua sendo o atleta padrão do deploy de um atleta só.
+# Os dados de um atleta só são lidos quando ele é selecionado, e no máximo
+# ACTIVE_ATHLETES ficam em memória por worker.
+ACTIVE_ATHLETES = int(os.environ.get("DASH_ACTIVE_ATHLETES", "8"))
+
+def available_athletes():
+    """{athlete_id: nome} para o seletor de atleta"""
+    athletes = store.list_athletes()
+    if store.DEFAULT_ATHLETE not in athletes and (CSV_PATH.exists() or not athletes):
+        athletes = {store.DEFAULT_ATHLETE: "Padrão", **athletes}
+    return athletes
+
+def athlete_csv(athlete_id):
+    if athlete_id == store.DEFAULT_ATHLETE and not store.partition_csv(athlete_id).exists():
+        return CSV_PATH
+    return store.partition_csv(athlete_id)
+
+class AthleteData:
+    """Dados processados de um atleta: DataFrame, versão e índices derivados"""
+
+    def __init__(self, athlete_id, df, version, records_index):
+        self.athlete_id = athlete_id
+        self.df = df
+        self.version = version
+        # Índice de KPIs (somas de prefixo por data), construído uma vez por carga
+        self.kpi_index = KpiIndex(df)
+        # Ordens pré-calculadas da tabela de atividades (paginação no servidor)
+        self.table = ActivityTable(df)
+        self.records_index = records_index
+
+@functools.lru_cache(maxsize=ACTIVE_ATHLETES)
+def _load_athlete(athlete_id, version):
+    path = athlete_csv(athlete_id)
+    df = load_data(path)
+    # Recordes pessoais: usa o índice mantido pelo ETL se estiver em dia com o CSV
+    records_path = path.with_name("records.json")
+    if records_path.exists() and path.exists() and records_path.stat().st_mtime >= path.stat().st_mtime:
+        records_index = RecordsIndex.load(records_path)
+    else:
+        records_index = RecordsIndex.rebuild(df)
+    return AthleteData(athlete_id, df, version, records_index)
+
+def get_athlete_data(athlete_id=None) -> AthleteData:
+    """Dados do atleta, carregados sob demanda e recarregados se o CSV mudar"""
+    athlete_id = athlete_id or DEFAULT_ATHLETE_ID
+    return _load_athlete(athlete_id, store.file_version(athlete_csv(athlete_id)))
+
+ATHLETES = available_athletes()
+DEFAULT_ATHLETE_ID = next(iter(ATHLETES), store.DEFAULT_ATHLETE)
+
+# --- CACHE DE RESULTADOS ---
+# Opções dos filtros, KPIs e figuras por (atleta, versão do CSV, filtros): em
+# memória e num SQLite comum a todos os workers (ver result_cache.py). Um acerto
+# no disco não lê o CSV nem monta figuras.
+RESULT_CACHE = result_cache.ResultCache("dash")
+
+def athlete_version(atleta, *_):
+    atleta = atleta or DEFAULT_ATHLETE_ID
+    return atleta, store.file_version(athlete_csv(atleta))
+
+def plain_figures(values):
+    """Figuras como dict: mais baratas de serializar no cache que go.Figure"""
+    return tuple(v.to_dict() if isinstance(v, go.Figure) else v for v in values)
 
 # Inicialização do Dash
 app = dash.Dash(__name__)
@@ -323,6 +451,79 @@ app = dash.Dash(__name__)
 # Linha crucial para o Deploy no Render
 server = app.server
 
+# Latência dos callbacks em /metrics (DASH_METRICS=1; ver metrics.py)
+metrics.init_app(server)
+# gzip/brotli e ETags (registrado depois: o tempo de compressão entra nas métricas)
+compression.init_app(server, app.config.routes_pathname_prefix)
+
+# --- CALLBACKS EM SEGUNDO PLANO ---
+# Gráficos e carga de treino rodam como background callbacks do Dash: com
+# `pip install "dash[diskcache]"` cada execução vai para um processo local (sem
+# broker), o worker do gunicorn fica livre e os KPIs não esperam os gráficos.
+# Mudar um filtro durante a execução cancela o job anterior. Sem o pacote (ou
+# com DASH_BACKGROUND=0) os mesmos callbacks rodam dentro da requisição.
+BACKGROUND_INTERVAL_MS = 250
+
+def background_manager():
+    if os.environ.get("DASH_BACKGROUND", "1") in ("", "0"):
+        return None
+    try:
+        import diskcache
+        return dash.DiskcacheManager(diskcache.Cache(str(BASE_DIR / "data" / "cache" / "background")))
+    except ImportError:
+        return None
+
+BACKGROUND_MANAGER = background_manager()
+
+def _no_progress(value):
+    pass
+
+def heavy_callback(outputs, inputs, status_id):
+    """app.callback em segundo plano, com progresso em `status_id`; func recebe set_progress primeiro
+
+    O job roda em outro processo: as métricas dele passam pelo spool do
+    metrics.py para chegar ao /metrics dos workers.
+    """
+    def decorate(func):
+        if BACKGROUND_MANAGER is None:
+            @metrics.timed_callback
+            @functools.wraps(func)
+            def inline(*args):
+                return func(_no_progress, *args)
+            return app.callback(outputs, inputs)(inline)
+
+        @functools.wraps(func)
+        def job(set_progress, *args):
+            # timed_callback só vê os filtros, não o set_progress do Dash
+            @metrics.timed_callback
+            @functools.wraps(func)
+            def run(*args):
+                return func(set_progress, *args)
+            with metrics.spooled():
+                return run(*args)
+        return app.callback(
+            outputs, inputs,
+            background=True,
+            manager=BACKGROUND_MANAGER,
+            interval=BACKGROUND_INTERVAL_MS,
+            progress=[Output(status_id, 'children')],
+            progress_default=[''],
+            running=[(Output(status_id, 'style'), {**STATUS_STYLE, 'visibility': 'visible'}, STATUS_STYLE)],
+        )(job)
+    return decorate
+
+# --- TABELA DE ATIVIDADES ---
+ACTIVITY_PAGE_SIZE = 25
+ACTIVITY_TABLE_COLUMNS = [
+    {'name': 'Data', 'id': 'date'},
+    {'name': 'Nome', 'id': 'name'},
+    {'name': 'Tipo', 'id': 'type'},
+    {'name': 'Distância (km)', 'id': 'distance_km'},
+    {'name': 'Tempo', 'id': 'duration_min'},
+    {'name': 'Pace (min/km)', 'id': 'pace_min_km'},
+    {'name': 'Elevação (m)', 'id': 'elevation_m'},
+]
+
 # --- COMPONENTE HTML PARA ESTILIZAR O KPI ---
 def create_kpi_card(id_suffix, title, value="N/A", color=STRAVA_ORANGE):
     return html.Div(
@@ -349,9 +550,6 @@ def create_kpi_card(id_suffix, title, value="N/A", color=STRAVA_ORANGE):
 # --- DEFINIÇÃO DO LAYOUT PRINCIPAL ---
 # ==============================================================================
 
-# Obter anos disponíveis para os filtros
-available_years = sorted(df['date'].dt.year.unique().tolist(), reverse=True) if not df.empty else []
-
 app.layout = html.Div(
     style={
         'fontFamily': 'sans-serif', 
@@ -374,20 +572,32 @@ app.layout = html.Div(
                 'backgroundColor': FILTER_BG
             }, 
             children=[
-                # Filtro de Ano
-                html.Div(style={'width': '33%'}, children=[
+                # Seletor de Atleta
+                html.Div(style={'width': '25%'}, children=[
+                    html.Label("Atleta:", style={'color': TEXT_COLOR}),
+                    dcc.Dropdown(
+                        id='dropdown-atleta',
+                        options=[{'label': name, 'value': athlete_id} for athlete_id, name in ATHLETES.items()],
+                        value=DEFAULT_ATHLETE_ID,
+                        clearable=False,
+                        style={'backgroundColor': '#555', 'color': 'white'},
+                        placeholder="Selecione o atleta...",
+                    ),
+                ]),
+                # Filtro de Ano (opções dependem do atleta)
+                html.Div(style={'width': '25%'}, children=[
                     html.Label("Ano:", style={'color': TEXT_COLOR}),
                     dcc.Dropdown(
                         id='dropdown-ano',
-                        options=[{'label': str(y), 'value': y} for y in available_years] + [{'label': 'Todos', 'value': 'Todos'}],
-                        value='Todos' if available_years else 'Todos',
+                        options=[{'label': 'Todos', 'value': 'Todos'}],
+                        value='Todos',
                         clearable=False,
                         style={'backgroundColor': '#555', 'color': 'white'},
                         placeholder="Selecione o ano...",
                     ),
                 ]),
                 # Filtro de Mês
-                html.Div(style={'width': '33%'}, children=[
+                html.Div(style={'width': '25%'}, children=[
                     html.Label("Mês:", style={'color': TEXT_COLOR}),
                     dcc.Dropdown(
                         id='dropdown-mes',
@@ -399,7 +609,7 @@ app.layout = html.Div(
                     ),
                 ]),
                 # Filtro de Dia
-                html.Div(style={'width': '33%'}, children=[
+                html.Div(style={'width': '25%'}, children=[
                     html.Label("Dia:", style={'color': TEXT_COLOR}),
                     dcc.Dropdown(
                         id='dropdown-dia',
@@ -413,6 +623,19 @@ app.layout = html.Div(
             ]
         ), 
 
+        # --- EXPORTAÇÃO (rota /export, em streaming) ---
+        html.Div(style={'display': 'flex', 'gap': '15px', 'alignItems': 'center', 'marginBottom': '20px'}, children=[
+            dcc.Dropdown(
+                id='dropdown-export-formato',
+                options=[{'label': fmt.upper(), 'value': fmt} for fmt in exports.available_formats()],
+                value='csv',
+                clearable=False,
+                style={'width': '150px', 'backgroundColor': '#555', 'color': 'white'},
+            ),
+            html.A("⬇️ Baixar dados filtrados", id='export-link', href='', download='',
+                   style={'color': STRAVA_ORANGE, 'fontWeight': 'bold'}),
+        ]),
+
         # --- KPI ROW ---
         html.Div(className='kpi-row', style={'display': 'flex', 'gap': '15px', 'marginBottom': '30px'}, children=[
             create_kpi_card('runs', 'Total corridas'),
@@ -422,6 +645,7 @@ app.layout = html.Div(
         ]),
 
         # --- GRÁFICOS ---
+        html.Div(id='figures-status', style=STATUS_STYLE),
         html.Div(style={'display': 'flex', 'gap': '20px', 'marginBottom': '20px'}, children=[
             html.Div(style={'width': '50%'}, children=[
                 dcc.Graph(id='graph-distance-cumulative')
@@ -447,7 +671,65 @@ app.layout = html.Div(
         html.Div(children=[
             html.H3("Pace médio por categoria", style={'textAlign': 'center', 'color': TEXT_COLOR}),
             dcc.Graph(id='graph-pace-category')
-        ])
+        ]),
+
+        # --- CARGA DE TREINO (janelas móveis sobre o histórico completo) ---
+        html.H3("Carga de treino", style={'textAlign': 'center', 'color': TEXT_COLOR}),
+        html.Div(id='training-load-status', style=STATUS_STYLE),
+        html.Div(style={'display': 'flex', 'gap': '20px', 'marginBottom': '20px'}, children=[
+            html.Div(style={'width': '50%'}, children=[
+                dcc.Graph(id='graph-rolling-distance')
+            ]),
+            html.Div(style={'width': '50%'}, children=[
+                dcc.Graph(id='graph-acwr')
+            ]),
+        ]),
+        html.Div(children=[
+            dcc.Graph(id='graph-iso-weeks')
+        ]),
+
+        # --- ATIVIDADES (paginação e ordenação no servidor) ---
+        html.H3("Atividades", style={'textAlign': 'center', 'color': TEXT_COLOR}),
+        dash_table.DataTable(
+            id='activity-table',
+            columns=ACTIVITY_TABLE_COLUMNS,
+            page_current=0,
+            page_size=ACTIVITY_PAGE_SIZE,
+            page_action='custom',
+            sort_action='custom',
+            sort_mode='single',
+            sort_by=[],
+            fixed_rows={'headers': True},
+            style_table={'marginBottom': '20px', 'overflowX': 'auto'},
+            style_header={'backgroundColor': FILTER_BG, 'color': TEXT_COLOR, 'fontWeight': 'bold'},
+            style_cell={'backgroundColor': BG_COLOR, 'color': TEXT_COLOR, 'border': '1px solid #444',
+                        'textAlign': 'left', 'minWidth': '90px'},
+        ),
+
+        # --- RECORDES PESSOAIS ---
+        html.H3("Recordes pessoais", style={'textAlign': 'center', 'color': TEXT_COLOR}),
+        html.Div(id='records-table', style={'marginBottom': '20px'}),
+
+        # --- RANKING DO CLUBE ---
+        html.H3("Ranking do clube", style={'textAlign': 'center', 'color': TEXT_COLOR}),
+        html.Div(style={'display': 'flex', 'gap': '20px', 'justifyContent': 'center', 'marginBottom': '10px'}, children=[
+            dcc.RadioItems(
+                id='radio-ranking-periodo',
+                options=[{'label': ' Semanal', 'value': 'weekly'}, {'label': ' Mensal', 'value': 'monthly'}],
+                value='weekly',
+                inline=True,
+                inputStyle={'marginLeft': '10px'},
+            ),
+            html.Div(style={'width': '200px'}, children=[
+                dcc.Dropdown(
+                    id='dropdown-ranking-chave',
+                    clearable=False,
+                    style={'backgroundColor': '#555', 'color': 'white'},
+                    placeholder="Período...",
+                ),
+            ]),
+        ]),
+        html.Div(id='leaderboard-table', style={'marginBottom': '20px'})
     ]
 )
 
@@ -455,6 +737,21 @@ app.layout = html.Div(
 # --- CALLBACKS ---
 # ==============================================================================
 
+# 0. Anos disponíveis para o atleta selecionado
+@app.callback(
+    [
+        Output('dropdown-ano', 'options'),
+        Output('dropdown-ano', 'value'),
+    ],
+    Input('dropdown-atleta', 'value')
+)
+@metrics.timed_callback
+@RESULT_CACHE.cached("update_year_options", athlete_version)
+def update_year_options(atleta):
+    df = get_athlete_data(atleta).df
+    available_years = sorted(df['date'].dt.year.unique().tolist(), reverse=True) if not df.empty else []
+    return [{'label': str(y), 'value': y} for y in available_years] + [{'label': 'Todos', 'value': 'Todos'}], 'Todos'
+
 # 1. Callback para popular os filtros de Mês e Dia com base no Ano/Mês
 @app.callback(
     [
@@ -464,11 +761,15 @@ app.layout = html.Div(
         Output('dropdown-dia', 'value'),
     ],
     [
+        Input('dropdown-atleta', 'value'),
         Input('dropdown-ano', 'value'),
         Input('dropdown-mes', 'value')
     ]
 )
-def update_month_day_options(ano_selecionado, mes_selecionado):
+@metrics.timed_callback
+@RESULT_CACHE.cached("update_month_day_options", athlete_version)
+def update_month_day_options(atleta, ano_selecionado, mes_selecionado):
+    df = get_athlete_data(atleta).df
     if df.empty:
         return ([{'label': 'Todos', 'value': 'Todos'}], 'Todos', 
                 [{'label': 'Todos', 'value': 'Todos'}], 'Todos')
@@ -514,14 +815,74 @@ def filter_data(df_in, ano_sel, mes_sel, dia_sel):
 
     return df_filtered
 
-# 3. Callback principal para atualizar o Dashboard
+# 3. KPIs: consulta ao índice de somas, respondida na hora
+FILTER_INPUTS = [
+    Input('dropdown-atleta', 'value'),
+    Input('dropdown-ano', 'value'),
+    Input('dropdown-mes', 'value'),
+    Input('dropdown-dia', 'value'),
+]
+
 @app.callback(
     [
         Output('kpi-value-runs', 'children'),
         Output('kpi-value-km', 'children'),
         Output('kpi-value-pace', 'children'),
         Output('kpi-value-time', 'children'),
-        
+    ],
+    FILTER_INPUTS
+)
+@metrics.timed_callback
+@RESULT_CACHE.cached("update_kpis", athlete_version)
+def update_kpis(atleta, ano_selecionado, mes_selecionado, dia_selecionado):
+    with metrics.stage("load"):
+        data = get_athlete_data(atleta)
+    with metrics.stage("kpis"):
+        kpis = data.kpi_index.totals_for_filter(ano_selecionado, mes_selecionado, dia_selecionado)
+    if not kpis["runs"]:
+        return "N/A", "N/A km", "N/A", "N/A"
+    pace_mean = kpis["pace_mean"]
+    return (
+        kpis["runs"],
+        f"{kpis['distance_km']:.1f} km",
+        format_pace_minutes(pace_mean) if pace_mean else "N/A",
+        format_minutes_hms(kpis["duration_min"]),
+    )
+
+# 3a. Gráficos do período (em segundo plano, ver heavy_callback)
+DASHBOARD_BUILDERS = (create_distance_over_time, create_activity_type_pie, create_pace_trend,
+                      total_runs_by_km, create_monthly_stats, pace_by_category)
+
+def dashboard_figures(atleta, ano_selecionado, mes_selecionado, dia_selecionado, set_progress=_no_progress):
+    def build():
+        with metrics.stage("load"):
+            data = get_athlete_data(atleta)
+        with metrics.stage("filter"):
+            df_filtered = filter_data(data.df, ano_selecionado, mes_selecionado, dia_selecionado)
+
+        if df_filtered.empty:
+            empty_figure = go.Figure().update_layout(
+                template="plotly_dark",
+                annotations=[dict(
+                    text="Nenhum dado disponível para os filtros selecionados",
+                    x=0.5, y=0.5, xref="paper", yref="paper",
+                    showarrow=False, font=dict(size=16)
+                )]
+            )
+            return plain_figures([empty_figure] * len(DASHBOARD_BUILDERS))
+
+        figures = []
+        for i, builder in enumerate(DASHBOARD_BUILDERS):
+            set_progress(f"⏳ Gerando gráficos ({i + 1}/{len(DASHBOARD_BUILDERS)})…")
+            with metrics.stage(builder.__name__):
+                figures.append(builder(df_filtered))
+        return plain_figures(figures)
+
+    key = ("dashboard_figures", athlete_version(atleta), (atleta, ano_selecionado, mes_selecionado, dia_selecionado))
+    return RESULT_CACHE.get_or_compute(key, build)
+
+@heavy_callback(
+    [
         Output('graph-distance-cumulative', 'figure'),
         Output('graph-activity-pie', 'figure'),
         Output('graph-pace-trend', 'figure'),
@@ -529,48 +890,262 @@ def filter_data(df_in, ano_sel, mes_sel, dia_sel):
         Output('graph-monthly-stats', 'figure'),
         Output('graph-pace-category', 'figure'),
     ],
+    FILTER_INPUTS,
+    'figures-status'
+)
+def update_dashboard(set_progress, atleta, ano_selecionado, mes_selecionado, dia_selecionado):
+    return dashboard_figures(atleta, ano_selecionado, mes_selecionado, dia_selecionado, set_progress)
+
+# 3b. Exportação dos dados filtrados: o link aponta para a rota /export
+@app.callback(
+    Output('export-link', 'href'),
     [
+        Input('dropdown-atleta', 'value'),
         Input('dropdown-ano', 'value'),
         Input('dropdown-mes', 'value'),
         Input('dropdown-dia', 'value'),
+        Input('dropdown-export-formato', 'value'),
     ]
 )
-def update_dashboard(ano_selecionado, mes_selecionado, dia_selecionado):
-    
-    df_filtered = filter_data(df, ano_selecionado, mes_selecionado, dia_selecionado)
-    
-    if df_filtered.empty:
-        empty_figure = go.Figure().update_layout(
-            template="plotly_dark",
-            annotations=[dict(
-                text="Nenhum dado disponível para os filtros selecionados",
-                x=0.5, y=0.5, xref="paper", yref="paper",
-                showarrow=False, font=dict(size=16)
-            )]
-        )
-        return ("N/A", "N/A km", "N/A", "N/A", 
-                empty_figure, empty_figure, empty_figure, empty_figure, empty_figure, empty_figure)
+@metrics.timed_callback
+def update_export_link(atleta, ano_selecionado, mes_selecionado, dia_selecionado, formato):
+    query = urlencode({'atleta': atleta, 'ano': ano_selecionado, 'mes': mes_selecionado,
+                       'dia': dia_selecionado, 'formato': formato})
+    return app.get_relative_path(f"/export?{query}")
 
-    total_runs = len(df_filtered)
-    total_km = float(df_filtered["distance_km"].sum())
-    pace_mean = df_filtered["duration_min"].sum() / total_km if total_km > 0 else None
-    total_time_min = float(df_filtered["duration_min"].sum())
-    
-    fig1 = create_distance_over_time(df_filtered)
-    fig2 = create_activity_type_pie(df_filtered)
-    fig3 = create_pace_trend(df_filtered)
-    fig_km = total_runs_by_km(df_filtered)
-    fig_monthly = create_monthly_stats(df_filtered)
-    fig_cat = pace_by_category(df_filtered)
-    
-    return (
-        total_runs, 
-        f"{total_km:.1f} km",
-        format_pace_minutes(pace_mean) if pace_mean else "N/A",
-        format_minutes_hms(total_time_min),
-        fig1, fig2, fig3, fig_km, fig_monthly, fig_cat
-    )
+EXPORT_CACHE = exports.ExportCache()
+
+@server.route("/export")
+def export_activities():
+    """/export?atleta=&ano=&mes=&dia=&formato=csv|csv.gz|parquet&colunas=a,b (em streaming)"""
+    args = flask.request.args
+    atleta = args.get('atleta') or DEFAULT_ATHLETE_ID
+    if atleta != DEFAULT_ATHLETE_ID and atleta not in available_athletes():
+        flask.abort(404, "Atleta desconhecido")
+    formato = args.get('formato', 'csv')
+    if formato not in exports.available_formats():
+        flask.abort(400, f"Formato indisponível: {formato}")
+    filtro = tuple(args.get(k, 'Todos') for k in ('ano', 'mes', 'dia'))
+    data = get_athlete_data(atleta)
+    colunas = [c for c in args.get('colunas', '').split(',') if c] or exports.default_columns(data.df)
+    try:
+        df_export = exports.select_columns(filter_data(data.df, *filtro), colunas)
+    except ValueError as e:
+        flask.abort(400, str(e))
+
+    key = (atleta, data.version, filtro, formato, tuple(colunas))
+    # o export só muda com a versão dos dados: navegador/proxy revalidam pelo ETag
+    etag = hashlib.sha1(repr(key).encode()).hexdigest()
+    if etag in flask.request.if_none_match:
+        response = flask.Response(status=304)
+    else:
+        body = EXPORT_CACHE.stream(key, lambda: exports.iter_export(df_export, formato))
+        response = flask.Response(flask.stream_with_context(body), mimetype=exports.FORMATS[formato][1])
+        filename = exports.file_name(f"activities_{atleta}", formato)
+        response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+# 4. Painéis de carga de treino (dependem só de ano/mês)
+def analytics_period(ano_sel, mes_sel):
+    """Intervalo [início, fim] exibido nos painéis de carga de treino"""
+    if ano_sel == "Todos":
+        return None, None
+    ano = int(ano_sel)
+    if mes_sel == "Todos":
+        return date(ano, 1, 1), date(ano, 12, 31)
+    mes = int(mes_sel)
+    end = date(ano + 1, 1, 1) if mes == 12 else date(ano, mes + 1, 1)
+    return date(ano, mes, 1), end - pd.Timedelta(days=1)
+
+def training_load_figures(atleta, ano_selecionado, mes_selecionado, set_progress=_no_progress):
+    def build():
+        set_progress("⏳ Calculando carga de treino…")
+        with metrics.stage("analytics"):
+            data = get_athlete_data(atleta)
+            analytics = get_analytics(data.df, (data.athlete_id, data.version))
+            start, end = analytics_period(ano_selecionado, mes_selecionado)
+            load = analytics.training_load(start, end)
+
+            weeks = analytics.iso_weeks()
+            if start is not None:
+                weeks = weeks[(weeks['week_start'] >= pd.Timestamp(start) - pd.Timedelta(days=6))
+                              & (weeks['week_start'] <= pd.Timestamp(end))]
+
+        set_progress("⏳ Gerando gráficos de carga…")
+        with metrics.stage("create_rolling_distance"):
+            fig_rolling = create_rolling_distance(load)
+        with metrics.stage("create_acwr_chart"):
+            fig_acwr = create_acwr_chart(load)
+        with metrics.stage("create_iso_week_chart"):
+            fig_weeks = create_iso_week_chart(weeks)
+        return plain_figures((fig_rolling, fig_acwr, fig_weeks))
+
+    key = ("training_load_figures", athlete_version(atleta), (atleta, ano_selecionado, mes_selecionado))
+    return RESULT_CACHE.get_or_compute(key, build)
+
+@heavy_callback(
+    [
+        Output('graph-rolling-distance', 'figure'),
+        Output('graph-acwr', 'figure'),
+        Output('graph-iso-weeks', 'figure'),
+    ],
+    FILTER_INPUTS[:3],
+    'training-load-status'
+)
+def update_training_load(set_progress, atleta, ano_selecionado, mes_selecionado):
+    return training_load_figures(atleta, ano_selecionado, mes_selecionado, set_progress)
+
+# 4b. Tabela de atividades: só a página visível sai do servidor (ver activity_table.py)
+ACTIVITY_FORMATTERS = {
+    'date': lambda s: s.dt.strftime('%Y-%m-%d %H:%M'),
+    'distance_km': lambda s: s.round(2),
+    'duration_min': lambda s: s.map(format_minutes_hms),
+    'pace_min_km': lambda s: s.map(format_pace_minutes),
+    'elevation_m': lambda s: s.round(0),
+}
+
+def activity_rows(page):
+    page = page.assign(**{col: fmt(page[col]) for col, fmt in ACTIVITY_FORMATTERS.items() if col in page})
+    return page.astype(object).where(page.notna(), None).to_dict('records')
+
+@app.callback(
+    [
+        Output('activity-table', 'data'),
+        Output('activity-table', 'page_count'),
+        Output('activity-table', 'page_current'),
+    ],
+    FILTER_INPUTS + [
+        Input('activity-table', 'page_current'),
+        Input('activity-table', 'page_size'),
+        Input('activity-table', 'sort_by'),
+    ]
+)
+@metrics.timed_callback
+def update_activity_table(atleta, ano_selecionado, mes_selecionado, dia_selecionado, page_current, page_size, sort_by):
+    # filtro ou ordenação novos voltam para a primeira página
+    if 'activity-table.page_current' not in dash.ctx.triggered_prop_ids:
+        page_current = 0
+    data = get_athlete_data(atleta)
+    ranges = data.kpi_index.filter_ranges(ano_selecionado, mes_selecionado, dia_selecionado)
+    sort = (sort_by[0]['column_id'], sort_by[0]['direction'] == 'asc') if sort_by else None
+    with metrics.stage("page"):
+        page, total = data.table.page(ranges, sort or DEFAULT_TABLE_SORT, page_current, page_size)
+    return activity_rows(page), max(1, -(-total // page_size)), page_current
+
+# 5. Recordes pessoais do ano selecionado (consulta direta ao índice)
+RECORD_ROWS = [
+    ('best_5k', 'Melhor 5 km (estimado)', format_minutes_hms),
+    ('best_10k', 'Melhor 10 km (estimado)', format_minutes_hms),
+    ('best_21k', 'Melhor meia maratona (estimado)', format_minutes_hms),
+    ('fastest_pace', 'Pace mais rápido', format_pace_minutes),
+    ('longest_distance', 'Maior distância', lambda v: f"{v:.1f} km"),
+    ('max_elevation', 'Maior ganho de elevação', lambda v: f"{v:.0f} m"),
+]
+
+@app.callback(
+    Output('records-table', 'children'),
+    [
+        Input('dropdown-atleta', 'value'),
+        Input('dropdown-ano', 'value'),
+    ]
+)
+@metrics.timed_callback
+def update_records(atleta, ano_selecionado):
+    records = get_athlete_data(atleta).records_index.lookup(year=ano_selecionado)
+    if not records:
+        return html.P("Nenhum recorde para o período selecionado", style={'textAlign': 'center'})
+
+    cell = {'padding': '6px 12px', 'borderBottom': '1px solid #444'}
+    rows = []
+    for metric, label, fmt in RECORD_ROWS:
+        record = records.get(metric)
+        if record is None:
+            continue
+        rows.append(html.Tr([
+            html.Td(label, style={**cell, 'fontWeight': 'bold'}),
+            html.Td(fmt(record['value']), style={**cell, 'color': STRAVA_ORANGE}),
+            html.Td(record['name'], style=cell),
+            html.Td(record['date'][:10], style=cell),
+        ]))
+    return html.Table(rows, style={'margin': '0 auto', 'borderCollapse': 'collapse'})
+
+# 6. Ranking do clube (lê só os agregados de leaderboard.json)
+@functools.lru_cache(maxsize=1)
+def _load_leaderboard(version):
+    return Leaderboard.load()
+
+def get_leaderboard() -> Leaderboard:
+    return _load_leaderboard(store.file_version(LEADERBOARD_PATH))
+
+@app.callback(
+    [
+        Output('dropdown-ranking-chave', 'options'),
+        Output('dropdown-ranking-chave', 'value'),
+    ],
+    Input('radio-ranking-periodo', 'value')
+)
+@metrics.timed_callback
+def update_leaderboard_periods(periodo):
+    keys = get_leaderboard().periods(periodo)
+    return [{'label': k, 'value': k} for k in keys], (keys[0] if keys else None)
+
+@app.callback(
+    Output('leaderboard-table', 'children'),
+    [
+        Input('radio-ranking-periodo', 'value'),
+        Input('dropdown-ranking-chave', 'value'),
+    ]
+)
+@metrics.timed_callback
+def update_leaderboard(periodo, chave):
+    ranking = get_leaderboard().top(periodo, chave, k=10)
+    if not ranking:
+        return html.P("Sem dados do clube. Sincronize os atletas com athletes.py", style={'textAlign': 'center'})
+
+    names = store.list_athletes()
+    cell = {'padding': '6px 12px', 'borderBottom': '1px solid #444'}
+    header = html.Tr([html.Th(h, style=cell) for h in ("#", "Atleta", "Km", "Tempo", "Atividades")])
+    rows = [
+        html.Tr([
+            html.Td(pos, style={**cell, 'color': STRAVA_ORANGE, 'fontWeight': 'bold'}),
+            html.Td(names.get(athlete_id, athlete_id), style=cell),
+            html.Td(f"{totals['distance_km']:.1f}", style=cell),
+            html.Td(format_minutes_hms(totals['duration_min']), style=cell),
+            html.Td(totals['runs'], style=cell),
+        ])
+        for pos, (athlete_id, totals) in enumerate(ranking, start=1)
+    ]
+    return html.Table([header] + rows, style={'margin': '0 auto', 'borderCollapse': 'collapse'})
+
+# ==============================================================================
+# --- AQUECIMENTO (COLD START) ---
+# ==============================================================================
+
+def warmup(athlete_id=None):
+    """Carrega dados, índices e o plotly.express antes do primeiro callback (ver gunicorn.conf.py)"""
+    t0 = time.perf_counter()
+    try:
+        _px()
+        data = get_athlete_data(athlete_id)
+        analytics = get_analytics(data.df, (data.athlete_id, data.version))
+        analytics.training_load()
+        analytics.iso_weeks()
+        get_leaderboard()
+        # o primeiro gráfico de cada tipo carrega os validadores do plotly
+        sample = data.df.head(50)
+        for builder in (total_runs_by_km, create_distance_over_time, create_activity_type_pie, create_pace_trend):
+            builder(sample)
+    except Exception as e:
+        print(f"⚠️ Aquecimento incompleto: {e}")
+        return
+    print(f"🔥 Aquecimento concluído em {time.perf_counter() - t0:.2f}s "
+          f"({data.athlete_id}: {len(data.df)} atividades)")
 
 if __name__ == '__main__':
+    # No servidor local o aquecimento roda em paralelo com a subida do Flask
+    threading.Thread(target=warmup, daemon=True).start()
     # Esta linha inicia o servidor de desenvolvimento local
     app.run(debug=not IS_RENDER, host='0.0.0.0', port=8050)
\ No newline at end of file
@@ -6,8 +6,15 @@ from datetime import datetime, timedelta
 import json
 import streamlit as st
 import os
+import time
 from pathlib import Path
 
+from activity_batch import ActivityBatch
+from kpis import KpiIndex, naive_dates
+from profiling import NULL_PROFILER, StageProfiler, default_report_path, peak_rss_mb, profiler_from_env
+from raw_cache import RawPageCache
+from records import RecordsIndex
+
 # === CONFIGURAÇÃO STRAVA (COMPATÍVEL COM STREAMLIT CLOUD) ===
 def get_strava_credentials():
     """Obtém credenciais do Strava de forma segura para Streamlit Cloud"""
@@ -22,9 +29,10 @@ def get_strava_credentials():
         st.error(f"❌ Erro ao carregar credenciais: {e}")
         return None, None, None
 
-# URLs da API
-TOKEN_URL = "https://www.strava.com/oauth/token"
-ACTIVITIES_URL = "https://www.strava.com/api/v3/athlete/activities"
+# URLs da API (STRAVA_API_URL aponta para outro servidor, ex.: um stub local)
+API_BASE_URL = os.environ.get("STRAVA_API_URL", "https://www.strava.com").rstrip("/")
+TOKEN_URL = f"{API_BASE_URL}/oauth/token"
+ACTIVITIES_URL = f"{API_BASE_URL}/api/v3/athlete/activities"
 
 def format_pace(seconds_per_km):
     """Converte segundos por km em formato MM:SS"""
@@ -34,6 +42,18 @@ def format_pace(seconds_per_km):
     secs = int(seconds_per_km % 60)
     return f"{mins}:{secs:02d}"
 
+def request_access_token(client_id, client_secret, refresh_token):
+    """Troca um refresh token por um access token (sem st.*; erros propagam)"""
+    payload = {
+        "client_id": client_id,
+        "client_secret": client_secret,
+        "grant_type": "refresh_token",
+        "refresh_token": refresh_token
+    }
+    resp = requests.post(TOKEN_URL, data=payload, timeout=15)
+    resp.raise_for_status()
+    return resp.json().get("access_token")
+
 def renew_access_token():
     """Renova o access token usando refresh token"""
     CLIENT_ID, CLIENT_SECRET, REFRESH_TOKEN = get_strava_credentials()
@@ -42,99 +62,125 @@ def renew_access_token():
         st.error("❌ Credenciais do Strava não configuradas. Verifique o Streamlit Secrets.")
         return None
     
-    payload = {
-        "client_id": CLIENT_ID,
-        "client_secret": CLIENT_SECRET,
-        "grant_type": "refresh_token",
-        "refresh_token": REFRESH_TOKEN
-    }
-    
     try:
-        resp = requests.post(TOKEN_URL, data=payload, timeout=15)
-        resp.raise_for_status()
-        data = resp.json()
+        access_token = request_access_token(CLIENT_ID, CLIENT_SECRET, REFRESH_TOKEN)
         st.success("✅ Token renovado com sucesso")
-        return data.get("access_token")
+        return access_token
     except Exception as e:
         st.error(f"❌ Erro ao renovar token: {e}")
         return None
 
-def fetch_all_activities(access_token, per_page=50, max_pages=20):
-    """Busca todas as atividades paginadas"""
-    if not access_token:
-        return []
-        
+def iter_activity_pages(access_token, per_page=50, max_pages=20, cache=None, offline=False,
+                        before=None, after=None, profiler=None):
+    """Gera (página, atividades) à medida que as páginas chegam da API.
+
+    Não chama st.*, então pode ser consumido fora da thread do Streamlit.
+    Erros HTTP são propagados para quem consome o gerador.
+
+    Com `cache` (raw_cache.RawPageCache) as respostas brutas são guardadas em
+    disco e revalidadas com ETag/Last-Modified; com `offline=True` as páginas
+    vêm só do cache, sem token nem rede. `before`/`after` (epoch em segundos)
+    restringem o intervalo de datas, como na API do Strava. Com `profiler`
+    (profiling.StageProfiler) as etapas network/json_decode são medidas.
+    """
+    prof = profiler or NULL_PROFILER
+    if offline:
+        pages = cache.iter_pages(per_page, max_pages, before=before, after=after)
+        while True:
+            with prof.stage("cache_read") as s:
+                item = next(pages, None)
+                s.items = len(item[1]) if item else 0
+            if item is None:
+                return
+            yield item
+
     headers = {"Authorization": f"Bearer {access_token}"}
-    activities = []
-    
-    with st.spinner("Buscando atividades do Strava..."):
-        for page in range(1, max_pages + 1):
-            params = {"per_page": per_page, "page": page}
-            try:
+    for page in range(1, max_pages + 1):
+        params = {"per_page": per_page, "page": page}
+        if before is not None:
+            params["before"] = int(before)
+        if after is not None:
+            params["after"] = int(after)
+        with prof.stage("network") as s:
+            if cache is None:
                 r = requests.get(ACTIVITIES_URL, headers=headers, params=params, timeout=15)
+            else:
+                r = requests.get(ACTIVITIES_URL, headers={**headers, **cache.validators(params)},
+                                 params=params, timeout=15)
+            if r.status_code != 304:
                 r.raise_for_status()
+            s.bytes = len(r.content)
+        # com cache, a decodificação inclui gravar/ler o blob comprimido
+        with prof.stage("json_decode") as s:
+            if cache is None:
                 page_items = r.json()
-                if not page_items:
-                    break
-                activities.extend(page_items)
+            elif r.status_code == 304:
+                page_items = cache.load(params)
+                if page_items is None:
+                    # blob apagado depois dos validadores: busca a página de novo, sem
+                    # condicionais (parar aqui gravaria um CSV truncado)
+                    r = requests.get(ACTIVITIES_URL, headers=headers, params=params, timeout=15)
+                    r.raise_for_status()
+                    if r.status_code == 304:
+                        raise RuntimeError(f"Página {page}: 304 sem cache local para reusar")
+                    page_items = cache.store(params, r.content, r.headers.get("ETag"),
+                                             r.headers.get("Last-Modified"))
+            else:
+                page_items = cache.store(params, r.content, r.headers.get("ETag"),
+                                         r.headers.get("Last-Modified"))
+            s.items = len(page_items)
+        if not page_items:
+            break
+        yield page, page_items
+        # Página incompleta = última página; evita uma requisição vazia extra
+        if len(page_items) < per_page:
+            break
+
+def fetch_all_activities(access_token, per_page=50, max_pages=20, profiler=None):
+    """Busca todas as atividades paginadas (ActivityBatch; os dicts de cada página são descartados)"""
+    if not access_token:
+        return ActivityBatch.from_raw([])
+        
+    batches = []
+    
+    with st.spinner("Buscando atividades do Strava..."):
+        last_page = 0  # última página recebida; o erro é sempre na seguinte
+        try:
+            for page, page_items in iter_activity_pages(access_token, per_page, max_pages, profiler=profiler):
+                batches.append(ActivityBatch.from_raw(page_items))
                 st.write(f"📄 Página {page}: {len(page_items)} atividades")
-            except Exception as e:
-                st.error(f"❌ Erro página {page}: {e}")
-                break
+                last_page = page
+        except Exception as e:
+            st.error(f"❌ Erro página {last_page + 1}: {e}")
                 
-    if activities:
+    activities = ActivityBatch.concat(batches)
+    if len(activities):
         st.success(f"✅ Total de atividades carregadas: {len(activities)}")
     else:
         st.warning("⚠️ Nenhuma atividade encontrada")
         
     return activities
 
-def transform_activities(activities: list) -> pd.DataFrame:
-    """Transforma atividades em DataFrame limpo"""
-    if not activities:
-        return pd.DataFrame()
-        
-    records = []
-    for act in activities:
-        records.append({
-            "id": act.get("id"),
-            "name": act.get("name"),
-            "type": act.get("type"),
-            "date": pd.to_datetime(act.get("start_date_local")),
-            "distance_km": act.get("distance", 0) / 1000,
-            "duration_min": act.get("moving_time", 0) / 60,
-            "elevation_m": act.get("total_elevation_gain", 0),
-            "avg_speed_kmh": act.get("average_speed", 0) * 3.6,
-            "max_speed_kmh": act.get("max_speed", 0) * 3.6,
-            "calories": act.get("calories", 0),
-            "kudos": act.get("kudos_count", 0),
-            "polyline": act.get("map", {}).get("summary_polyline"),
-        })
-    
-    df = pd.DataFrame(records)
-    
-    # Evita divisão por zero
-    df["pace_min_km"] = df["duration_min"] / df["distance_km"].replace({0: pd.NA})
-    
-    # Formata com 1 casa decimal
-    df["distance_km"] = df["distance_km"].round(1)
-    df["pace_min_km"] = df["pace_min_km"].round(1)
-    df["date_only"] = df["date"].dt.date
-    df["month_year"] = df["date"].dt.to_period("M")
-    
-    return df
+def transform_activities(activities) -> pd.DataFrame:
+    """Transforma atividades (dicts da API ou ActivityBatch) em DataFrame limpo"""
+    if not isinstance(activities, ActivityBatch):
+        activities = ActivityBatch.from_raw(activities or [])
+    return activities.to_frame()
+
+def output_path(name: str = "activities.csv") -> Path:
+    """Caminho de saída dos arquivos gerados pelo ETL"""
+    # No Streamlit Cloud, salva na pasta temporária
+    if 'streamlit' in str(__file__):
+        return Path("/tmp") / name
+    # Localmente, usa a pasta do projeto
+    path = Path(__file__).parent / "plots" / name
+    path.parent.mkdir(exist_ok=True)
+    return path
 
 def save_csv(df: pd.DataFrame, name: str = "activities.csv"):
     """Salva DataFrame como CSV"""
     try:
-        # No Streamlit Cloud, salva na pasta temporária
-        if 'streamlit' in str(__file__):
-            path = Path("/tmp") / name
-        else:
-            # Localmente, usa a pasta do projeto
-            path = Path(__file__).parent / "plots" / name
-            path.parent.mkdir(exist_ok=True)
-            
+        path = output_path(name)
         df.to_csv(path, index=False)
         st.success(f"✅ CSV salvo: {path}")
         return path
@@ -142,6 +188,69 @@ def save_csv(df: pd.DataFrame, name: str = "activities.csv"):
         st.error(f"❌ Erro ao salvar CSV: {e}")
         return None
 
+# === PIPELINE EM STREAMING ===
+# Cada página da API é transformada e gravada assim que chega, então a memória
+# fica limitada a uma página (per_page atividades), independente do histórico.
+
+def stream_activities_to_csv(access_token, path, per_page=50, max_pages=20, stats=None,
+                             cache=None, offline=False, records=None, before=None, after=None,
+                             profiler=None):
+    """Busca, transforma e grava as atividades página a página.
+
+    Escreve num arquivo temporário e só substitui `path` no final, para que
+    leitores nunca vejam um CSV parcial. Retorna o total de atividades gravadas.
+    Se `stats` for um dict, recebe tempo/itens/pico de RSS por etapa
+    ("network", "json_decode", "transform", "write"); `profiler`
+    (profiling.StageProfiler) permite um relatório mais completo. `cache`/`offline`/`before`/`after` são
+    repassados para iter_activity_pages. Com `records` (records.RecordsIndex) os recordes
+    pessoais são atualizados a cada lote, sem reprocessar o histórico.
+    """
+    profiler = profiler or StageProfiler()
+    path = Path(path)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    pages = iter_activity_pages(access_token, per_page, max_pages, cache=cache, offline=offline,
+                                before=before, after=after, profiler=profiler)
+    total = 0
+
+    try:
+        with open(tmp_path, "w", newline="", encoding="utf-8") as fh:
+            for page, page_items in pages:
+                with profiler.stage("transform") as s:
+                    batch = transform_activities(page_items)
+                    s.items = len(batch)
+
+                with profiler.stage("write") as s:
+                    batch.to_csv(fh, index=False, header=(total == 0))
+                    s.items = len(batch)
+
+                if records is not None:
+                    with profiler.stage("records") as s:
+                        records.update(batch)
+                        s.items = len(batch)
+
+                total += len(batch)
+                del page_items, batch
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    finally:
+        if stats is not None:
+            stats.update(profiler.as_stats())
+
+    if total:
+        tmp_path.replace(path)
+    else:
+        tmp_path.unlink(missing_ok=True)
+    return total
+
+def print_stage_stats(stats: dict):
+    """Imprime tempo, throughput e pico de RSS de cada etapa"""
+    print(f"   {'Etapa':<10} {'Tempo (s)':>10} {'Ativ.':>8} {'Ativ./s':>10} {'Pico RSS (MB)':>14}")
+    for stage, entry in stats.items():
+        rate = entry["items"] / entry["seconds"] if entry["seconds"] > 0 else float("inf")
+        rss = f"{entry['peak_rss_mb']:.1f}" if entry["peak_rss_mb"] is not None else "N/A"
+        print(f"   {stage:<10} {entry['seconds']:>10.3f} {entry['items']:>8} {rate:>10.0f} {rss:>14}")
+
 def create_distance_over_time(df: pd.DataFrame):
     """Gráfico de distância acumulada ao longo do tempo"""
     if df.empty:
@@ -232,23 +341,32 @@ def filter_by_date(df: pd.DataFrame, start_date: str = None, end_date: str = Non
     """Filtra DataFrame pelo intervalo [start_date, end_date]"""
     if df.empty:
         return df
-        
+
+    sd = ed = None
     if start_date:
         try:
             sd = pd.to_datetime(start_date)
-            df = df[df["date"] >= sd]
-        except:
+        except (ValueError, TypeError):
             st.warning("⚠️ Data inicial inválida")
     
     if end_date:
         try:
             ed = pd.to_datetime(end_date)
-            # Inclui o dia inteiro
-            df = df[df["date"] <= ed + timedelta(days=1) - timedelta(seconds=1)]
-        except:
+        except (ValueError, TypeError):
             st.warning("⚠️ Data final inválida")
-    
-    return df
+
+    if sd is None and ed is None:
+        return df
+
+    # Uma única máscara, comparando no horário local (sem fuso) do CSV
+    dates = naive_dates(df["date"])
+    mask = pd.Series(True, index=df.index)
+    if sd is not None:
+        mask &= dates >= sd
+    if ed is not None:
+        # Inclui o dia inteiro
+        mask &= dates < ed.normalize() + timedelta(days=1)
+    return df[mask]
 
 def get_activity_stats(df: pd.DataFrame):
     """Retorna estatísticas resumidas das atividades"""
@@ -263,12 +381,13 @@ def get_activity_stats(df: pd.DataFrame):
             "last_date": None
         }
     
+    totals = KpiIndex(df).totals()
     stats = {
-        "total_activities": len(df),
-        "total_distance_km": df["distance_km"].sum(),
-        "total_duration_hours": df["duration_min"].sum() / 60,
-        "total_elevation_m": df["elevation_m"].sum(),
-        "avg_pace": df[df["pace_min_km"] > 0]["pace_min_km"].mean(),
+        "total_activities": totals["runs"],
+        "total_distance_km": totals["distance_km"],
+        "total_duration_hours": totals["duration_min"] / 60,
+        "total_elevation_m": totals["elevation_m"],
+        "avg_pace": totals["avg_pace"],
         "first_date": df["date"].min(),
         "last_date": df["date"].max()
     }
@@ -277,55 +396,94 @@ def get_activity_stats(df: pd.DataFrame):
 def load_activities(per_page=50, max_pages=20):
     """
     Função principal para carregar atividades - COMPATÍVEL COM STREAMLIT CLOUD
+
+    Com STRAVA_PROFILE definido, grava o perfil das etapas (ver profiling.py).
     """
+    profiler = profiler_from_env()
+    prof = profiler or NULL_PROFILER
+
     # 1. Renovar token
-    access_token = renew_access_token()
+    with prof.stage("token"):
+        access_token = renew_access_token()
     if not access_token:
         st.error("❌ Falha na autenticação com Strava")
         return pd.DataFrame()
     
     # 2. Buscar atividades
-    activities = fetch_all_activities(access_token, per_page, max_pages)
-    if not activities:
+    activities = fetch_all_activities(access_token, per_page, max_pages, profiler=profiler)
+    if not len(activities):
         st.error("❌ Nenhuma atividade encontrada")
         return pd.DataFrame()
     
     # 3. Transformar dados
-    df = transform_activities(activities)
+    with prof.stage("transform") as s:
+        df = transform_activities(activities)
+        s.items = len(df)
     
     if not df.empty:
         st.success(f"✅ Dados carregados: {len(df)} atividades")
     else:
         st.error("❌ Erro ao transformar dados")
+
+    if profiler is not None:
+        path = profiler.save(default_report_path(output_path("etl_profile.json")), activities=len(df))
+        st.caption(f"⏱️ Perfil do ETL salvo em {path}")
         
     return df
 
 # Função para uso local (sem Streamlit)
-def main_local():
-    """Função principal para execução local"""
+def main_local(use_cache=False, offline=False, profile=None):
+    """Função principal para execução local
+
+    use_cache: guarda as respostas brutas em cache/raw (ver raw_cache.py)
+    offline:   reexecuta o ETL só a partir do cache, sem chamar a API
+    profile:   opções de perfil ("1", "cprofile", "tracemalloc", "all");
+               None usa STRAVA_PROFILE (ver profiling.py)
+    """
     print("=== ETL STRAVA (Local) ===\n")
+    cache = RawPageCache() if (use_cache or offline) else None
+    profiler = profiler_from_env(profile)
     
     # 1. Renovar token
-    print("1. Renovando token...")
-    access_token = renew_access_token()
-    if not access_token:
-        print("Falha ao renovar token. Abortando.")
-        return
+    if offline:
+        print("1. Modo offline: usando respostas em cache")
+        access_token = None
+    else:
+        print("1. Renovando token...")
+        with (profiler or NULL_PROFILER).stage("token"):
+            access_token = renew_access_token()
+        if not access_token:
+            print("Falha ao renovar token. Abortando.")
+            return
     
-    # 2. Buscar atividades
-    print("\n2. Buscando atividades...")
-    activities = fetch_all_activities(access_token, per_page=50, max_pages=20)
-    if not activities:
+    # 2. Buscar, transformar e gravar em streaming
+    print("\n2. Buscando e gravando atividades (streaming)...")
+    path = output_path("activities.csv")
+    records = RecordsIndex.load(output_path("records.json"))
+    stats = {}
+    t0 = time.perf_counter()
+    try:
+        total = stream_activities_to_csv(access_token, path, per_page=50, max_pages=20, stats=stats,
+                                         cache=cache, offline=offline, records=records, profiler=profiler)
+    except Exception as e:
+        print(f"❌ Erro durante a busca: {e}")
+        return
+    wall = time.perf_counter() - t0
+    if not total:
         print("Nenhuma atividade encontrada.")
         return
+    records.save(output_path("records.json"))
+    print(f"   {total} atividades gravadas em {path} ({wall:.2f}s, {total / wall:.0f} ativ./s)")
+    print_stage_stats(stats)
+    if profiler is not None:
+        report_path = profiler.save(default_report_path(output_path("etl_profile.json")),
+                                    activities=total, activities_per_second=round(total / wall, 1))
+        print(f"   ⏱️ Perfil salvo em {report_path}")
     
-    # 3. Transformar
-    print("\n3. Transformando dados...")
-    df = transform_activities(activities)
-    print(f"   Dimensões: {df.shape}")
-    print(f"   Período: {df['date'].min()} a {df['date'].max()}")
-    
-    # 4. Estatísticas
+    # 3. Estatísticas (relê só as colunas necessárias)
+    df = pd.read_csv(path, usecols=["date", "distance_km", "duration_min", "elevation_m", "pace_min_km"],
+                     parse_dates=["date"])
+    print(f"\n3. Período: {df['date'].min()} a {df['date'].max()}")
     stats = get_activity_stats(df)
     print(f"\n📊 Estatísticas:")
     print(f"   Total atividades: {stats['total_activities']}")
@@ -334,7 +492,14 @@ def main_local():
     print(f"   Elevação total: {stats['total_elevation_m']:.0f} m")
 
 if __name__ == "__main__":
-    # Se executado localmente (sem Streamlit)
-    import sys
-    if 'streamlit' not in sys.modules:
-        main_local()
\ No newline at end of file
+    # Se executado localmente (sem Streamlit). O módulo importa streamlit, então
+    # o teste precisa ser pelo runtime ativo e não por sys.modules.
+    if not st.runtime.exists():
+        import argparse
+        parser = argparse.ArgumentParser(description="ETL Strava (local)")
+        parser.add_argument("--cache", action="store_true", help="guarda as respostas brutas da API em disco")
+        parser.add_argument("--offline", action="store_true", help="reexecuta o ETL só a partir do cache")
+        parser.add_argument("--profile", nargs="?", const="1",
+                            help="grava o perfil das etapas; opções: cprofile,tracemalloc,all")
+        args = parser.parse_args()
+        main_local(use_cache=args.cache, offline=args.offline, profile=args.profile)
\ No newline at end of file
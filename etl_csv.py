@@ -0,0 +1,184 @@
+"""Leitura tipada do strava_activities_etl.csv (formato alinhado com espaços).
+
+O CSV tem cabeçalho e valores preenchidos com espaços e colunas só de exibição
+("05:26", "5.42 km"). load_etl_frame lê só as colunas pedidas, já com os
+tipos certos, de um arquivo companheiro binário ao lado do CSV:
+
+- strava_activities_etl.parquet  se houver engine de parquet (pyarrow/fastparquet)
+- strava_activities_etl.pkl      caso contrário
+
+O companheiro é gerado na primeira leitura (ou com `python etl_csv.py build`)
+e refeito quando o CSV fica mais novo que ele. Sem ele, o CSV é lido com os
+tipos declarados em DTYPES, sem to_datetime/to_numeric depois.
+
+    python etl_csv.py bench --rows 200000   # compara os caminhos de leitura
+"""
+import argparse
+import time
+from pathlib import Path
+
+import pandas as pd
+
+ETL_CSV = Path(__file__).resolve().parent / "strava_activities_etl.csv"
+
+DTYPES = {
+    "name": "string",
+    "Distancia_km": "float64",
+    "Distancia_Formatada": "string",
+    "Duracao_min": "float64",
+    "Pace_Formatado": "string",
+    "Pace_Segundos_por_km": "float64",
+    "average_speed": "float64",
+    "total_elevation_gain": "float64",
+    "moving_time": "int64",
+}
+DATE_COLUMNS = {"Data": "%Y-%m-%d"}
+
+
+def _raw_header(path) -> dict:
+    """{nome limpo: nome visto pelo read_csv} (o cabeçalho também vem com espaços)"""
+    with open(path, encoding="utf-8") as fh:
+        header = fh.readline().rstrip("\r\n").split(",")
+    # com skipinitialspace o read_csv tira só os espaços à esquerda
+    return {raw.strip(): raw.lstrip() for raw in header}
+
+
+def read_etl_csv(path=ETL_CSV, columns=None) -> pd.DataFrame:
+    """Lê o CSV só com as colunas pedidas e com os tipos de DTYPES/DATE_COLUMNS"""
+    raw = _raw_header(path)
+    wanted = list(columns) if columns else list(raw)
+    df = pd.read_csv(
+        path,
+        usecols=[raw[c] for c in wanted],
+        skipinitialspace=True,
+        # números são convertidos direto pelo parser; texto vem como object e é aparado abaixo
+        dtype={raw[c]: "object" if DTYPES[c] == "string" else DTYPES[c] for c in wanted if c in DTYPES},
+    )
+    df.columns = df.columns.str.strip()
+    for col in df.columns:
+        if col in DATE_COLUMNS:
+            df[col] = pd.to_datetime(df[col].str.strip(), format=DATE_COLUMNS[col])
+        elif DTYPES.get(col) == "string":
+            df[col] = df[col].str.rstrip().astype("string")
+    return df[wanted]
+
+
+def companion_paths(path=ETL_CSV):
+    path = Path(path)
+    return path.with_suffix(".parquet"), path.with_suffix(".pkl")
+
+
+def write_companion(path=ETL_CSV, df=None) -> Path:
+    """Grava o companheiro tipado (parquet, ou pickle sem engine de parquet)"""
+    df = read_etl_csv(path) if df is None else df
+    parquet, pickle = companion_paths(path)
+    try:
+        df.to_parquet(parquet, index=False)
+        pickle.unlink(missing_ok=True)
+        return parquet
+    except ImportError:
+        df.to_pickle(pickle)
+        return pickle
+
+
+def _fresh_companion(path):
+    mtime = Path(path).stat().st_mtime
+    for companion in companion_paths(path):
+        if companion.exists() and companion.stat().st_mtime >= mtime:
+            return companion
+    return None
+
+
+def load_etl_frame(path=ETL_CSV, columns=None) -> pd.DataFrame:
+    """Colunas tipadas do CSV do ETL, pelo companheiro binário quando em dia"""
+    companion = _fresh_companion(path)
+    if companion is not None:
+        if companion.suffix == ".parquet":
+            try:
+                return pd.read_parquet(companion, columns=list(columns) if columns else None)
+            except ImportError:
+                pass
+        else:
+            df = pd.read_pickle(companion)
+            return df[list(columns)] if columns else df
+    df = read_etl_csv(path)
+    try:
+        write_companion(path, df)
+    except OSError as e:  # diretório só de leitura: segue com o CSV
+        print(f"⚠️ Não foi possível gravar o companheiro de {Path(path).name}: {e}")
+    return df[list(columns)] if columns else df
+
+
+# --- comparação de tempos ------------------------------------------------------
+
+def legacy_read(path, columns):
+    """Caminho antigo do graficos.py: lê tudo como texto e converte depois"""
+    df = pd.read_csv(path, skipinitialspace=True)
+    df.columns = df.columns.str.strip()
+    df["Data"] = pd.to_datetime(df["Data"])
+    for col in columns:
+        if col != "Data":
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+    return df[columns]
+
+
+def _synthetic_csv(source, rows, out) -> Path:
+    """Repete as linhas do CSV real até `rows`, mantendo o alinhamento com espaços"""
+    lines = Path(source).read_text(encoding="utf-8").splitlines()
+    header, body = lines[0], lines[1:]
+    with open(out, "w", encoding="utf-8") as fh:
+        fh.write(header + "\n")
+        for i in range(rows):
+            fh.write(body[i % len(body)] + "\n")
+    return Path(out)
+
+
+def bench(path, columns, repeat=5) -> dict:
+    def best(func):
+        times = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - t0)
+        return min(times)
+
+    for companion in companion_paths(path):
+        companion.unlink(missing_ok=True)
+    results = {
+        "legado (read_csv + to_datetime/to_numeric)": best(lambda: legacy_read(path, columns)),
+        "CSV tipado (read_etl_csv)": best(lambda: read_etl_csv(path, columns)),
+    }
+    t0 = time.perf_counter()
+    companion = write_companion(path)
+    results[f"gravar companheiro ({companion.suffix})"] = time.perf_counter() - t0
+    results[f"companheiro {companion.suffix} (load_etl_frame)"] = best(lambda: load_etl_frame(path, columns))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Leitura tipada do strava_activities_etl.csv")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("build", help="gera/atualiza o companheiro binário")
+    p.add_argument("csv", nargs="?", type=Path, default=ETL_CSV)
+    p = sub.add_parser("bench", help="compara os tempos de leitura")
+    p.add_argument("csv", nargs="?", type=Path, default=ETL_CSV)
+    p.add_argument("--rows", type=int, default=None, help="replica o CSV até N linhas (arquivo temporário)")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        print(f"✅ Companheiro gravado: {write_companion(args.csv)}")
+    else:
+        path = args.csv
+        if args.rows:
+            path = _synthetic_csv(args.csv, args.rows, args.csv.with_name(f"bench_{args.rows}_{args.csv.name}"))
+        columns = ["Data", "Distancia_km", "Pace_Segundos_por_km", "total_elevation_gain"]
+        try:
+            results = bench(path, columns)
+        finally:
+            if args.rows:
+                for file in (path, *companion_paths(path)):
+                    file.unlink(missing_ok=True)
+        base = next(iter(results.values()))
+        print(f"=== {path.name}: colunas dos gráficos ===")
+        for label, seconds in results.items():
+            print(f"   {label:<48} {seconds * 1000:>9.1f} ms  ({base / seconds:>5.1f}x)")
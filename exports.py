@@ -0,0 +1,196 @@
+"""Exportação das atividades filtradas (CSV, CSV.gz e Parquet).
+
+Usado pelo botão de download do app.py e pela rota /export do dah.py. O
+arquivo é gerado em blocos de EXPORT_CHUNK_ROWS linhas (iter_export), para
+que a rota do Flask possa transmiti-lo sem montar tudo em memória, e só
+quando alguém pede o download.
+
+ExportCache guarda os arquivos prontos por (versão do dataset, filtro,
+formato, colunas), limitado em bytes; exports maiores que o limite por
+entrada são sempre gerados de novo, em streaming.
+"""
+import importlib.util
+import io
+import threading
+import zlib
+from collections import OrderedDict
+
+import pandas as pd
+
+EXPORT_CHUNK_ROWS = 5000
+# colunas pesadas que ficam fora do export padrão
+HEAVY_COLUMNS = ("polyline",)
+
+FORMATS = {
+    # formato -> (extensão, mimetype)
+    "csv": ("csv", "text/csv"),
+    "csv.gz": ("csv.gz", "application/gzip"),
+    "parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+
+
+def available_formats() -> list:
+    """Formatos com dependências instaladas (Parquet precisa de pyarrow ou fastparquet)"""
+    has_parquet = any(importlib.util.find_spec(engine) for engine in ("pyarrow", "fastparquet"))
+    return [fmt for fmt in FORMATS if fmt != "parquet" or has_parquet]
+
+
+def default_columns(df) -> list:
+    return [col for col in df.columns if col not in HEAVY_COLUMNS]
+
+
+def select_columns(df, columns=None) -> pd.DataFrame:
+    """Colunas pedidas (na ordem do DataFrame); ValueError se alguma não existir"""
+    if not columns:
+        return df
+    unknown = [col for col in columns if col not in df.columns]
+    if unknown:
+        raise ValueError(f"Colunas desconhecidas: {', '.join(unknown)}")
+    return df[[col for col in df.columns if col in set(columns)]]
+
+
+def file_name(stem, fmt) -> str:
+    return f"{stem}.{FORMATS[fmt][0]}"
+
+
+def _chunks(df):
+    for start in range(0, len(df), EXPORT_CHUNK_ROWS):
+        yield df.iloc[start:start + EXPORT_CHUNK_ROWS]
+
+
+def _iter_csv(df):
+    yield df.iloc[:0].to_csv(index=False).encode("utf-8")
+    for chunk in _chunks(df):
+        yield chunk.to_csv(index=False, header=False).encode("utf-8")
+
+
+def _iter_csv_gz(df):
+    # wbits=31: fluxo no formato gzip (cabeçalho + CRC), comprimido bloco a bloco
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for data in _iter_csv(df):
+        out = compressor.compress(data)
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Arquivo só de escrita que acumula bytes até serem drenados"""
+
+    def __init__(self):
+        self._parts = []
+        self._pos = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._pos
+
+    def drain(self) -> bytes:
+        data, self._parts = b"".join(self._parts), []
+        return data
+
+
+def _iter_parquet(df):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        # sem pyarrow (ex.: fastparquet) o arquivo sai de uma vez
+        buffer = io.BytesIO()
+        df.to_parquet(buffer, index=False)
+        yield buffer.getvalue()
+        return
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    sink = _ChunkSink()
+    # um row group por bloco; os bytes saem à medida que cada bloco é gravado
+    with pq.ParquetWriter(sink, schema) as writer:
+        for chunk in _chunks(df):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            data = sink.drain()
+            if data:
+                yield data
+    yield sink.drain()
+
+
+_WRITERS = {"csv": _iter_csv, "csv.gz": _iter_csv_gz, "parquet": _iter_parquet}
+
+
+def iter_export(df, fmt="csv", columns=None):
+    """Gera o arquivo exportado em pedaços de bytes"""
+    if fmt not in _WRITERS:
+        raise ValueError(f"Formato desconhecido: {fmt} (use {', '.join(FORMATS)})")
+    yield from _WRITERS[fmt](select_columns(df, columns))
+
+
+def export_bytes(df, fmt="csv", columns=None) -> bytes:
+    return b"".join(iter_export(df, fmt, columns))
+
+
+class ExportCache:
+    """LRU de exports prontos, limitada pelo total de bytes"""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_entry_bytes=16 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+            return data
+
+    def put(self, key, data: bytes):
+        if len(data) > self.max_entry_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            self._bytes -= len(old) if old is not None else 0
+            self._entries[key] = data
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def discard(self, match):
+        """Remove as entradas cuja chave satisfaz match(chave)"""
+        with self._lock:
+            for key in [key for key in self._entries if match(key)]:
+                self._bytes -= len(self._entries.pop(key))
+
+    def get_or_build(self, key, build) -> bytes:
+        """Bytes do export; build() devolve o iterável de pedaços"""
+        data = self.get(key)
+        if data is None:
+            data = b"".join(build())
+            self.put(key, data)
+        return data
+
+    def stream(self, key, build):
+        """Pedaços do export: do cache, ou gerados e guardados ao terminar"""
+        data = self.get(key)
+        if data is not None:
+            for start in range(0, len(data), 1024 * 1024):
+                yield data[start:start + 1024 * 1024]
+            return
+        parts, size = [], 0
+        for part in build():
+            if parts is not None:
+                size += len(part)
+                if size <= self.max_entry_bytes:
+                    parts.append(part)
+                else:  # grande demais para o cache: só transmite
+                    parts = None
+            yield part
+        if parts is not None:
+            self.put(key, b"".join(parts))
@@ -1,83 +1,122 @@
+import sys
+
 import matplotlib.pyplot as plt
 import seaborn as sns
 import pandas as pd
 
-# O CORRETO É CARREGAR O ARQUIVO SALVO PELO ETL
-try:
-    df_plot = pd.read_csv("strava_activities_etl.csv")
-    print("\n[INFO] DataFrame carregado com sucesso de 'strava_activities_etl.csv'.")
-except FileNotFoundError:
-    print("\n[ERRO] Arquivo 'strava_activities_etl.csv' não encontrado.")
-    print("Por favor, execute o script ETL (que contém a função run_etl()) primeiro para gerar este arquivo.")
-    exit()
+import etl_csv
 
-# Garante que as colunas de data e números estejam no formato correto para plotagem
-df_plot['Data'] = pd.to_datetime(df_plot['Data'])
-df_plot['Pace_Segundos_por_km'] = pd.to_numeric(df_plot['Pace_Segundos_por_km'], errors='coerce')
-df_plot['total_elevation_gain'] = pd.to_numeric(df_plot['total_elevation_gain'], errors='coerce')
+# O CORRETO É CARREGAR O ARQUIVO SALVO PELO ETL
+ETL_CSV = "strava_activities_etl.csv"
 
 
 # =================================================================
-# FUNÇÃO DE GERAÇÃO DE GRÁFICOS
+# LEITURA DOS DADOS
 # =================================================================
-def generate_kpi_plots(df):
-    
-    # 1. Configurar o estilo dos gráficos
-    sns.set_style("whitegrid")
-    fig, axes = plt.subplots(3, 1, figsize=(12, 18))
-    plt.subplots_adjust(hspace=0.6)
+def load_etl_csv(path=ETL_CSV):
+    """Só as colunas dos gráficos, já tipadas (companheiro binário do CSV, ver etl_csv.py)"""
+    columns = list(dict.fromkeys(col for _, cols in CHARTS.values() for col in cols))
+    return etl_csv.load_etl_frame(path, columns=columns)
+
+def prepare_plot_data(df):
+    """Garante que as colunas de data e números estejam no formato correto (dados sem tipo)"""
+    df = df.copy()
+    df['Data'] = pd.to_datetime(df['Data'])
+    for col in ('Distancia_km', 'Pace_Segundos_por_km', 'total_elevation_gain'):
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    return df
+
 
+# =================================================================
+# GRÁFICOS (cada um desenha num eixo)
+# =================================================================
+def plot_monthly_pace(ax, df):
     # --- Gráfico 1: Evolução do Pace ao Longo do Tempo ---
     # Cria a coluna Mês/Ano para agrupar o tempo
-    df['Mês/Ano'] = df['Data'].dt.strftime('%Y-%m')
-    pace_mensal = df.groupby('Mês/Ano')['Pace_Segundos_por_km'].mean().reset_index()
+    pace_mensal = (df.assign(**{'Mês/Ano': df['Data'].dt.strftime('%Y-%m')})
+                   .groupby('Mês/Ano')['Pace_Segundos_por_km'].mean().reset_index())
 
     sns.lineplot(
-        ax=axes[0], 
-        x='Mês/Ano', 
-        y='Pace_Segundos_por_km', 
-        data=pace_mensal, 
+        ax=ax,
+        x='Mês/Ano',
+        y='Pace_Segundos_por_km',
+        data=pace_mensal,
         marker='o'
     )
-    axes[0].set_title('Evolução do Pace Médio Mensal (s/km)', fontsize=16)
-    axes[0].set_xlabel('Mês/Ano')
-    axes[0].set_ylabel('Pace (Segundos/km)')
-    axes[0].tick_params(axis='x', rotation=45)
-    axes[0].invert_yaxis() # Inverte para mostrar a melhora como "para cima"
-    axes[0].text(0.5, 1.05, '↑ Performance (Ritmo Mais Rápido)', 
-                 transform=axes[0].transAxes, fontsize=10, color='green', ha='center')
+    ax.set_title('Evolução do Pace Médio Mensal (s/km)', fontsize=16)
+    ax.set_xlabel('Mês/Ano')
+    ax.set_ylabel('Pace (Segundos/km)')
+    ax.tick_params(axis='x', rotation=45)
+    ax.invert_yaxis() # Inverte para mostrar a melhora como "para cima"
+    ax.text(0.5, 1.05, '↑ Performance (Ritmo Mais Rápido)',
+            transform=ax.transAxes, fontsize=10, color='green', ha='center')
 
+def plot_distance_histogram(ax, df):
     # --- Gráfico 2: Distribuição de Distâncias (Histograma) ---
     sns.histplot(
-        ax=axes[1], 
-        x='Distancia_km', 
-        data=df, 
-        bins=15, 
+        ax=ax,
+        x='Distancia_km',
+        data=df,
+        bins=15,
         kde=True,
         edgecolor='black'
     )
-    axes[1].set_title('Distribuição de Distâncias Percorridas (km)', fontsize=16)
-    axes[1].set_xlabel('Distância (km)')
-    axes[1].set_ylabel('Frequência (Nº de Corridas)')
+    ax.set_title('Distribuição de Distâncias Percorridas (km)', fontsize=16)
+    ax.set_xlabel('Distância (km)')
+    ax.set_ylabel('Frequência (Nº de Corridas)')
 
+def plot_distance_elevation(ax, df):
     # --- Gráfico 3: Relação entre Distância e Ganho de Elevação ---
     sns.scatterplot(
-        ax=axes[2], 
-        x='Distancia_km', 
-        y='total_elevation_gain', 
-        data=df, 
+        ax=ax,
+        x='Distancia_km',
+        y='total_elevation_gain',
+        data=df,
         hue='total_elevation_gain',
         palette='viridis',
         size='total_elevation_gain',
         sizes=(20, 200)
     )
-    axes[2].set_title('Relação entre Distância e Ganho de Elevação', fontsize=16)
-    axes[2].set_xlabel('Distância (km)')
-    axes[2].set_ylabel('Ganho de Elevação (metros)')
-    axes[2].legend(title='Elevação (m)')
+    ax.set_title('Relação entre Distância e Ganho de Elevação', fontsize=16)
+    ax.set_xlabel('Distância (km)')
+    ax.set_ylabel('Ganho de Elevação (metros)')
+    ax.legend(title='Elevação (m)')
+
+# nome -> (função, colunas de entrada); relatorios.py usa as colunas para o cache
+CHARTS = {
+    'pace_mensal': (plot_monthly_pace, ['Data', 'Pace_Segundos_por_km']),
+    'distancias': (plot_distance_histogram, ['Distancia_km']),
+    'distancia_elevacao': (plot_distance_elevation, ['Distancia_km', 'total_elevation_gain']),
+}
+
+
+# =================================================================
+# FUNÇÃO DE GERAÇÃO DE GRÁFICOS
+# =================================================================
+def generate_kpi_plots(df, show=True):
+
+    # 1. Configurar o estilo dos gráficos
+    sns.set_style("whitegrid")
+    fig, axes = plt.subplots(3, 1, figsize=(12, 18))
+    plt.subplots_adjust(hspace=0.6)
+
+    for ax, (plot, _) in zip(axes, CHARTS.values()):
+        plot(ax, df)
 
     # Exibir todos os gráficos
-    plt.show()
+    if show:
+        plt.show()
+    return fig
+
+
+if __name__ == "__main__":
+    try:
+        df_plot = load_etl_csv()
+        print("\n[INFO] DataFrame carregado com sucesso de 'strava_activities_etl.csv'.")
+    except FileNotFoundError:
+        print("\n[ERRO] Arquivo 'strava_activities_etl.csv' não encontrado.")
+        print("Por favor, execute o script ETL (que contém a função run_etl()) primeiro para gerar este arquivo.")
+        sys.exit()
 
-# Chama a função principal de plotagem
-generate_kpi_plots(df_plot)
\ No newline at end of file
+    # Chama a função principal de plotagem
+    generate_kpi_plots(df_plot)
@@ -0,0 +1,30 @@
+"""Configuração do gunicorn (lida automaticamente por `gunicorn dah:server`).
+
+- GUNICORN_PRELOAD=1: o processo mestre importa o dah e aquece os dados antes
+  do fork; os workers nascem prontos, compartilhando essa memória (copy-on-write),
+  e um worker reiniciado não paga o import de novo.
+- Sem preload (padrão): cada worker importa o dah sozinho e carrega os dados no
+  primeiro callback. Com DASH_WARMUP=1 o worker aquece numa thread logo após
+  subir; só compensa se o primeiro acesso vier alguns segundos depois, senão a
+  thread disputa o GIL com as primeiras requisições (ver startup.py).
+- DASH_WARMUP=0 desliga o aquecimento também no preload.
+
+O endereço continua vindo de --bind ou da variável PORT (Render).
+"""
+import os
+import threading
+
+preload_app = os.environ.get("GUNICORN_PRELOAD", "0") not in ("", "0")
+WARMUP = os.environ.get("DASH_WARMUP", "1" if preload_app else "0") not in ("", "0")
+
+
+def when_ready(server):
+    if preload_app and WARMUP:
+        import dah
+        dah.warmup()
+
+
+def post_worker_init(worker):
+    if WARMUP and not preload_app:
+        import dah
+        threading.Thread(target=dah.warmup, daemon=True, name="dah-warmup").start()
@@ -0,0 +1,161 @@
+"""Motor de KPIs compartilhado por app.py, dah.py e etl.get_activity_stats.
+
+As atividades são ordenadas por data uma única vez e, para cada métrica, é
+guardada a soma de prefixo. O total de qualquer intervalo de datas sai então
+de duas buscas binárias (searchsorted) e uma subtração, sem varrer o DataFrame.
+Comparações período a período (mês anterior, mesmo mês do ano anterior) custam
+o mesmo que o período atual.
+"""
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# coluna de origem -> nome da métrica
+SUM_COLUMNS = {
+    "distance_km": "distance_km",
+    "duration_min": "duration_min",
+    "elevation_m": "elevation_m",
+}
+
+
+def naive_dates(dates: pd.Series) -> pd.Series:
+    """Datas sem fuso, preservando o horário local (mesmos .dt.year/.dt.month)"""
+    dates = pd.to_datetime(dates, errors="coerce")
+    if getattr(dates.dt, "tz", None) is not None:
+        dates = dates.dt.tz_localize(None)
+    return dates
+
+
+class KpiIndex:
+    """Somas de prefixo sobre as atividades ordenadas por data"""
+
+    def __init__(self, df: pd.DataFrame):
+        if df.empty or "date" not in df.columns:
+            df = pd.DataFrame({"date": pd.Series([], dtype="datetime64[ns]")})
+
+        dates = naive_dates(df["date"])
+        valid = dates.notna().to_numpy()
+        order = np.argsort(dates.to_numpy()[valid], kind="stable")
+
+        self.first_date = None
+        self.last_date = None
+        self._ts = dates.to_numpy()[valid][order].astype("datetime64[ns]").view("int64")
+        if len(self._ts):
+            original = df["date"][valid].iloc[order]
+            self.first_date = original.iloc[0]
+            self.last_date = original.iloc[-1]
+
+        self._cum = {}
+        for column, name in SUM_COLUMNS.items():
+            if column in df.columns:
+                values = pd.to_numeric(df[column], errors="coerce").to_numpy(dtype=float)[valid][order]
+            else:
+                values = np.zeros(len(self._ts))
+            self._cum[name] = np.concatenate(([0.0], np.cumsum(np.nan_to_num(values))))
+
+        # pace médio por atividade (só paces > 0), usado por get_activity_stats
+        if "pace_min_km" in df.columns:
+            pace = pd.to_numeric(df["pace_min_km"], errors="coerce").to_numpy(dtype=float)[valid][order]
+        else:
+            pace = np.full(len(self._ts), np.nan)
+        has_pace = pace > 0
+        self._cum["pace_sum"] = np.concatenate(([0.0], np.cumsum(np.where(has_pace, pace, 0.0))))
+        self._cum["pace_count"] = np.concatenate(([0], np.cumsum(has_pace)))
+
+    def __len__(self):
+        return len(self._ts)
+
+    # --- consultas ------------------------------------------------------------
+
+    def _bounds(self, start=None, end=None):
+        """Posições [i, j) das atividades com start <= data < end"""
+        i = 0 if start is None else int(np.searchsorted(self._ts, pd.Timestamp(start).value, side="left"))
+        j = len(self._ts) if end is None else int(np.searchsorted(self._ts, pd.Timestamp(end).value, side="left"))
+        return i, max(i, j)
+
+    def _sums(self, ranges):
+        acc = {name: 0.0 for name in self._cum}
+        runs = 0
+        for start, end in ranges:
+            i, j = self._bounds(start, end)
+            runs += j - i
+            for name, cum in self._cum.items():
+                acc[name] += cum[j] - cum[i]
+        return runs, acc
+
+    def _result(self, runs, acc):
+        distance = float(acc["distance_km"])
+        duration = float(acc["duration_min"])
+        return {
+            "runs": runs,
+            "distance_km": distance,
+            "duration_min": duration,
+            "elevation_m": float(acc["elevation_m"]),
+            # pace agregado: tempo total / distância total
+            "pace_mean": duration / distance if distance > 0 else None,
+            # média simples dos paces individuais (> 0)
+            "avg_pace": float(acc["pace_sum"] / acc["pace_count"]) if acc["pace_count"] > 0 else None,
+        }
+
+    def totals(self, start=None, end=None) -> dict:
+        """KPIs das atividades com start <= data < end (None = sem limite)"""
+        return self._result(*self._sums([(start, end)]))
+
+    def totals_for_filter(self, ano="Todos", mes="Todos", dia="Todos") -> dict:
+        """KPIs para os filtros de ano/mês/dia dos dashboards ("Todos" = sem filtro)
+
+        Filtros contíguos viram um único intervalo; combinações como "todo mês 3"
+        ou "todo dia 15" viram um intervalo por ano/mês, ainda sem varrer os dados.
+        """
+        return self._result(*self._sums(self.filter_ranges(ano, mes, dia)))
+
+    def filter_ranges(self, ano="Todos", mes="Todos", dia="Todos"):
+        if ano == "Todos" and mes == "Todos" and dia == "Todos":
+            return [(None, None)]
+        if not len(self._ts):
+            return []
+
+        if ano != "Todos":
+            years = [int(ano)]
+        else:
+            years = range(pd.Timestamp(self._ts[0]).year, pd.Timestamp(self._ts[-1]).year + 1)
+        months = [int(mes)] if mes != "Todos" else list(range(1, 13))
+
+        ranges = []
+        for year in years:
+            if mes == "Todos" and dia == "Todos":
+                ranges.append((datetime(year, 1, 1), datetime(year + 1, 1, 1)))
+                continue
+            for month in months:
+                if dia == "Todos":
+                    ranges.append(_month_range(year, month))
+                    continue
+                try:
+                    day_start = pd.Timestamp(year, month, int(dia))
+                except ValueError:  # ex.: 30 de fevereiro
+                    continue
+                ranges.append((day_start, day_start + pd.Timedelta(days=1)))
+        return ranges
+
+    # --- comparações período a período ---------------------------------------
+
+    def month(self, ano, mes) -> dict:
+        return self.totals(*_month_range(int(ano), int(mes)))
+
+    def previous_month(self, ano, mes):
+        """(rótulo 'AAAA-MM', KPIs) do mês anterior ao informado"""
+        ano, mes = int(ano), int(mes)
+        prev_ano, prev_mes = (ano - 1, 12) if mes == 1 else (ano, mes - 1)
+        return f"{prev_ano}-{prev_mes:02d}", self.month(prev_ano, prev_mes)
+
+    def same_month_last_year(self, ano, mes):
+        """(rótulo 'AAAA-MM', KPIs) do mesmo mês no ano anterior"""
+        ano, mes = int(ano), int(mes)
+        return f"{ano - 1}-{mes:02d}", self.month(ano - 1, mes)
+
+
+def _month_range(year, month):
+    start = datetime(year, month, 1)
+    end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+    return start, end
@@ -0,0 +1,150 @@
+"""Ranking do clube a partir de agregados pequenos por atleta.
+
+Depois de cada sincronização (athletes.sync_athlete), refresh_athlete()
+recalcula só os totais semanais (semana ISO) e mensais daquele atleta e os
+substitui no arquivo do clube (data/athletes/leaderboard.json):
+
+    {"weekly":  {"2025-W45": {"<athlete_id>": {"distance_km": .., "duration_min": .., "runs": ..}}},
+     "monthly": {"2025-11":  {...}}}
+
+O dashboard lê só esse arquivo; um ranking é um heapq.nlargest sobre os
+atletas de um período, sem concatenar o DataFrame de ninguém. athletes.py e
+backfill.py atualizam o arquivo em processos separados, então a leitura,
+alteração e gravação acontecem sob um lock de arquivo (leaderboard.lock).
+"""
+import contextlib
+import heapq
+import json
+import os
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: só o lock entre threads
+    fcntl = None
+
+import pandas as pd
+
+import store
+from kpis import naive_dates
+
+LEADERBOARD_PATH = store.DATA_DIR / "leaderboard.json"
+PERIODS = ("weekly", "monthly")
+METRICS = ("distance_km", "duration_min", "runs")
+WEEKLY_RETENTION = 104  # semanas mantidas no arquivo do clube
+
+_lock = threading.Lock()
+
+
+def athlete_rollups(df: pd.DataFrame) -> dict:
+    """Totais semanais e mensais de um atleta"""
+    rollups = {period: {} for period in PERIODS}
+    if df.empty:
+        return rollups
+
+    dates = naive_dates(df["date"])
+    data = pd.DataFrame({
+        "distance_km": pd.to_numeric(df["distance_km"], errors="coerce").fillna(0.0),
+        "duration_min": pd.to_numeric(df["duration_min"], errors="coerce").fillna(0.0),
+        "runs": 1,
+    })[dates.notna()]
+    dates = dates[dates.notna()]
+    iso = dates.dt.isocalendar()
+    keys = {
+        "weekly": iso["year"].astype(str) + "-W" + iso["week"].astype(str).str.zfill(2),
+        "monthly": dates.dt.strftime("%Y-%m"),
+    }
+    for period, key in keys.items():
+        totals = data.groupby(key.to_numpy()).sum()
+        rollups[period] = {
+            str(k): {m: round(float(row[m]), 3) if m != "runs" else int(row[m]) for m in METRICS}
+            for k, row in totals.iterrows()
+        }
+    return rollups
+
+
+class Leaderboard:
+    """Agregados do clube por período -> atleta"""
+
+    def __init__(self, data=None):
+        self.data = data or {period: {} for period in PERIODS}
+
+    @classmethod
+    def load(cls, path=LEADERBOARD_PATH) -> "Leaderboard":
+        try:
+            return cls(json.loads(path.read_text(encoding="utf-8")))
+        except FileNotFoundError:
+            return cls()
+
+    def save(self, path=LEADERBOARD_PATH):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # nome único: outro processo pode estar gravando ao mesmo tempo
+        with tempfile.NamedTemporaryFile("w", dir=path.parent, prefix=f"{path.stem}.", suffix=".tmp",
+                                         delete=False, encoding="utf-8") as fh:
+            fh.write(json.dumps(self.data, separators=(",", ":"), sort_keys=True))
+        os.replace(fh.name, path)
+
+    def replace_athlete(self, athlete_id, rollups: dict):
+        """Troca os totais de um atleta em todos os períodos"""
+        athlete_id = str(athlete_id)
+        for period in PERIODS:
+            buckets = self.data.setdefault(period, {})
+            for key in list(buckets):
+                buckets[key].pop(athlete_id, None)
+                if not buckets[key]:
+                    del buckets[key]
+            for key, totals in rollups.get(period, {}).items():
+                buckets.setdefault(key, {})[athlete_id] = totals
+        weekly = self.data["weekly"]
+        for key in sorted(weekly)[:-WEEKLY_RETENTION]:
+            del weekly[key]
+
+    def periods(self, period="weekly"):
+        """Chaves de período disponíveis, da mais recente para a mais antiga"""
+        return sorted(self.data.get(period, {}), reverse=True)
+
+    def top(self, period="weekly", key=None, metric="distance_km", k=10):
+        """[(athlete_id, totais)] dos k melhores no período (padrão: o mais recente)"""
+        if key is None:
+            keys = self.periods(period)
+            if not keys:
+                return []
+            key = keys[0]
+        entries = self.data.get(period, {}).get(key, {})
+        return heapq.nlargest(k, entries.items(), key=lambda item: item[1][metric])
+
+
+@contextlib.contextmanager
+def _locked(path):
+    """Exclusão mútua entre threads e, onde houver fcntl, entre processos"""
+    with _lock:
+        if fcntl is None:
+            yield
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path.with_suffix(".lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def refresh_athlete(athlete_id, path=LEADERBOARD_PATH):
+    """Recalcula os agregados de um atleta e grava o arquivo do clube
+
+    Sem partição (atleta novo ou sem atividades: o ETL não grava CSV vazio),
+    o atleta sai do ranking.
+    """
+    csv_path = store.partition_csv(athlete_id)
+    if csv_path.exists():
+        df = pd.read_csv(csv_path, usecols=["date", "distance_km", "duration_min"], parse_dates=["date"])
+        rollups = athlete_rollups(df)
+    else:
+        rollups = {period: {} for period in PERIODS}
+    with _locked(path):
+        board = Leaderboard.load(path)
+        board.replace_athlete(athlete_id, rollups)
+        board.save(path)
+    return board
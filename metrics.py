@@ -0,0 +1,245 @@
+"""Métricas de latência dos callbacks do Dash no formato do Prometheus.
+
+Desligado por padrão. Variáveis de ambiente:
+- DASH_METRICS=1              histogramas por callback e por etapa + rota /metrics
+- DASH_SLOW_CALLBACK_MS=500   imprime os callbacks mais lentos que isso, com as
+                              entradas (filtros) e o tempo de cada etapa
+
+Histogramas expostos:
+- dash_callback_seconds{callback}          tempo da função do callback
+- dash_callback_stage_seconds{callback,stage}
+                                           etapas internas (filtro, cada gráfico)
+                                           e "serialize": o resto da requisição
+                                           fora do callback (JSON de entrada e
+                                           serialização das figuras)
+- dash_request_seconds{callback}           requisição /_dash-update-component inteira
+
+Cada worker do gunicorn tem seus próprios contadores (o Prometheus coleta um
+worker por scrape). Os background callbacks rodam em outro processo: dentro
+de spooled() as observações do job vão para um SQLite (DASH_METRICS_SPOOL) e
+entram nos contadores do worker que atender o próximo /metrics. Desligado, o decorator devolve a própria função e
+stage() é um contexto vazio, então o custo é zero.
+"""
+import bisect
+import contextlib
+import functools
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import flask
+
+ENABLED = os.environ.get("DASH_METRICS", "") not in ("", "0")
+SLOW_MS = float(os.environ.get("DASH_SLOW_CALLBACK_MS", "0") or 0)
+SPOOL_PATH = Path(os.environ.get("DASH_METRICS_SPOOL",
+                                 Path(__file__).resolve().parent / "data" / "cache" / "metrics_spool.sqlite"))
+
+# limites dos buckets em segundos (padrão do cliente Prometheus, mais 20/30 s)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0)
+
+DASH_UPDATE_PATH = "/_dash-update-component"
+
+HELP = {
+    "dash_callback_seconds": "Tempo de execução dos callbacks do Dash",
+    "dash_callback_stage_seconds": "Tempo por etapa dentro dos callbacks do Dash",
+    "dash_request_seconds": "Tempo total das requisições de callback do Dash",
+    "dash_cache_seconds": "Tempo por nível do cache de resultados (result=hit|miss)",
+}
+
+_NULL = contextlib.nullcontext()
+_current = threading.local()
+
+
+class Histogram:
+    """Histograma cumulativo no formato do Prometheus"""
+
+    __slots__ = ("counts", "sum", "count", "_lock")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # último = +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        i = bisect.bisect_left(BUCKETS, seconds)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += seconds
+            self.count += 1
+
+
+_registry = {}  # (métrica, labels ordenados) -> Histogram
+_registry_lock = threading.Lock()
+_spool = None  # dentro de spooled(): observações a enviar ao worker
+
+
+def observe(metric, seconds, **labels):
+    if _spool is not None:
+        _spool.append((metric, json.dumps(sorted(labels.items())), seconds))
+        return
+    key = (metric, tuple(sorted(labels.items())))
+    hist = _registry.get(key)
+    if hist is None:
+        with _registry_lock:
+            hist = _registry.setdefault(key, Histogram())
+    hist.observe(seconds)
+
+
+def _spool_conn():
+    SPOOL_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(SPOOL_PATH, timeout=5, isolation_level=None)
+    conn.execute("CREATE TABLE IF NOT EXISTS observations (metric TEXT, labels TEXT, seconds REAL)")
+    return conn
+
+
+@contextlib.contextmanager
+def spooled():
+    """Guarda as observações do bloco no SQLite em vez do registro do processo
+
+    Para jobs em segundo plano: o processo do job termina e o registro dele
+    some, mas o spool é lido pelo /metrics dos workers.
+    """
+    global _spool
+    if not ENABLED:
+        yield
+        return
+    _spool = []
+    try:
+        yield
+    finally:
+        rows, _spool = _spool, None
+        if rows:
+            try:
+                with contextlib.closing(_spool_conn()) as conn:
+                    conn.execute("BEGIN IMMEDIATE")
+                    conn.executemany("INSERT INTO observations VALUES (?, ?, ?)", rows)
+                    conn.execute("COMMIT")
+            except sqlite3.Error as e:
+                print(f"⚠️ Métricas do job perdidas ({SPOOL_PATH}): {e}", flush=True)
+
+
+def _drain_spool():
+    """Move as observações dos jobs para o registro deste processo"""
+    try:
+        with contextlib.closing(_spool_conn()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute("SELECT metric, labels, seconds FROM observations").fetchall()
+            conn.execute("DELETE FROM observations")
+            conn.execute("COMMIT")
+    except sqlite3.Error as e:
+        print(f"⚠️ Spool de métricas indisponível ({SPOOL_PATH}): {e}", flush=True)
+        return
+    for metric, labels, seconds in rows:
+        observe(metric, seconds, **dict(json.loads(labels)))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(pairs, **extra) -> str:
+    items = list(pairs) + list(extra.items())
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+def render() -> str:
+    """Todas as métricas no formato texto do Prometheus (versão 0.0.4)"""
+    _drain_spool()
+    lines = []
+    with _registry_lock:
+        items = sorted(_registry.items())
+    for metric in sorted({name for (name, _), _ in items}):
+        lines.append(f"# HELP {metric} {HELP.get(metric, metric)}")
+        lines.append(f"# TYPE {metric} histogram")
+        for (name, labels), hist in items:
+            if name != metric:
+                continue
+            with hist._lock:
+                counts, total, count = list(hist.counts), hist.sum, hist.count
+            cumulative = 0
+            for bound, n in zip(BUCKETS + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{metric}_bucket{_labels(labels, le=le)} {cumulative}")
+            lines.append(f"{metric}_sum{_labels(labels)} {total:.6f}")
+            lines.append(f"{metric}_count{_labels(labels)} {count}")
+    return "\n".join(lines) + "\n"
+
+
+# --- instrumentação ---------------------------------------------------------
+
+@contextlib.contextmanager
+def _stage(name):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - t0
+        callback, stages = _current.callback, _current.stages
+        stages[name] = stages.get(name, 0.0) + elapsed
+        if ENABLED:
+            observe("dash_callback_stage_seconds", elapsed, callback=callback, stage=name)
+
+
+def stage(name):
+    """Contexto que mede uma etapa do callback em execução (no-op se desligado)"""
+    if not (ENABLED or SLOW_MS) or getattr(_current, "stages", None) is None:
+        return _NULL
+    return _stage(name)
+
+
+def timed_callback(func):
+    """Mede um callback do Dash; aplicar abaixo de @app.callback"""
+    if not (ENABLED or SLOW_MS):
+        return func
+    name = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        _current.callback, _current.stages = name, {}
+        t0 = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - t0
+            stages, _current.stages = _current.stages, None
+            if ENABLED:
+                observe("dash_callback_seconds", elapsed, callback=name)
+                if flask.has_request_context():
+                    flask.g.dash_callback = (name, elapsed)
+            if SLOW_MS and elapsed * 1000 >= SLOW_MS:
+                detail = ", ".join(f"{k}={v * 1000:.0f}ms" for k, v in stages.items())
+                print(f"🐢 Callback lento: {name} {elapsed * 1000:.0f} ms "
+                      f"entradas={list(args)}" + (f" etapas: {detail}" if detail else ""), flush=True)
+    return wrapper
+
+
+def init_app(server: flask.Flask):
+    """Registra a rota /metrics e a medição das requisições de callback"""
+    if not ENABLED:
+        return
+
+    @server.before_request
+    def _start_timer():
+        if flask.request.path.endswith(DASH_UPDATE_PATH):
+            flask.g.metrics_t0 = time.perf_counter()
+
+    @server.after_request
+    def _observe_request(response):
+        t0 = flask.g.pop("metrics_t0", None)
+        timed = flask.g.pop("dash_callback", None)
+        if t0 is not None and timed is not None:
+            name, callback_seconds = timed
+            total = time.perf_counter() - t0
+            observe("dash_request_seconds", total, callback=name)
+            observe("dash_callback_stage_seconds", max(0.0, total - callback_seconds),
+                    callback=name, stage="serialize")
+        return response
+
+    @server.route("/metrics")
+    def _metrics():
+        return flask.Response(render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,204 @@
+"""Perfil por etapa do ETL: tempo, volume, memória e (opcional) cProfile.
+
+O ETL marca suas etapas com `with profiler.stage("nome") as s:` (token,
+network, json_decode, transform, write, records). Cada etapa acumula tempo de
+parede, chamadas, itens, bytes e pico de RSS; com cProfile, as funções mais
+caras; com tracemalloc, o pico de memória Python alocada dentro da etapa.
+
+Ativação (etl.main_local e etl.load_activities):
+    STRAVA_PROFILE=1                       só tempos/volumes
+    STRAVA_PROFILE=cprofile,tracemalloc    com captura detalhada
+    python etl.py --profile cprofile       equivalente pela linha de comando
+
+O relatório JSON (plots/etl_profile.json, ou STRAVA_PROFILE_OUT) tem chaves
+estáveis para comparar execuções:
+
+    python profiling.py diff antes.json depois.json
+"""
+import argparse
+import contextlib
+import cProfile
+import json
+import os
+import platform
+import pstats
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+PROFILE_ENV = "STRAVA_PROFILE"
+PROFILE_OUT_ENV = "STRAVA_PROFILE_OUT"
+TOP_FUNCTIONS = 15
+
+
+def peak_rss_mb():
+    """Pico de memória residente do processo em MB (None se indisponível)"""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss vem em bytes no macOS e em KB no Linux
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+class StageRecord:
+    """Volume processado na chamada atual de uma etapa"""
+
+    __slots__ = ("items", "bytes")
+
+    def __init__(self):
+        self.items = 0
+        self.bytes = 0
+
+
+class StageProfiler:
+    """Acumula métricas por etapa; cProfile/tracemalloc só se pedidos"""
+
+    def __init__(self, cprofile=False, tracemalloc_=False, top=TOP_FUNCTIONS):
+        self.cprofile = cprofile
+        self.tracemalloc = tracemalloc_
+        self.top = top
+        self.stages = {}
+        self._profiles = {}
+        self._active = None
+        self._t0 = time.perf_counter()
+        self.started = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        if tracemalloc_ and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        record = StageRecord()
+        # etapas aninhadas contam tempo normalmente, mas só a externa é perfilada
+        outer = self._active is None
+        profile = None
+        if outer:
+            self._active = name
+            if self.cprofile:
+                profile = self._profiles.setdefault(name, cProfile.Profile())
+                profile.enable()
+            if self.tracemalloc:
+                tracemalloc.reset_peak()
+        t0 = time.perf_counter()
+        try:
+            yield record
+        finally:
+            elapsed = time.perf_counter() - t0
+            if profile is not None:
+                profile.disable()
+            entry = self.stages.setdefault(name, {
+                "seconds": 0.0, "calls": 0, "items": 0, "bytes": 0, "peak_rss_mb": None,
+            })
+            entry["seconds"] += elapsed
+            entry["calls"] += 1
+            entry["items"] += record.items
+            entry["bytes"] += record.bytes
+            entry["peak_rss_mb"] = peak_rss_mb()
+            if outer:
+                if self.tracemalloc:
+                    traced = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+                    entry["tracemalloc_peak_mb"] = max(entry.get("tracemalloc_peak_mb", 0.0), traced)
+                self._active = None
+
+    # --- relatório --------------------------------------------------------------
+
+    def _top_functions(self, name) -> list:
+        stats = pstats.Stats(self._profiles[name])
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:self.top]
+        return [
+            {"function": f"{Path(file).name}:{line}({func})", "calls": nc,
+             "tottime": round(tt, 6), "cumtime": round(ct, 6)}
+            for (file, line, func), (cc, nc, tt, ct, callers) in rows
+        ]
+
+    def report(self, **extra) -> dict:
+        wall = time.perf_counter() - self._t0
+        stages = {}
+        for name, entry in self.stages.items():
+            stage = {k: (round(v, 6) if isinstance(v, float) else v) for k, v in entry.items()}
+            stage["items_per_second"] = round(entry["items"] / entry["seconds"], 1) if entry["seconds"] else None
+            if name in self._profiles:
+                stage["top_functions"] = self._top_functions(name)
+            stages[name] = stage
+        return {
+            "started": self.started,
+            "python": platform.python_version(),
+            "wall_seconds": round(wall, 6),
+            "bytes_downloaded": sum(entry["bytes"] for entry in self.stages.values()),
+            "peak_rss_mb": peak_rss_mb(),
+            "options": {"cprofile": self.cprofile, "tracemalloc": self.tracemalloc},
+            **extra,
+            "stages": stages,
+        }
+
+    def save(self, path, **extra) -> Path:
+        """Grava o relatório JSON e, com cProfile, um .prof por etapa ao lado"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.report(**extra), indent=1, sort_keys=True, ensure_ascii=False),
+                        encoding="utf-8")
+        for name, profile in self._profiles.items():
+            profile.dump_stats(path.with_name(f"{path.stem}.{name}.prof"))
+        return path
+
+    def as_stats(self) -> dict:
+        """Formato dos `stats` de etl.stream_activities_to_csv (tempo/itens/RSS)"""
+        return {
+            name: {"seconds": e["seconds"], "items": e["items"], "peak_rss_mb": e["peak_rss_mb"]}
+            for name, e in self.stages.items()
+        }
+
+
+class NullProfiler:
+    """Mesma interface do StageProfiler, sem medir nada"""
+
+    def stage(self, name):
+        return contextlib.nullcontext(StageRecord())
+
+
+NULL_PROFILER = NullProfiler()
+
+
+def profiler_from_env(flag=None):
+    """StageProfiler configurado por `flag` ou STRAVA_PROFILE; None se desligado"""
+    value = flag if flag is not None else os.environ.get(PROFILE_ENV, "")
+    options = {opt.strip().lower() for opt in value.split(",") if opt.strip()}
+    if not options or options <= {"0", "false", "no"}:
+        return None
+    every = "all" in options
+    return StageProfiler(cprofile=every or "cprofile" in options,
+                         tracemalloc_=every or "tracemalloc" in options)
+
+
+def default_report_path(fallback: Path) -> Path:
+    return Path(os.environ.get(PROFILE_OUT_ENV) or fallback)
+
+
+# --- comparação ---------------------------------------------------------------
+
+def diff(before: dict, after: dict):
+    """Imprime a variação por etapa entre dois relatórios"""
+    print(f"{'Etapa':<14} {'Antes (s)':>10} {'Depois (s)':>10} {'Var.':>8} {'Ativ./s antes':>14} {'depois':>10}")
+    for name in sorted(set(before["stages"]) | set(after["stages"])):
+        a = before["stages"].get(name, {})
+        b = after["stages"].get(name, {})
+        sa, sb = a.get("seconds"), b.get("seconds")
+        change = f"{(sb / sa - 1):+.0%}" if sa and sb else "-"
+        fmt = lambda v, spec: format(v, spec) if v is not None else format("-", spec.split(".")[0])
+        print(f"{name:<14} {fmt(sa, '>10.3f')} {fmt(sb, '>10.3f')} {change:>8} "
+              f"{fmt(a.get('items_per_second'), '>14.0f')} {fmt(b.get('items_per_second'), '>10.0f')}")
+    print(f"{'TOTAL':<14} {before['wall_seconds']:>10.3f} {after['wall_seconds']:>10.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Relatórios de perfil do ETL")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("diff", help="compara dois relatórios JSON")
+    p.add_argument("before")
+    p.add_argument("after")
+    args = parser.parse_args()
+    load = lambda path: json.loads(Path(path).read_text(encoding="utf-8"))
+    diff(load(args.before), load(args.after))
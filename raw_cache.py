@@ -0,0 +1,122 @@
+"""Cache em disco das respostas brutas da API do Strava.
+
+Cada página de /athlete/activities é guardada comprimida (gzip) e endereçada
+pelo SHA-256 do próprio conteúdo, então páginas idênticas ocupam um único
+arquivo. Um índice JSON liga os parâmetros da requisição (per_page, page,
+before, after) ao blob e aos validadores HTTP (ETag / Last-Modified).
+
+Com o cache é possível:
+- revalidar páginas online com If-None-Match / If-Modified-Since (304 = reuso);
+- reexecutar o ETL offline, sem token nem quota, lendo só do disco;
+- usar o diretório como fixture determinística para benchmarks.
+"""
+import gzip
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+CACHE_DIR = Path(__file__).resolve().parent / "cache" / "raw"
+
+
+class RawPageCache:
+    """Armazena páginas brutas da API indexadas pelos parâmetros da requisição"""
+
+    def __init__(self, root=CACHE_DIR):
+        self.root = Path(root)
+        self.objects_dir = self.root / "objects"
+        self.index_path = self.root / "index.json"
+        self._index = None
+
+    # --- índice ---------------------------------------------------------------
+
+    @property
+    def index(self) -> dict:
+        if self._index is None:
+            try:
+                self._index = json.loads(self.index_path.read_text(encoding="utf-8"))
+            except FileNotFoundError:
+                self._index = {}
+        return self._index
+
+    def _save_index(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self.index, indent=1, sort_keys=True), encoding="utf-8")
+        os.replace(tmp_path, self.index_path)
+
+    @staticmethod
+    def request_key(params: dict) -> str:
+        """Chave canônica de uma requisição (parâmetros ordenados, sem None)"""
+        clean = {k: params[k] for k in sorted(params) if params[k] is not None}
+        return "&".join(f"{k}={v}" for k, v in clean.items())
+
+    # --- blobs ----------------------------------------------------------------
+
+    def _blob_path(self, digest: str) -> Path:
+        return self.objects_dir / digest[:2] / f"{digest}.json.gz"
+
+    def _write_blob(self, raw: bytes) -> str:
+        digest = hashlib.sha256(raw).hexdigest()
+        path = self._blob_path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(".tmp")
+            tmp_path.write_bytes(gzip.compress(raw, compresslevel=6))
+            os.replace(tmp_path, path)
+        return digest
+
+    def _read_blob(self, digest: str) -> list:
+        return json.loads(gzip.decompress(self._blob_path(digest).read_bytes()))
+
+    # --- API pública ----------------------------------------------------------
+
+    def validators(self, params: dict) -> dict:
+        """Cabeçalhos condicionais para revalidar a página (vazio se não houver cache)
+
+        Sem o blob no disco não há o que reusar num 304, então nada é enviado.
+        """
+        entry = self.index.get(self.request_key(params))
+        headers = {}
+        if entry and self._blob_path(entry["sha256"]).exists():
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def load(self, params: dict):
+        """Atividades guardadas para a requisição, ou None se não houver"""
+        entry = self.index.get(self.request_key(params))
+        if entry is None:
+            return None
+        try:
+            return self._read_blob(entry["sha256"])
+        except FileNotFoundError:
+            return None
+
+    def store(self, params: dict, raw: bytes, etag=None, last_modified=None) -> list:
+        """Grava a resposta bruta e devolve as atividades decodificadas"""
+        items = json.loads(raw)
+        digest = self._write_blob(raw)
+        self.index[self.request_key(params)] = {
+            "sha256": digest,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": time.time(),
+            "count": len(items),
+        }
+        self._save_index()
+        return items
+
+    def iter_pages(self, per_page=50, max_pages=20, before=None, after=None):
+        """Reproduz offline as páginas guardadas, na mesma ordem da API"""
+        for page in range(1, max_pages + 1):
+            params = {"per_page": per_page, "page": page, "before": before, "after": after}
+            items = self.load(params)
+            if not items:
+                break
+            yield page, items
+            if len(items) < per_page:
+                break
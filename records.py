@@ -0,0 +1,225 @@
+"""Índice de recordes pessoais mantido de forma incremental.
+
+Para cada combinação (tipo de atividade, ano, faixa de distância) — incluindo
+"Todos" em qualquer posição — o índice guarda:
+- o pace mais rápido, a maior distância e o maior ganho de elevação;
+- o melhor tempo estimado em 5 km, 10 km e meia maratona.
+
+A API do Strava só devolve o resumo de cada atividade (sem splits), então o
+"melhor esforço" numa distância é estimado pelo pace médio de atividades que
+cobriram pelo menos aquela distância.
+
+Todos os recordes são mínimos/máximos, logo atualizar com as mesmas atividades
+de novo não muda nada: o ETL pode chamar update() a cada lote ingerido. A
+consulta é um acesso a dicionário. Para validar contra uma varredura completa:
+
+    python records.py --csv plots/activities.csv --validate
+"""
+import argparse
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from kpis import naive_dates
+
+RECORDS_PATH = Path(__file__).resolve().parent / "plots" / "records.json"
+
+ALL = "Todos"
+
+# Mesmas faixas de categorize_distance (app.py / dah.py)
+DISTANCE_BINS = [-np.inf, 5, 10, 21, np.inf]
+DISTANCE_LABELS = ["Treino leve (< 5km)", "Curta (5-10km)", "Médio (10-21km)", "Meia maratona (> 21km)"]
+
+# distâncias padrão para melhor esforço (km). Tolerância de 2% para o GPS.
+BEST_EFFORTS = {"5k": 5.0, "10k": 10.0, "21k": 21.0975}
+EFFORT_TOLERANCE = 0.98
+
+# métrica -> (coluna, "min" ou "max")
+METRICS = {
+    "fastest_pace": ("pace_min_km", "min"),
+    "longest_distance": ("distance_km", "max"),
+    "max_elevation": ("elevation_m", "max"),
+}
+for _name, _km in BEST_EFFORTS.items():
+    METRICS[f"best_{_name}"] = (f"effort_{_name}_min", "min")
+
+KEY_LEVELS = ("type", "year", "bucket")
+
+
+def _prepare(df: pd.DataFrame) -> pd.DataFrame:
+    """Colunas usadas pelo índice, com tipos normalizados"""
+    dates = naive_dates(df["date"])
+    data = pd.DataFrame({
+        "id": df["id"] if "id" in df.columns else pd.Series(range(len(df)), index=df.index),
+        "name": df["name"] if "name" in df.columns else "",
+        "date": dates,
+        "type": df["type"].fillna("?").astype(str) if "type" in df.columns else "?",
+        "year": dates.dt.year,
+    })
+    for column in ("distance_km", "duration_min", "elevation_m"):
+        data[column] = pd.to_numeric(df[column], errors="coerce") if column in df.columns else np.nan
+    data = data.dropna(subset=["date"])
+    data["year"] = data["year"].astype(int).astype(str)
+
+    distance = data["distance_km"].where(data["distance_km"] > 0)
+    data["pace_min_km"] = data["duration_min"] / distance
+    data["bucket"] = pd.cut(data["distance_km"].fillna(0), DISTANCE_BINS, labels=DISTANCE_LABELS,
+                            right=False).astype(str)
+    for name, km in BEST_EFFORTS.items():
+        covered = data["distance_km"] >= km * EFFORT_TOLERANCE
+        data[f"effort_{name}_min"] = (data["pace_min_km"] * km).where(covered)
+    return data
+
+
+def _key(type_=ALL, year=ALL, bucket=ALL) -> str:
+    return f"{type_}|{year}|{bucket}"
+
+
+def _record(row, column) -> dict:
+    return {
+        "value": float(row[column]),
+        "id": None if pd.isna(row["id"]) else int(row["id"]),
+        "name": str(row["name"]),
+        "date": row["date"].isoformat(),
+    }
+
+
+def _better(new, old, how) -> bool:
+    if old is None:
+        return True
+    if new["value"] == old["value"]:
+        # empate: mantém a atividade mais antiga, para o resultado não depender da ordem de ingestão
+        return new["date"] < old["date"]
+    return new["value"] < old["value"] if how == "min" else new["value"] > old["value"]
+
+
+class RecordsIndex:
+    """Recordes por (tipo, ano, faixa de distância), com consulta O(1)"""
+
+    def __init__(self, records=None):
+        self.records = records or {}
+
+    # --- persistência ---------------------------------------------------------
+
+    @classmethod
+    def load(cls, path=RECORDS_PATH) -> "RecordsIndex":
+        try:
+            return cls(json.loads(Path(path).read_text(encoding="utf-8")))
+        except FileNotFoundError:
+            return cls()
+
+    def save(self, path=RECORDS_PATH):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self.records, ensure_ascii=False, indent=1, sort_keys=True), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+    # --- atualização ----------------------------------------------------------
+
+    def update(self, df: pd.DataFrame) -> int:
+        """Incorpora um lote de atividades; retorna quantos recordes mudaram"""
+        if df.empty:
+            return 0
+        data = _prepare(df)
+        if data.empty:
+            return 0
+
+        changed = 0
+        # cada atividade contribui para as 8 chaves com/sem tipo, ano e faixa
+        for mask in range(8):
+            levels = [level for bit, level in enumerate(KEY_LEVELS) if mask & (1 << bit)]
+            groups = data.groupby(levels, sort=False) if levels else [((), data)]
+            for group_key, group in groups:
+                if not isinstance(group_key, tuple):
+                    group_key = (group_key,)
+                parts = dict(zip(levels, group_key))
+                key = _key(parts.get("type", ALL), parts.get("year", ALL), parts.get("bucket", ALL))
+                entry = self.records.setdefault(key, {})
+                for metric, (column, how) in METRICS.items():
+                    values = group[column].dropna()
+                    if values.empty:
+                        continue
+                    idx = values.idxmin() if how == "min" else values.idxmax()
+                    candidate = _record(group.loc[idx], column)
+                    if _better(candidate, entry.get(metric), how):
+                        entry[metric] = candidate
+                        changed += 1
+        return changed
+
+    @classmethod
+    def rebuild(cls, df: pd.DataFrame) -> "RecordsIndex":
+        index = cls()
+        index.update(df)
+        return index
+
+    # --- consulta -------------------------------------------------------------
+
+    def lookup(self, type_=ALL, year=ALL, bucket=ALL) -> dict:
+        """Recordes da combinação pedida ({} se não houver atividades)"""
+        return self.records.get(_key(type_, str(year), bucket), {})
+
+    def types(self):
+        return sorted({key.split("|")[0] for key in self.records} - {ALL})
+
+    # --- validação ------------------------------------------------------------
+
+    def validate(self, df: pd.DataFrame) -> list:
+        """Compara o índice com uma varredura completa; retorna as divergências"""
+        data = _prepare(df)
+        problems = []
+        keys = set(self.records)
+        for type_ in [ALL] + sorted(data["type"].unique()):
+            for year in [ALL] + sorted(data["year"].unique()):
+                for bucket in [ALL] + DISTANCE_LABELS:
+                    subset = data
+                    if type_ != ALL:
+                        subset = subset[subset["type"] == type_]
+                    if year != ALL:
+                        subset = subset[subset["year"] == year]
+                    if bucket != ALL:
+                        subset = subset[subset["bucket"] == bucket]
+                    if subset.empty:
+                        continue
+                    key = _key(type_, year, bucket)
+                    keys.discard(key)
+                    stored = self.records.get(key, {})
+                    for metric, (column, how) in METRICS.items():
+                        values = subset[column].dropna()
+                        expected = None if values.empty else float(values.min() if how == "min" else values.max())
+                        got = stored.get(metric, {}).get("value")
+                        if expected is None and got is None:
+                            continue
+                        if expected is None or got is None or not np.isclose(expected, got):
+                            problems.append((key, metric, expected, got))
+        problems.extend((key, "*", None, "chave sem atividades") for key in sorted(keys))
+        return problems
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Índice de recordes pessoais")
+    parser.add_argument("--csv", default=str(RECORDS_PATH.with_name("activities.csv")), help="CSV de atividades")
+    parser.add_argument("--out", default=str(RECORDS_PATH), help="arquivo JSON do índice")
+    parser.add_argument("--rebuild", action="store_true", help="reconstrói o índice a partir do CSV")
+    parser.add_argument("--validate", action="store_true", help="compara o índice com uma varredura completa")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv, parse_dates=["date"])
+    if args.rebuild:
+        index = RecordsIndex.rebuild(df)
+        index.save(args.out)
+        print(f"✅ Índice reconstruído: {len(index.records)} chaves em {args.out}")
+    else:
+        index = RecordsIndex.load(args.out)
+
+    if args.validate:
+        problems = index.validate(df)
+        if problems:
+            print(f"❌ {len(problems)} divergência(s):")
+            for key, metric, expected, got in problems[:20]:
+                print(f"   {key} {metric}: esperado {expected}, índice {got}")
+        else:
+            print(f"✅ Índice confere com a varredura completa ({len(index.records)} chaves)")
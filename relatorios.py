@@ -0,0 +1,195 @@
+"""Relatórios em PNG dos gráficos do graficos.py, sem tela (backend Agg).
+
+Cada gráfico (pace mensal, histograma de distâncias, distância x elevação) é
+renderizado por fonte de dados e período num pool de processos, e pode rodar
+num servidor ou em lote.
+
+Fontes: o CSV do ETL (strava_activities_etl.csv, fonte "etl") e as partições
+dos atletas (data/athletes/<id>/activities.csv, ver store.py).
+
+Cache: o manifesto (plots/relatorios/manifest.json) guarda a versão do arquivo
+de cada fonte e, para cada PNG, um hash das colunas que aquele gráfico usa.
+Fonte com o arquivo inalterado nem é lida; nas outras, só os gráficos cujas
+entradas mudaram são renderizados de novo (uma corrida nova em 2025 não
+refaz os relatórios de 2024).
+
+Uso:
+    python relatorios.py                        # todas as fontes, período "todos"
+    python relatorios.py --by-year --workers 4  # também um relatório por ano
+    python relatorios.py --athlete 123 --force  # ignora o cache
+"""
+import matplotlib
+matplotlib.use("Agg")  # antes do pyplot (importado pelo graficos)
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import matplotlib.pyplot as plt
+import pandas as pd
+import seaborn as sns
+
+import graficos
+import store
+
+BASE_DIR = Path(__file__).resolve().parent
+OUT_DIR = BASE_DIR / "plots" / "relatorios"
+ETL_SOURCE = "etl"
+ALL_PERIODS = "todos"
+# muda quando o desenho dos gráficos muda (invalida todo o cache)
+RENDER_VERSION = 1
+
+
+def report_sources(athletes=None) -> dict:
+    """{fonte: CSV} do ETL e das partições dos atletas"""
+    found = {}
+    etl_csv = BASE_DIR / graficos.ETL_CSV
+    if etl_csv.exists():
+        found[ETL_SOURCE] = etl_csv
+    for athlete_id in store.list_athletes():
+        found[athlete_id] = store.partition_csv(athlete_id)
+    if athletes:
+        found = {name: path for name, path in found.items() if name in athletes}
+    return found
+
+
+def load_source(name, path) -> pd.DataFrame:
+    """Corridas da fonte com as colunas usadas pelo graficos.py"""
+    if name == ETL_SOURCE:
+        return graficos.load_etl_csv(path)
+    df = pd.read_csv(path, usecols=["type", "date", "distance_km", "pace_min_km", "elevation_m"])
+    df = df[df["type"].astype(str).str.contains("Run")]
+    return graficos.prepare_plot_data(pd.DataFrame({
+        "Data": pd.to_datetime(df["date"], utc=True, errors="coerce").dt.tz_convert(None),
+        "Distancia_km": df["distance_km"],
+        "Pace_Segundos_por_km": df["pace_min_km"] * 60,
+        "total_elevation_gain": df["elevation_m"],
+    }))
+
+
+def report_periods(df, by_year=False) -> dict:
+    periods = {ALL_PERIODS: df}
+    if by_year:
+        for year, frame in df.groupby(df["Data"].dt.year):
+            periods[str(int(year))] = frame
+    return periods
+
+
+def input_key(chart, df) -> str:
+    """Hash das entradas de um gráfico (só as colunas que ele usa)"""
+    digest = hashlib.sha1(f"{chart}:{RENDER_VERSION}".encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+def render_chart(chart, df, out_path) -> float:
+    """Renderiza um gráfico num PNG (roda nos processos do pool)"""
+    t0 = time.perf_counter()
+    plot, _ = graficos.CHARTS[chart]
+    sns.set_style("whitegrid")
+    fig, ax = plt.subplots(figsize=(12, 6))
+    try:
+        plot(ax, df)
+        fig.tight_layout()
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        # grava ao lado e troca: um relatório pela metade nunca fica no lugar do anterior
+        tmp = out_path.with_suffix(".tmp.png")
+        fig.savefig(tmp, dpi=100)
+        os.replace(tmp, out_path)
+    finally:
+        plt.close(fig)
+    return time.perf_counter() - t0
+
+
+def _load_manifest(out_dir) -> dict:
+    try:
+        return json.loads((out_dir / "manifest.json").read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {}
+
+
+def render_reports(athletes=None, by_year=False, workers=None, force=False, out_dir=OUT_DIR) -> dict:
+    """Renderiza o que mudou desde o último manifesto; devolve contagens e tempos"""
+    t0 = time.perf_counter()
+    manifest = _load_manifest(out_dir)
+    stats = {"rendered": 0, "cached": 0, "failed": 0, "unchanged_sources": []}
+    tasks = {}  # caminho relativo -> (gráfico, dados)
+
+    for name, path in report_sources(athletes).items():
+        version = store.file_version(path)
+        previous = manifest.get(name, {})
+        charts = previous.get("charts", {})
+        if (not force and previous.get("version") == version and previous.get("by_year") == by_year
+                and all((out_dir / rel).exists() for rel in charts)):
+            stats["unchanged_sources"].append(name)
+            stats["cached"] += len(charts)
+            continue
+
+        df = load_source(name, path)
+        entry = {"version": version, "by_year": by_year, "charts": {}}
+        for period, frame in report_periods(df, by_year).items():
+            if frame.empty:
+                continue
+            for chart, (_, columns) in graficos.CHARTS.items():
+                rel = f"{name}/{period}/{chart}.png"
+                data = frame[columns]
+                key = input_key(chart, data)
+                entry["charts"][rel] = key
+                if not force and charts.get(rel) == key and (out_dir / rel).exists():
+                    stats["cached"] += 1
+                else:
+                    tasks[rel] = (chart, data)
+        manifest[name] = entry
+
+    def done(rel, error=None):
+        if error is None:
+            stats["rendered"] += 1
+            return
+        stats["failed"] += 1
+        # sem chave no manifesto, o gráfico é tentado de novo na próxima execução
+        manifest[rel.split("/", 1)[0]]["charts"].pop(rel, None)
+        print(f"❌ {rel}: {error}")
+
+    workers = workers or os.cpu_count() or 1
+    if len(tasks) <= 1 or workers == 1:
+        for rel, (chart, data) in tasks.items():
+            try:
+                render_chart(chart, data, out_dir / rel)
+                done(rel)
+            except Exception as e:
+                done(rel, e)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(render_chart, chart, data, out_dir / rel): rel
+                       for rel, (chart, data) in tasks.items()}
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                    done(futures[future])
+                except Exception as e:
+                    done(futures[future], e)
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    (out_dir / "manifest.json").write_text(json.dumps(manifest, indent=1, sort_keys=True), encoding="utf-8")
+    stats["seconds"] = time.perf_counter() - t0
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Relatórios PNG dos gráficos, sem tela e em paralelo")
+    parser.add_argument("--athlete", action="append", help="fonte (id do atleta ou 'etl'); repetível")
+    parser.add_argument("--by-year", action="store_true", help="também um relatório por ano")
+    parser.add_argument("--workers", type=int, default=None, help="processos (padrão: nº de CPUs)")
+    parser.add_argument("--force", action="store_true", help="ignora o cache e renderiza tudo")
+    parser.add_argument("--out", type=Path, default=OUT_DIR)
+    args = parser.parse_args()
+
+    stats = render_reports(args.athlete, by_year=args.by_year, workers=args.workers,
+                           force=args.force, out_dir=args.out)
+    unchanged = f"; fontes inalteradas: {', '.join(stats['unchanged_sources'])}" if stats["unchanged_sources"] else ""
+    print(f"🖼️ {stats['rendered']} gráficos renderizados, {stats['cached']} do cache, "
+          f"{stats['failed']} com erro em {stats['seconds']:.1f}s ({args.out}){unchanged}")
@@ -0,0 +1,251 @@
+"""Cache de resultados do dashboard compartilhado entre os workers do gunicorn.
+
+Dois níveis, consultados em ordem:
+1. memória: LRU por processo (DASH_CACHE_ENTRIES entradas)
+2. disco:   SQLite em data/cache/dash_results.sqlite (DASH_CACHE_DIR), comum a
+            todos os workers da máquina, limitado a DASH_CACHE_MB com despejo
+            das entradas acessadas há mais tempo
+
+Um worker que acabou de subir (ou que nunca viu aquele filtro) encontra no
+disco o que outro worker já calculou, sem ler o CSV nem montar figuras. As
+chaves incluem a versão do dataset (store.file_version), então dados novos
+simplesmente geram chaves novas e as antigas envelhecem até o despejo. O
+disco sobrevive aos deploys: quem mudar o que um callback cacheado devolve
+(figuras, KPIs, opções) incrementa CACHE_VERSION, que também entra na chave.
+Os valores são gravados com pickle; figuras devem ir como dict.
+
+Latência e acertos por nível: histograma dash_cache_seconds{cache,tier,result}
+em /metrics (DASH_METRICS=1) e ResultCache.stats(); tier="compute" é o tempo
+de cálculo dos misses. DASH_SHARED_CACHE=0 deixa
+só o nível em memória.
+
+    python result_cache.py            # entradas e tamanho do nível em disco
+    python result_cache.py clear      # apaga o nível em disco
+"""
+import functools
+import hashlib
+import os
+import pickle
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import metrics
+
+CACHE_DIR = Path(os.environ.get("DASH_CACHE_DIR", Path(__file__).resolve().parent / "data" / "cache"))
+CACHE_PATH = CACHE_DIR / "dash_results.sqlite"
+MEMORY_ENTRIES = int(os.environ.get("DASH_CACHE_ENTRIES", "256"))
+DISK_MAX_BYTES = int(float(os.environ.get("DASH_CACHE_MB", "256")) * 1024 * 1024)
+SHARED = os.environ.get("DASH_SHARED_CACHE", "1") not in ("", "0")
+# uma entrada maior que isso não vai para o disco (só memória)
+MAX_ENTRY_BYTES = 8 * 1024 * 1024
+# o despejo só roda a cada N gravações (a soma dos tamanhos varre a tabela)
+EVICT_EVERY = 50
+# `accessed` só é regravado num acerto se for mais velho que isso: a ordem do
+# despejo não precisa de precisão fina, e cada UPDATE pega o lock de escrita
+ACCESS_REFRESH_SECONDS = 60
+
+# muda quando o formato de algum valor cacheado muda (invalida o nível em disco)
+CACHE_VERSION = 1
+
+TIERS = ("memory", "disk", "compute")
+
+
+class MemoryTier:
+    """LRU em memória do processo"""
+
+    def __init__(self, max_entries=MEMORY_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                raise KeyError(key)
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class DiskTier:
+    """Chave/valor em SQLite (modo WAL), compartilhado entre processos"""
+
+    def __init__(self, path=CACHE_PATH, max_bytes=DISK_MAX_BYTES):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._puts = 0
+        self._warned = False
+
+    def _conn(self):
+        # uma conexão por thread e por processo (não atravessa o fork do gunicorn)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+                         "size INTEGER NOT NULL, accessed REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _failed(self, e):
+        # disco cheio/bloqueado/só leitura: o cache em disco vira um miss, nunca um erro
+        if not self._warned:
+            self._warned = True
+            print(f"⚠️ Cache em disco indisponível ({self.path}): {e}")
+
+    @staticmethod
+    def digest(key) -> str:
+        return hashlib.sha1(repr((CACHE_VERSION, key)).encode()).hexdigest()
+
+    def get(self, key):
+        digest = self.digest(key)
+        try:
+            conn = self._conn()
+            row = conn.execute("SELECT value, accessed FROM entries WHERE key = ?", (digest,)).fetchone()
+            if row is None:
+                raise KeyError(key)
+            now = time.time()
+            if now - row[1] > ACCESS_REFRESH_SECONDS:
+                conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, digest))
+        except sqlite3.Error as e:
+            self._failed(e)
+            raise KeyError(key) from None
+        return pickle.loads(row[0])
+
+    def put(self, key, value):
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(blob) > MAX_ENTRY_BYTES:
+            return
+        try:
+            conn = self._conn()
+            conn.execute("INSERT OR REPLACE INTO entries (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+                         (self.digest(key), blob, len(blob), time.time()))
+            self._puts += 1
+            if self._puts % EVICT_EVERY == 0:
+                self.evict()
+        except sqlite3.Error as e:
+            self._failed(e)
+
+    def evict(self):
+        """Apaga as entradas acessadas há mais tempo até caber em 90% do limite"""
+        conn = self._conn()
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+        target = total - int(self.max_bytes * 0.9)
+        doomed, freed = [], 0
+        for digest, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed"):
+            doomed.append((digest,))
+            freed += size
+            if freed >= target:
+                break
+        conn.executemany("DELETE FROM entries WHERE key = ?", doomed)
+        return len(doomed)
+
+    def info(self) -> dict:
+        entries, size = self._conn().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {"path": str(self.path), "entries": entries, "bytes": size, "max_bytes": self.max_bytes}
+
+    def clear(self):
+        self._conn().execute("DELETE FROM entries")
+
+
+class ResultCache:
+    """Memória -> disco -> cálculo, com acertos e latência por nível"""
+
+    def __init__(self, name, memory=None, disk=None):
+        self.name = name
+        self.memory = memory or MemoryTier()
+        self.disk = disk if disk is not None else (DiskTier() if SHARED else None)
+        self.enabled = True  # False: sempre calcula (ex.: benchmarks.py)
+        self._stats = {tier: {"hit": 0, "miss": 0, "seconds": 0.0} for tier in TIERS}
+        self._lock = threading.Lock()
+
+    def _record(self, tier, result, seconds):
+        with self._lock:
+            entry = self._stats[tier]
+            entry[result] += 1
+            entry["seconds"] += seconds
+        if metrics.ENABLED:
+            metrics.observe("dash_cache_seconds", seconds, cache=self.name, tier=tier, result=result)
+
+    def get_or_compute(self, key, compute):
+        if not self.enabled:
+            return compute()
+        t0 = time.perf_counter()
+        try:
+            value = self.memory.get(key)
+            self._record("memory", "hit", time.perf_counter() - t0)
+            return value
+        except KeyError:
+            self._record("memory", "miss", time.perf_counter() - t0)
+
+        if self.disk is not None:
+            t0 = time.perf_counter()
+            try:
+                value = self.disk.get(key)
+                self._record("disk", "hit", time.perf_counter() - t0)
+                self.memory.put(key, value)
+                return value
+            except KeyError:
+                self._record("disk", "miss", time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        value = compute()
+        self._record("compute", "miss", time.perf_counter() - t0)
+        self.memory.put(key, value)
+        if self.disk is not None:
+            self.disk.put(key, value)
+        return value
+
+    def cached(self, name, version):
+        """Decorator: memoiza func(*args) por (name, version(*args), args)"""
+        def decorate(func):
+            @functools.wraps(func)
+            def wrapper(*args):
+                return self.get_or_compute((name, version(*args), args), lambda: func(*args))
+            return wrapper
+        return decorate
+
+    def stats(self) -> dict:
+        """{nível: {hits, misses, hit_rate, avg_ms}}; em "compute" só contam os misses"""
+        with self._lock:
+            snapshot = {tier: dict(entry) for tier, entry in self._stats.items()}
+        report = {}
+        for tier, entry in snapshot.items():
+            calls = entry["hit"] + entry["miss"]
+            report[tier] = {
+                "hits": entry["hit"],
+                "misses": entry["miss"],
+                "hit_rate": entry["hit"] / calls if calls else None,
+                "avg_ms": entry["seconds"] * 1000 / calls if calls else None,
+            }
+        return report
+
+if __name__ == "__main__":
+    disk = DiskTier()
+    if sys.argv[1:] == ["clear"]:
+        disk.clear()
+        print(f"🧹 Cache em disco limpo: {disk.path}")
+    else:
+        info = disk.info()
+        print(f"📦 {info['path']}: {info['entries']} entradas, "
+              f"{info['bytes'] / 2**20:.1f} MB de {info['max_bytes'] / 2**20:.0f} MB")
@@ -0,0 +1,130 @@
+"""Mede o custo de inicialização dos dashboards.
+
+- Importação: roda `python -X importtime -c "import <módulo>"` e mostra o tempo
+  acumulado de cada import direto do módulo (e o tempo do próprio módulo).
+- Tempo até a primeira resposta: sobe o servidor do dah num processo novo
+  (gunicorn, se instalado; senão o servidor do Flask) e mede, a partir do
+  spawn, quando respondem "/", "/_dash-layout" e o primeiro callback com dados.
+
+Uso:
+    python startup.py                    # dah: imports + primeira resposta
+    python startup.py --module etl       # só a quebra de imports (ex.: app.py usa etl)
+    python startup.py --preload          # gunicorn com GUNICORN_PRELOAD=1
+"""
+import argparse
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from urllib.error import URLError
+from urllib.request import Request, urlopen
+
+BASE_DIR = Path(__file__).resolve().parent
+
+
+def import_breakdown(module="dah", top=15) -> dict:
+    """{"total_ms", "self_ms", "imports": [(nome, ms acumulado)]} dos imports diretos"""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          capture_output=True, text=True, cwd=BASE_DIR, env=os.environ)
+    direct = []
+    total = self_ms = 0.0
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line[13:]:
+            continue
+        try:
+            self_us, cumulative_us, name = line[12:].split("|", 2)
+            self_us, cumulative_us = int(self_us), int(cumulative_us)
+        except ValueError:  # cabeçalho
+            continue
+        depth = (len(name) - len(name.lstrip())) // 2
+        name = name.strip()
+        if name == module:
+            total, self_ms = cumulative_us / 1000, self_us / 1000
+        elif depth == 1:
+            direct.append((name, cumulative_us / 1000))
+    direct.sort(key=lambda item: item[1], reverse=True)
+    return {"module": module, "total_ms": total, "self_ms": self_ms, "imports": direct[:top]}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait(url, t0, data=None, timeout=60.0):
+    """Segundos desde t0 até `url` responder 200"""
+    headers = {"Content-Type": "application/json"} if data else {}
+    while time.perf_counter() - t0 < timeout:
+        try:
+            with urlopen(Request(url, data=data, headers=headers), timeout=timeout) as resp:
+                resp.read()
+                if resp.status == 200:
+                    return time.perf_counter() - t0
+        except (URLError, ConnectionError, OSError):
+            time.sleep(0.01)
+    raise TimeoutError(url)
+
+
+def _first_callback_body(athlete="default"):
+    outputs = [("graph-rolling-distance", "figure"), ("graph-acwr", "figure"), ("graph-iso-weeks", "figure")]
+    inputs = [("dropdown-atleta", athlete), ("dropdown-ano", "Todos"), ("dropdown-mes", "Todos")]
+    return json.dumps({
+        "output": ".." + "...".join(f"{i}.{p}" for i, p in outputs) + "..",
+        "outputs": [{"id": i, "property": p} for i, p in outputs],
+        "inputs": [{"id": i, "property": "value", "value": v} for i, v in inputs],
+        "changedPropIds": ["dropdown-atleta.value"],
+        "state": [],
+    }).encode()
+
+
+def time_to_first_response(preload=False, athlete="default") -> dict:
+    """Tempos (s) desde o spawn do servidor até cada primeira resposta"""
+    port = _free_port()
+    env = {**os.environ, "GUNICORN_PRELOAD": "1" if preload else "0"}
+    if shutil.which("gunicorn"):
+        cmd = ["gunicorn", "dah:server", "--bind", f"127.0.0.1:{port}", "--workers", "1"]
+        server = "gunicorn"
+    else:
+        cmd = [sys.executable, "-c", f"import dah; dah.server.run(port={port})"]
+        server = "flask"
+    base = f"http://127.0.0.1:{port}"
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        result = {"server": server, "preload": preload}
+        result["index_s"] = _wait(f"{base}/", t0)
+        result["layout_s"] = _wait(f"{base}/_dash-layout", t0)
+        result["first_callback_s"] = _wait(f"{base}/_dash-update-component", t0, _first_callback_body(athlete))
+        return result
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Custo de inicialização dos dashboards")
+    parser.add_argument("--module", default="dah", help="módulo para a quebra de imports")
+    parser.add_argument("--preload", action="store_true", help="gunicorn com preload + aquecimento")
+    parser.add_argument("--athlete", default="default", help="atleta do primeiro callback")
+    parser.add_argument("--runs", type=int, default=3, help="repetições da medição de primeira resposta")
+    args = parser.parse_args()
+
+    breakdown = import_breakdown(args.module)
+    print(f"=== import {args.module}: {breakdown['total_ms']:.0f} ms "
+          f"(próprio módulo {breakdown['self_ms']:.0f} ms) ===")
+    for name, ms in breakdown["imports"]:
+        print(f"   {name:<28} {ms:>8.1f} ms")
+
+    if args.module == "dah":
+        runs = [time_to_first_response(args.preload, args.athlete) for _ in range(args.runs)]
+        print(f"\n=== Primeira resposta ({runs[0]['server']}, preload={'sim' if args.preload else 'não'}, "
+              f"mediana de {len(runs)}) ===")
+        for key, label in (("index_s", "GET /"), ("layout_s", "GET /_dash-layout"),
+                           ("first_callback_s", "1º callback com dados")):
+            values = sorted(run[key] for run in runs)
+            print(f"   {label:<24} {values[len(values) // 2]:>7.2f} s")
@@ -0,0 +1,140 @@
+"""Armazenamento das atividades particionado por atleta.
+
+Cada atleta tem seu diretório em data/athletes/<athlete_id>/ com:
+- activities.csv  (mesmo formato gravado pelo ETL)
+- records.json    (índice de recordes pessoais, ver records.py)
+
+Um índice pequeno (data/athletes/index.json) guarda o nome de exibição de cada
+atleta, para que os dashboards montem a lista sem abrir cada partição. Os
+dados de um atleta só são lidos quando ele é selecionado.
+"""
+import json
+import os
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+DATA_DIR = Path(os.environ.get("STRAVA_DATA_DIR", Path(__file__).resolve().parent / "data" / "athletes"))
+INDEX_PATH = DATA_DIR / "index.json"
+
+# atleta usado quando não há registro de vários atletas
+DEFAULT_ATHLETE = "default"
+
+# linhas acumuladas antes de chamar on_batch na junção (cada recálculo de
+# recordes custa ~8 groupbys, então chamar por lote pequeno domina o tempo)
+MERGE_BATCH_ROWS = 50_000
+
+_index_lock = threading.Lock()
+
+
+def partition_dir(athlete_id) -> Path:
+    return DATA_DIR / str(athlete_id)
+
+
+def partition_csv(athlete_id) -> Path:
+    return partition_dir(athlete_id) / "activities.csv"
+
+
+def partition_records(athlete_id) -> Path:
+    return partition_dir(athlete_id) / "records.json"
+
+
+def list_athletes() -> dict:
+    """{athlete_id: nome} das partições existentes"""
+    try:
+        names = json.loads(INDEX_PATH.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        names = {}
+    if not DATA_DIR.exists():
+        return {}
+    return {
+        entry.name: names.get(entry.name, entry.name)
+        for entry in sorted(DATA_DIR.iterdir())
+        if entry.is_dir() and (entry / "activities.csv").exists()
+    }
+
+
+def register_athlete(athlete_id, name=None):
+    """Grava/atualiza o nome de exibição no índice de atletas"""
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    # sincronizações paralelas (athletes.sync_all) atualizam o mesmo índice
+    with _index_lock:
+        try:
+            names = json.loads(INDEX_PATH.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            names = {}
+        names[str(athlete_id)] = name or str(athlete_id)
+        tmp_path = INDEX_PATH.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(names, ensure_ascii=False, indent=1, sort_keys=True), encoding="utf-8")
+        os.replace(tmp_path, INDEX_PATH)
+
+
+def file_version(path) -> str:
+    """Versão de um arquivo (mtime/tamanho); 'vazio' se não existir"""
+    try:
+        stat = Path(path).stat()
+    except FileNotFoundError:
+        return "vazio"
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+def empty_activities() -> pd.DataFrame:
+    return pd.DataFrame({
+        'date': pd.Series([], dtype="datetime64[ns]"), 'distance_km': [], 'duration_min': [],
+        'type': [], 'name': [], 'pace_min_km': []
+    })
+
+
+def read_activities(path) -> pd.DataFrame:
+    """Lê um CSV de atividades com os tipos usados pelos dashboards"""
+    try:
+        df = pd.read_csv(path, parse_dates=["date"])
+    except FileNotFoundError:
+        return empty_activities()
+    if df.empty:
+        return empty_activities()
+    df["date"] = pd.to_datetime(df["date"], errors='coerce')
+    df["duration_min"] = pd.to_numeric(df["duration_min"], errors="coerce").round(1)
+    df["distance_km"] = pd.to_numeric(df["distance_km"], errors="coerce").round(1)
+    return df.dropna(subset=['date'])
+
+
+def merge_activities(sources, out_path, on_batch=None) -> int:
+    """Une CSVs de atividades em `out_path` sem ids repetidos; retorna o total
+
+    Em caso de id repetido vale o primeiro arquivo de `sources` (os mais novos
+    vêm antes); arquivos ausentes são ignorados e `out_path` pode estar entre
+    eles. `on_batch(df)` recebe as linhas gravadas em lotes de ~MERGE_BATCH_ROWS
+    (ex.: RecordsIndex.update). Sem nenhuma linha, `out_path` fica como estava.
+    """
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = out_path.with_suffix(out_path.suffix + ".merge.tmp")
+    seen = set()
+    total = 0
+    buffer = []
+    try:
+        with open(tmp_path, "w", newline="", encoding="utf-8") as fh:
+            for source in sources:
+                if not Path(source).exists():
+                    continue
+                for batch in pd.read_csv(source, parse_dates=["date"], chunksize=MERGE_BATCH_ROWS):
+                    batch = batch[~batch["id"].isin(seen)]
+                    seen.update(batch["id"])
+                    batch.to_csv(fh, index=False, header=(total == 0))
+                    total += len(batch)
+                    buffer.append(batch)
+                    if on_batch is not None and sum(len(b) for b in buffer) >= MERGE_BATCH_ROWS:
+                        on_batch(pd.concat(buffer, ignore_index=True))
+                        buffer = []
+            if on_batch is not None and buffer:
+                on_batch(pd.concat(buffer, ignore_index=True))
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    if total:
+        tmp_path.replace(out_path)
+    else:
+        tmp_path.unlink(missing_ok=True)
+    return total
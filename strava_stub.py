@@ -0,0 +1,376 @@
+"""Simulador local da API do Strava para testes de carga e latência do ETL.
+
+Implementa só o que o ETL usa:
+- POST /oauth/token                 troca refresh_token por access_token
+- GET  /api/v3/athlete/activities   paginação (page/per_page, máx. 200),
+                                    filtros before/after (epoch), ordem da API
+                                    (mais recentes primeiro; com after, mais
+                                    antigas primeiro)
+
+As respostas trazem os cabeçalhos X-RateLimit-Limit / X-RateLimit-Usage e
+devolvem 429 quando o limite da janela estoura. Latência (média + jitter) e
+taxa de erros 5xx são configuráveis. As atividades são sintéticas mas com o
+formato real: tipos variados, pace coerente com o tipo, elevação, kudos e
+um summary_polyline codificado (Encoded Polyline Algorithm) do percurso.
+
+Uso:
+    python strava_stub.py serve --activities 5000 --latency-ms 80 --error-rate 0.01
+    STRAVA_API_URL=http://127.0.0.1:8710 python etl.py      # ETL contra o stub
+
+    python strava_stub.py harness --activities 10000    # mede etl.load_activities
+"""
+import argparse
+import bisect
+import json
+import math
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+DEFAULT_PORT = 8710
+MAX_PER_PAGE = 200
+
+# tipo -> (peso, faixa de distância em km, faixa de velocidade em km/h)
+ACTIVITY_TYPES = {
+    "Run": (0.55, (3, 25), (8, 15)),
+    "Ride": (0.25, (15, 120), (18, 35)),
+    "Walk": (0.15, (2, 10), (4, 6.5)),
+    "Hike": (0.05, (5, 25), (3, 5)),
+}
+# ponto de partida dos percursos (São Paulo)
+ORIGIN = (-23.5874, -46.6576)
+
+
+# === GERAÇÃO DE ATIVIDADES ===
+
+def encode_polyline(points) -> str:
+    """Codifica [(lat, lng)] no formato do Google/Strava (precisão 1e-5)"""
+    out = []
+    prev_lat = prev_lng = 0
+    for lat, lng in points:
+        lat_i, lng_i = round(lat * 1e5), round(lng * 1e5)
+        for delta in (lat_i - prev_lat, lng_i - prev_lng):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                out.append(chr((0x20 | (value & 0x1F)) + 63))
+                value >>= 5
+            out.append(chr(value + 63))
+        prev_lat, prev_lng = lat_i, lng_i
+    return "".join(out)
+
+
+def _route(rng, distance_km):
+    """Passeio aleatório com ~1 ponto a cada 200 m"""
+    lat, lng = ORIGIN[0] + rng.uniform(-0.05, 0.05), ORIGIN[1] + rng.uniform(-0.05, 0.05)
+    heading = rng.uniform(0, 2 * math.pi)
+    step = 0.2 / 111.32  # 200 m em graus de latitude
+    points = [(lat, lng)]
+    for _ in range(max(2, int(distance_km * 5))):
+        heading += rng.gauss(0, 0.4)
+        lat += step * math.cos(heading)
+        lng += step * math.sin(heading) / math.cos(math.radians(lat))
+        points.append((lat, lng))
+    return points
+
+
+def generate_activities(n, seed=42, years=10, end=None) -> list:
+    """n atividades sintéticas nos últimos `years` anos, em ordem cronológica"""
+    rng = random.Random(seed)
+    end = end or datetime.now(timezone.utc).replace(microsecond=0)
+    span = int(timedelta(days=365 * years).total_seconds())
+    starts = sorted(rng.randrange(span) for _ in range(n))
+    types = list(ACTIVITY_TYPES)
+    weights = [ACTIVITY_TYPES[t][0] for t in types]
+
+    activities = []
+    for i, offset in enumerate(starts):
+        type_ = rng.choices(types, weights)[0]
+        _, (dmin, dmax), (vmin, vmax) = ACTIVITY_TYPES[type_]
+        distance_km = rng.uniform(dmin, dmax)
+        speed_kmh = rng.uniform(vmin, vmax)
+        moving_time = int(distance_km / speed_kmh * 3600)
+        start = end - timedelta(seconds=span - offset)
+        local = start - timedelta(hours=3)
+        activities.append({
+            "resource_state": 2,
+            "id": 10_000_000_000 + i,
+            "name": f"{type_} {local:%d/%m %Hh}",
+            "type": type_,
+            "sport_type": type_,
+            "start_date": start.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "start_date_local": local.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "timezone": "(GMT-03:00) America/Sao_Paulo",
+            "distance": round(distance_km * 1000, 1),
+            "moving_time": moving_time,
+            "elapsed_time": int(moving_time * rng.uniform(1.0, 1.2)),
+            "total_elevation_gain": round(distance_km * rng.uniform(2, 15), 1),
+            "average_speed": round(speed_kmh / 3.6, 3),
+            "max_speed": round(speed_kmh / 3.6 * rng.uniform(1.2, 1.6), 3),
+            "kudos_count": rng.randrange(0, 30),
+            "calories": round(distance_km * rng.uniform(50, 75), 1),
+            "map": {
+                "id": f"a{10_000_000_000 + i}",
+                "summary_polyline": encode_polyline(_route(rng, distance_km)),
+                "resource_state": 2,
+            },
+            "_epoch": int(start.timestamp()),
+        })
+    return activities
+
+
+# === SERVIDOR ===
+
+class StravaStub:
+    """Estado do simulador: atividades, tokens, limite de requisições e contadores"""
+
+    def __init__(self, activities, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0,
+                 rate_limit=(100, 1000), rate_windows=(900, 86400), seed=0):
+        self.activities = activities
+        self.epochs = [a["_epoch"] for a in activities]
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.rate_windows = rate_windows
+        self.tokens = set()
+        self.stats = {"token": 0, "activities": 0, "429": 0, "401": 0, "5xx": 0}
+        self._usage = {}  # janela (s) -> (id da janela atual, requisições nela)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+
+    # --- regras ---------------------------------------------------------------
+
+    def _delay(self):
+        if self.latency_ms or self.jitter_ms:
+            with self._lock:
+                delay = max(0.0, self._rng.gauss(self.latency_ms, self.jitter_ms))
+            time.sleep(delay / 1000)
+
+    def _should_fail(self) -> bool:
+        with self._lock:
+            return self._rng.random() < self.error_rate
+
+    def _rate_usage(self):
+        """(uso por janela, estourou?) contando a requisição atual
+
+        Como no Strava, as janelas são fixas (15 min a partir da hora cheia e
+        o dia a partir da meia-noite UTC) e requisições recusadas também contam.
+        """
+        now = time.time()
+        usage = []
+        with self._lock:
+            for window in self.rate_windows:
+                current = int(now // window)
+                window_id, count = self._usage.get(window, (current, 0))
+                count = count + 1 if window_id == current else 1
+                self._usage[window] = (current, count)
+                usage.append(count)
+        return usage, any(u > limit for u, limit in zip(usage, self.rate_limit))
+
+    def page(self, per_page=30, page=1, before=None, after=None) -> list:
+        """Uma página de atividades com a mesma ordem e filtros da API"""
+        per_page = max(1, min(int(per_page), MAX_PER_PAGE))
+        page = max(1, int(page))
+        lo = 0 if after is None else bisect.bisect_right(self.epochs, int(after))
+        hi = len(self.epochs) if before is None else bisect.bisect_left(self.epochs, int(before))
+        offset = (page - 1) * per_page
+        if after is None:
+            # mais recentes primeiro
+            stop = max(lo, hi - offset)
+            selected = self.activities[max(lo, stop - per_page):stop][::-1]
+        else:
+            start = lo + offset
+            selected = self.activities[start:min(hi, start + per_page)]
+        return [{k: v for k, v in a.items() if k != "_epoch"} for a in selected]
+
+    # --- ciclo de vida --------------------------------------------------------
+
+    def start(self, host="127.0.0.1", port=0) -> "StravaStub":
+        """Sobe o servidor numa thread; port=0 escolhe uma porta livre"""
+        stub = self
+
+        class Handler(_StubHandler):
+            pass
+        Handler.stub = stub
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self if self._server else self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    stub: StravaStub = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body, headers=None):
+        payload = json.dumps(body, separators=(",", ":")).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _form(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length).decode() if length else ""
+        fields = {k: v[-1] for k, v in parse_qs(raw).items()}
+        fields.update({k: v[-1] for k, v in parse_qs(urlparse(self.path).query).items()})
+        return fields
+
+    def do_POST(self):
+        stub = self.stub
+        if urlparse(self.path).path != "/oauth/token":
+            return self._send(404, {"message": "Record Not Found"})
+        form = self._form()
+        stub._delay()
+        if form.get("grant_type") != "refresh_token" or not form.get("refresh_token"):
+            return self._send(400, {"message": "Bad Request", "errors": [{"field": "refresh_token"}]})
+        token = f"stub-{len(stub.tokens) + 1:06d}"
+        with stub._lock:
+            stub.tokens.add(token)
+            stub.stats["token"] += 1
+        self._send(200, {
+            "token_type": "Bearer",
+            "access_token": token,
+            "expires_at": int(time.time()) + 6 * 3600,
+            "expires_in": 6 * 3600,
+            "refresh_token": form["refresh_token"],
+        })
+
+    def do_GET(self):
+        stub = self.stub
+        parsed = urlparse(self.path)
+        if parsed.path != "/api/v3/athlete/activities":
+            return self._send(404, {"message": "Record Not Found"})
+
+        auth = self.headers.get("Authorization", "")
+        if not auth.startswith("Bearer ") or auth[7:] not in stub.tokens:
+            with stub._lock:
+                stub.stats["401"] += 1
+            return self._send(401, {"message": "Authorization Error"})
+
+        usage, exceeded = stub._rate_usage()
+        headers = {
+            "X-RateLimit-Limit": ",".join(map(str, stub.rate_limit)),
+            "X-RateLimit-Usage": ",".join(map(str, usage)),
+        }
+        if exceeded:
+            with stub._lock:
+                stub.stats["429"] += 1
+            return self._send(429, {"message": "Rate Limit Exceeded"}, headers)
+
+        stub._delay()
+        if stub._should_fail():
+            with stub._lock:
+                stub.stats["5xx"] += 1
+            return self._send(503, {"message": "Service Unavailable"}, headers)
+
+        query = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+        try:
+            items = stub.page(query.get("per_page", 30), query.get("page", 1),
+                              query.get("before"), query.get("after"))
+        except ValueError:
+            return self._send(400, {"message": "Bad Request"}, headers)
+        with stub._lock:
+            stub.stats["activities"] += 1
+        self._send(200, items, headers)
+
+
+# === HARNESS ===
+
+def run_harness(n=10_000, per_page=200, latency_ms=50.0, jitter_ms=10.0, error_rate=0.0,
+                rate_limit=(100_000, 1_000_000), seed=42) -> dict:
+    """Sobe o stub, aponta o etl para ele e mede etl.load_activities"""
+    # import tardio: etl importa streamlit
+    import etl
+
+    t0 = time.perf_counter()
+    activities = generate_activities(n, seed=seed)
+    generate_seconds = time.perf_counter() - t0
+
+    stub = StravaStub(activities, latency_ms, jitter_ms, error_rate, rate_limit, seed=seed)
+    with stub.start():
+        etl.TOKEN_URL = f"{stub.url}/oauth/token"
+        etl.ACTIVITIES_URL = f"{stub.url}/api/v3/athlete/activities"
+        # load_activities lê as credenciais do st.secrets; o stub aceita qualquer uma
+        etl.get_strava_credentials = lambda: ("stub-client", "stub-secret", "stub-refresh")
+
+        max_pages = -(-n // per_page) + 1
+        t0 = time.perf_counter()
+        df = etl.load_activities(per_page=per_page, max_pages=max_pages)
+        seconds = time.perf_counter() - t0
+
+    return {
+        "activities": n, "loaded": len(df), "per_page": per_page, "latency_ms": latency_ms,
+        "error_rate": error_rate, "generate_seconds": generate_seconds, "seconds": seconds,
+        "activities_per_second": len(df) / seconds if seconds else 0.0,
+        "peak_rss_mb": etl.peak_rss_mb(), "requests": dict(stub.stats),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulador local da API do Strava")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("serve", "harness"):
+        p = sub.add_parser(name)
+        p.add_argument("--activities", type=int, default=10_000, help="atividades sintéticas")
+        p.add_argument("--seed", type=int, default=42)
+        p.add_argument("--latency-ms", type=float, default=50.0, help="latência média por requisição")
+        p.add_argument("--jitter-ms", type=float, default=10.0, help="desvio padrão da latência")
+        p.add_argument("--error-rate", type=float, default=0.0, help="fração de respostas 503")
+        p.add_argument("--rate-limit", default="100000,1000000",
+                       help="limites por 15 min e por dia (o Strava usa 100,1000)")
+    sub.choices["serve"].add_argument("--port", type=int, default=DEFAULT_PORT)
+    sub.choices["harness"].add_argument("--per-page", type=int, default=200)
+    args = parser.parse_args()
+    rate_limit = tuple(int(x) for x in args.rate_limit.split(","))
+
+    if args.command == "serve":
+        stub = StravaStub(generate_activities(args.activities, seed=args.seed), args.latency_ms,
+                          args.jitter_ms, args.error_rate, rate_limit, seed=args.seed)
+        stub.start(port=args.port)
+        print(f"🏃 Stub do Strava com {args.activities} atividades em {stub.url}")
+        print(f"   export STRAVA_API_URL={stub.url}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            stub.stop()
+    else:
+        result = run_harness(args.activities, args.per_page, args.latency_ms, args.jitter_ms,
+                             args.error_rate, rate_limit, args.seed)
+        print(f"\n📊 etl.load_activities contra o stub ({result['latency_ms']:.0f} ms/req, "
+              f"{result['error_rate']:.0%} de erros)")
+        print(f"   {result['loaded']}/{result['activities']} atividades em {result['seconds']:.2f}s "
+              f"({result['activities_per_second']:.0f} ativ./s)")
+        print(f"   Geração dos dados: {result['generate_seconds']:.2f}s")
+        if result["peak_rss_mb"] is not None:
+            print(f"   Pico RSS: {result['peak_rss_mb']:.0f} MB")
+        print(f"   Requisições: {result['requests']}")